@@ -1,39 +1,100 @@
 # -*- mode: python ; coding: utf-8 -*-
+#
+# 用法：
+#     pyinstaller VSCode_AutoAllow.spec                 # 單一 exe（onefile）
+#     pyinstaller VSCode_AutoAllow.spec -- --onedir     # 資料夾版，啟動不必先解壓到暫存目錄
+#     pyinstaller VSCode_AutoAllow.spec -- --no-optimize  # 保留 docstring / assert（除錯用）
+#     pyinstaller VSCode_AutoAllow.spec -- --visual     # 包含 numpy，exe 可使用 --visual-fallback（檔案較大）
+#
+# 最佳化設定：
+# - excludes：排除程式用不到、但會被相依套件順帶分析進來的模組，縮小封存檔
+# - optimize=2：以 -OO 編譯位元組碼（移除 assert 與 docstring）
+# - 不使用 UPX：onefile 每次啟動都要解壓縮，UPX 只是讓解壓更慢，也較常被防毒軟體掃描
 
+import argparse
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--onedir', action='store_true', help='輸出資料夾版而非單一 exe')
+parser.add_argument('--no-optimize', action='store_true', help='不最佳化位元組碼')
+parser.add_argument('--visual', action='store_true', help='包含 numpy 與畫面比對備援')
+options = parser.parse_args()
+
+EXCLUDES = [
+    # 測試與開發工具
+    'unittest', 'doctest', 'pdb', 'pydoc', 'pydoc_data', 'lib2to3', 'test',
+    # 科學運算 / 影像（pywinauto 的截圖功能為選用，程式未使用）
+    'PIL', 'matplotlib', 'pandas', 'scipy',
+    # 用不到的標準函式庫
+    'sqlite3', 'xmlrpc', 'http.server', 'curses', 'turtle', 'turtledemo', 'idlelib', 'tkinter.test',
+    # 其他工具腳本（離線工具不需打包進 GUI）
+    'scan_store', 'scan_columnar', 'scan_diff', 'replay_detection', 'bench_detection', 'loadtest_windows',
+]
+# 預設不包含 numpy（約 20 MB）：exe 的 --visual-fallback 會提示需要以 --visual 重新打包
+if not options.visual:
+    EXCLUDES += ['numpy', 'visual_fallback']
 
 a = Analysis(
     ['auto_GO_gui.py'],
     pathex=[],
     binaries=[],
     datas=[],
-    hiddenimports=[],
+    hiddenimports=['visual_fallback'] if options.visual else [],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=EXCLUDES,
     noarchive=False,
-    optimize=0,
+    optimize=0 if options.no_optimize else 2,
 )
 pyz = PYZ(a.pure)
 
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.datas,
-    [],
-    name='VSCode_AutoAllow',
-    debug=False,
-    bootloader_ignore_signals=False,
-    strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
-    console=False,
-    disable_windowed_traceback=False,
-    argv_emulation=False,
-    target_arch=None,
-    codesign_identity=None,
-    entitlements_file=None,
-    icon='NONE',
-)
+if options.onedir:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        [],
+        exclude_binaries=True,
+        name='VSCode_AutoAllow',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=False,
+        console=False,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+        icon='NONE',
+    )
+    coll = COLLECT(
+        exe,
+        a.binaries,
+        a.datas,
+        strip=False,
+        upx=False,
+        upx_exclude=[],
+        name='VSCode_AutoAllow',
+    )
+else:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        a.binaries,
+        a.datas,
+        [],
+        name='VSCode_AutoAllow',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=False,
+        upx_exclude=[],
+        runtime_tmpdir=None,
+        console=False,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+        icon='NONE',
+    )
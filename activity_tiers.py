@@ -0,0 +1,169 @@
+"""
+使用者閒置 / 電源感知的輪詢層級
+依鍵鼠閒置時間、AC / 電池狀態、最近的視窗標題或 Allow 點擊活動，
+選擇不同的輪詢間隔與掃描深度
+
+訊號來源透過 ActivitySignals 介面取得，測試時可換成 SimulatedActivitySignals
+"""
+
+import ctypes
+import sys
+import time
+from collections import namedtuple
+
+
+# active_interval：有活躍視窗時的休眠秒數；idle_interval：沒有活躍視窗時的休眠秒數
+# deep_scale / shallow_scale：規則檔深度 / 淺層掃描深度的倍率（1.0 = 使用規則值）
+PollingTier = namedtuple("PollingTier", "name label active_interval idle_interval deep_scale shallow_scale")
+
+TIER_AGENT = PollingTier("agent", "⚡ 代理工作中", 0.3, 0.3, 1.0, 1.0)
+TIER_INTERACTIVE = PollingTier("interactive", "🧑 使用中", 0.3, 0.8, 1.0, 1.0)
+TIER_BATTERY = PollingTier("battery", "🔋 電池", 0.5, 1.5, 1.0, 1.0)
+TIER_AWAY = PollingTier("away", "💤 離開", 1.0, 3.0, 1.0, 1.0)
+TIER_BATTERY_AWAY = PollingTier("battery_away", "🌙 電池 + 離開", 2.0, 8.0, 0.6, 0.75)
+
+
+def scale_depth(depth, scale):
+    """依層級倍率調整規則的掃描深度（至少 1 層）"""
+    return max(1, round(depth * scale))
+
+
+class ActivitySignals:
+    """訊號來源介面"""
+
+    def idle_seconds(self):
+        """距離最後一次鍵盤/滑鼠輸入的秒數"""
+        return 0.0
+
+    def on_ac_power(self):
+        """True = 接上電源、False = 使用電池、None = 未知（桌機）"""
+        return None
+
+
+class Win32ActivitySignals(ActivitySignals):
+    """以 GetLastInputInfo / GetSystemPowerStatus 取得訊號"""
+
+    class _LASTINPUTINFO(ctypes.Structure):
+        _fields_ = [("cbSize", ctypes.c_uint), ("dwTime", ctypes.c_uint)]
+
+    class _SYSTEM_POWER_STATUS(ctypes.Structure):
+        _fields_ = [
+            ("ACLineStatus", ctypes.c_ubyte),
+            ("BatteryFlag", ctypes.c_ubyte),
+            ("BatteryLifePercent", ctypes.c_ubyte),
+            ("SystemStatusFlag", ctypes.c_ubyte),
+            ("BatteryLifeTime", ctypes.c_ulong),
+            ("BatteryFullLifeTime", ctypes.c_ulong),
+        ]
+
+    def __init__(self):
+        self._user32 = ctypes.windll.user32
+        self._kernel32 = ctypes.windll.kernel32
+
+    def idle_seconds(self):
+        info = self._LASTINPUTINFO()
+        info.cbSize = ctypes.sizeof(info)
+        if not self._user32.GetLastInputInfo(ctypes.byref(info)):
+            return 0.0
+        # GetTickCount 約 49.7 天回繞，用 32 位元差值
+        elapsed_ms = (self._kernel32.GetTickCount() - info.dwTime) & 0xFFFFFFFF
+        return elapsed_ms / 1000.0
+
+    def on_ac_power(self):
+        status = self._SYSTEM_POWER_STATUS()
+        if not self._kernel32.GetSystemPowerStatus(ctypes.byref(status)):
+            return None
+        if status.ACLineStatus == 255:
+            return None
+        return status.ACLineStatus == 1
+
+
+class SimulatedActivitySignals(ActivitySignals):
+    """模擬的訊號時間軸
+
+    Args:
+        timeline: [(秒數, 事件), ...]，事件為 "input" / "ac" / "battery"
+        clock: 回傳目前模擬秒數的函式
+    """
+
+    def __init__(self, timeline, clock):
+        self.timeline = sorted(timeline, key=lambda item: item[0])
+        self.clock = clock
+
+    def _events_until_now(self):
+        now = self.clock()
+        return [(t, event) for t, event in self.timeline if t <= now]
+
+    def idle_seconds(self):
+        inputs = [t for t, event in self._events_until_now() if event == "input"]
+        last_input = inputs[-1] if inputs else 0.0
+        return max(0.0, self.clock() - last_input)
+
+    def on_ac_power(self):
+        power = [event for _, event in self._events_until_now() if event in ("ac", "battery")]
+        if not power:
+            return None
+        return power[-1] == "ac"
+
+
+def default_signals():
+    """Windows 上使用真實訊號，其他平台視為一直有人在使用"""
+    if sys.platform == "win32":
+        try:
+            return Win32ActivitySignals()
+        except (AttributeError, OSError):
+            pass
+    return ActivitySignals()
+
+
+class TierPolicy:
+    """依訊號選擇輪詢層級，層級改變時寫入日誌
+
+    Args:
+        signals: ActivitySignals 實例
+        idle_after: 鍵鼠閒置超過此秒數視為離開
+        agent_hold: 最近一次視窗活動後維持「代理工作中」的秒數
+    """
+
+    def __init__(self, signals, idle_after=300.0, agent_hold=60.0, clock=time.monotonic, log=None):
+        self.signals = signals
+        self.idle_after = idle_after
+        self.agent_hold = agent_hold
+        self.clock = clock
+        self.log = log or (lambda msg, level="INFO": None)
+        self.tier = TIER_INTERACTIVE
+        self._last_activity = None
+        self._last_activity_reason = ""
+
+    def note_activity(self, reason):
+        """視窗標題改變或點擊 Allow 時呼叫"""
+        self._last_activity = self.clock()
+        self._last_activity_reason = reason
+
+    def evaluate(self):
+        """計算目前應使用的層級與原因"""
+        now = self.clock()
+        if self._last_activity is not None and now - self._last_activity < self.agent_hold:
+            return TIER_AGENT, f"最近活動: {self._last_activity_reason}"
+
+        idle = self.signals.idle_seconds()
+        on_ac = self.signals.on_ac_power()
+        away = idle >= self.idle_after
+        on_battery = on_ac is False
+
+        if away and on_battery:
+            return TIER_BATTERY_AWAY, f"閒置 {idle:.0f} 秒，使用電池"
+        if away:
+            return TIER_AWAY, f"閒置 {idle:.0f} 秒"
+        if on_battery:
+            return TIER_BATTERY, "使用電池"
+        return TIER_INTERACTIVE, "使用者操作中"
+
+    def update(self):
+        """重新評估層級，改變時記錄日誌，回傳目前層級"""
+        tier, reason = self.evaluate()
+        if tier != self.tier:
+            self.log(f"🎚️ 輪詢層級: {self.tier.label} → {tier.label}（{reason}，"
+                     f"間隔 {tier.active_interval}/{tier.idle_interval} 秒，深度 ×{tier.deep_scale}/×{tier.shallow_scale}）", "INFO")
+            self.tier = tier
+        return tier
@@ -4,10 +4,8 @@ VS Code Chat Auto Allow - GUI 版本
 智慧掃描：優先掃描活躍視窗，減少資源消耗
 """
 
-import win32gui
-import win32process
-import psutil
-from pywinauto import Desktop
+import gc
+import itertools
 import time
 from datetime import datetime
 import threading
@@ -15,9 +13,39 @@ import tkinter as tk
 from tkinter import ttk, scrolledtext
 import sys
 import argparse
+from collections import deque
+from uia_backend import UIABackend
+from cpu_governor import CpuGovernor
+from memory_watchdog import MemoryWatchdog, current_rss
+import event_journal
+from event_journal import EventJournal, default_journal_dir
+from activity_tiers import TierPolicy, default_signals, scale_depth
+from detection_rules import RulesWatcher, default_rules_path
+from candidate_filter import iter_candidates
+from warm_state import WarmState, default_state_path, workspace_key
+from monitor_state import StateStore, MonitorSnapshot, WindowRow
 
 class AutoAllowGUI:
-    def __init__(self):
+    # GUI 從最新狀態快照重繪的間隔
+    RENDER_INTERVAL_MS = 250
+    # 每個以視窗為鍵的結構最多保留的項目數（長時間執行的硬上限）
+    MAX_TRACKED_WINDOWS = 200
+    # 記憶體超過上限時日誌只保留的行數
+    TRIMMED_LOG_LINES = 200
+    # 同一個視窗畫面比對備援的最短間隔（秒）
+    VISUAL_INTERVAL = 1.0
+    # UIA 樹裡的按鈕不超過此數（只剩標題列的最小化 / 最大化 / 關閉）時視為無障礙樹被停用
+    VISUAL_MAX_UIA_BUTTONS = 4
+    # 暖啟動狀態有變更時最短的寫入間隔（秒）
+    STATE_SAVE_INTERVAL = 30
+    # 連線共用引擎的嘗試次數（每次間隔 0.2 秒；引擎剛取得鎖、尚未開始接受連線時需要重試）
+    ENGINE_CONNECT_ATTEMPTS = 25
+    # 點擊後追蹤探測：重新探測父容器的間隔（秒）、往下搜尋的深度、一次最多連續點擊的提示數
+    FOLLOW_UP_INTERVAL = 0.05
+    FOLLOW_UP_DEPTH = 6
+    FOLLOW_UP_MAX_CHAIN = 20
+    
+    def __init__(self, argv=None, backend=None):
         self.monitoring = False
         self.click_count = 0
         self.scan_count = 0
@@ -27,29 +55,237 @@ class AutoAllowGUI:
         # 解析命令列參數
         parser = argparse.ArgumentParser(description='VS Code Auto Allow')
         parser.add_argument('--ai-mode', action='store_true', help='啟用 AI 模式 (自動開始 + 控制台輸出)')
-        args, _ = parser.parse_known_args()
+        parser.add_argument('--headless', action='store_true', help='無介面模式 (不建立視窗，日誌輸出到控制台)')
+        parser.add_argument('--quiet', action='store_true', help='不把日誌輸出到控制台（負載測試用）')
+        parser.add_argument('--profile', type=int, default=0, metavar='N', help='分析監控循環前 N 次迭代 (cProfile + 火焰圖堆疊)')
+        parser.add_argument('--profile-sample', action='store_true', help='低頻率取樣模式，長時間記錄最慢的循環')
+        parser.add_argument('--profile-out', default='profiles', help='分析結果輸出目錄')
+        parser.add_argument('--cpu-cap', type=float, default=0, metavar='PERCENT', help='監控循環平均 CPU 上限（單核心百分比，預設 0 = 不限制）')
+        parser.add_argument('--idle-after', type=float, default=300, metavar='SECONDS', help='鍵鼠閒置超過此秒數後降低輪詢頻率')
+        parser.add_argument('--visual-fallback', action='store_true', help='UIA 無法使用時以畫面比對尋找 Allow 按鈕（需要 numpy）')
+        parser.add_argument('--follow-up', type=float, default=0.5, metavar='SECONDS', help='點擊後持續探測同一容器、接連點擊下一個 Allow 提示的秒數；期間監控執行緒不掃描其他視窗（0 = 停用）')
+        parser.add_argument('--mem-watch', type=float, default=0, metavar='SECONDS', help='每隔幾秒記錄 RSS 與配置最多的位置（0 = 停用）')
+        parser.add_argument('--mem-limit', type=float, default=300, metavar='MB', help='RSS 超過此值時釋放快取')
+        parser.add_argument('--journal', metavar='DIR', help='事件日誌目錄（預設為程式 / exe 所在目錄的 journal/）')
+        parser.add_argument('--no-journal', action='store_true', help='不寫事件日誌（基準測試、回放用）')
+        parser.add_argument('--state', metavar='PATH', help='暖啟動狀態檔（預設為程式 / exe 所在目錄的 window_state.json）')
+        parser.add_argument('--no-state', action='store_true', help='不讀寫暖啟動狀態（基準測試、回放用）')
+        parser.add_argument('--state-max-age', type=float, default=7, metavar='DAYS', help='工作區超過此天數沒有出現就從暖啟動狀態移除')
+        parser.add_argument('--mem-top', type=int, default=10, metavar='N', help='記憶體取樣列出的配置位置數')
+        parser.add_argument('--standalone', action='store_true', help='不使用共用引擎，本程序自行掃描（基準測試、回放用）')
+        parser.add_argument('--engine-dir', metavar='DIR', help='共用引擎鎖定檔與連線資訊的目錄')
+        parser.add_argument('--rules', default=None, metavar='PATH', help='偵測規則檔（預設為程式目錄下的 detection_rules.json，修改後自動重新載入）')
+        args, _ = parser.parse_known_args(argv)
         self.ai_mode = args.ai_mode
+        self.headless = args.headless
+        self.quiet = args.quiet
+        
+        # log() 會用到：元件在建立時就可能寫日誌，GUI 與共用引擎稍後才建立
+        self.root = None
+        self.engine = None  # 本程序是引擎時的 EngineServer
+        
+        # 視窗/UIA 存取後端（基準測試與負載測試可換成合成樹）
+        self.backend = backend if backend is not None else UIABackend()
+        
+        # 📈 效能分析：每次循環前後呼叫 begin_cycle / end_cycle
+        # （cProfile / pstats 只在啟用分析時才匯入）
+        self.profilers = []
+        if args.profile > 0:
+            from loop_profiler import LoopProfiler
+            self.profilers.append(LoopProfiler(args.profile, args.profile_out, log=self.log))
+        if args.profile_sample:
+            from loop_profiler import CycleSampler
+            self.profilers.append(CycleSampler(args.profile_out, log=self.log))
         
         # 🔧 記錄連接失敗的視窗，避免頻繁重試
         self.failed_connections = {}  # {hwnd: (fail_count, last_fail_time)}
         self.max_connection_failures = 5
         
+        # 🆕 以下視窗狀態只由監控執行緒修改；GUI 讀取 self.state 發布的快照，
+        # 重置等操作以命令送入 self.state，在循環之間套用
+        self.state = StateStore()
+        self._rendered_cycle = None
+        
+        # 🆕 背景引擎：監控循環與手動掃描共用同一個執行緒；
+        # 手動掃描請求在開始前重複送出會合併成同一個，並立即喚醒休眠中的循環
+        self._engine_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending_scan = None
+        self._scan_ids = itertools.count(1)
+        
         # 🆕 智慧掃描：記錄活躍視窗（曾找到 Allow 按鈕的視窗）
         self.active_windows = set()  # 曾經找到過 Allow 按鈕的視窗 hwnd
         self.last_full_scan_time = None  # 上次全掃描時間
         self.full_scan_interval = 3  # 全掃描間隔（秒）
         self.known_hwnds = set()  # 已知的所有視窗 hwnd
         
-        # 🆕 掃描深度設定
-        self.deep_scan_depth = 50  # 活躍視窗深度掃描
-        self.shallow_scan_depth = 20  # 新視窗淺層掃描
+        # 🆕 偵測規則（關鍵字、大小限制、掃描深度）：規則檔修改後在循環之間自動替換
+        self.rules = RulesWatcher(args.rules or default_rules_path(), log=self.log)
+        
+        # 🆕 CPU 預算：依實際 CPU 花費調整休眠間隔與掃描深度
+        self.governor = CpuGovernor(cap=args.cpu_cap / 100)
+        
+        # 🆕 輪詢層級：依使用者閒置、電源狀態與視窗活動調整間隔與深度
+        self.tiers = TierPolicy(default_signals(), idle_after=args.idle_after, log=self.log)
+        
+        # 🆕 記憶體監看：定期記錄 RSS / tracemalloc，超過上限時釋放快取
+        self.memory = MemoryWatchdog(args.mem_watch, rss_limit_mb=args.mem_limit, top=args.mem_top, log=self.log)
+        self._tree_items = {}  # {hwnd: Treeview item id}，重繪時更新既有列而非全部重建
+        
+        # 🆕 事件日誌：循環摘要、找到 Allow、點擊與失敗寫入磁碟，結束程式後仍可統計
+        self.journal = EventJournal(args.journal or default_journal_dir())
+        self._window_scans = 0  # 本次循環呼叫 find_and_click_allow_button 的次數
+        
+        # 🆕 暖啟動：以標題中的工作區為鍵保存活躍視窗與連接健康狀態，重新啟動後直接深度掃描
+        self.warm = WarmState(args.state or default_state_path(), max_age=args.state_max_age * 86400, log=self.log)
+        self._warm_saved = time.monotonic()
+        
+        # 🆕 畫面比對備援：連接失敗或 UIA 樹沒有任何按鈕時擷取畫面尋找 Allow 按鈕
+        self.visual = None
+        self._visual_last = {}  # {hwnd: 上次畫面比對的 monotonic 時間}
+        self._visual_requested = args.visual_fallback
+        
+        # 🆕 點擊後追蹤探測：接連出現的提示直接在同一個容器點擊，延遲另外統計
+        self.follow_up_window = args.follow_up
+        self.chain_count = 0
+        self.chain_latencies = deque(maxlen=200)  # 最近的連續提示延遲（毫秒，距上一次點擊完成）
+        
+        # 🆕 共用引擎：只有取得鎖定檔的程序掃描視窗（並寫日誌、暖啟動狀態），
+        # 其他程序連線訂閱快照、日誌與事件，按鈕操作轉送給引擎
+        self._journal_enabled = not args.no_journal
+        self._state_enabled = not args.no_state
+        self.client = None  # 本程序是用戶端時的 EngineClient
+        self._taking_over = False
+        self._rendered_monitoring = None
+        self._standalone = args.standalone
+        self._engine_dir = args.engine_dir  # None 表示預設目錄，在 join_shared_engine 決定
+        self._engine_file_lock = None
+        
+        # 創建 GUI（無介面模式下不建立）
+        if not self.headless:
+            self.root = tk.Tk()
+            self.root.title("VS Code Auto Allow - 智慧掃描")
+            self.root.geometry("1000x700")
+            self.setup_ui()
+            self.root.after(self.RENDER_INTERVAL_MS, self._render_loop)
+        
+        self.memory.start()
+        if self._visual_requested:
+            try:
+                from visual_fallback import VisualDetector
+                self.visual = VisualDetector()
+                self.log("👁️ 已啟用畫面比對備援（UIA 無法使用時）", "INFO")
+            except ImportError as e:
+                if getattr(sys, "frozen", False):
+                    self.log("⚠️ 此 exe 打包時未包含 numpy，畫面比對備援需以 --visual 重新打包或從原始碼執行", "WARNING")
+                else:
+                    self.log(f"⚠️ 畫面比對備援需要 numpy: {e}", "WARNING")
+        if self._standalone:
+            self.start_engine_services()
+        else:
+            self.join_shared_engine()
+    
+    def start_engine_services(self):
+        """本程序負責掃描時才開啟事件日誌、載入暖啟動狀態（用戶端不寫）"""
+        if self._journal_enabled:
+            try:
+                self.journal.open()
+            except OSError as e:
+                self.log(f"⚠️ 無法開啟事件日誌: {e}", "WARNING")
+        if self._state_enabled:
+            count = self.warm.load()
+            if count:
+                self.log(f"♻️ 已載入 {count} 個工作區的暖啟動狀態", "INFO")
+    
+    def join_shared_engine(self):
+        """取得鎖定檔就成為共用引擎，否則連線到現有的引擎
         
-        # 創建 GUI
-        self.root = tk.Tk()
-        self.root.title("VS Code Auto Allow - 智慧掃描")
-        self.root.geometry("1000x700")
-        self.setup_ui()
+        Returns:
+            "engine" / "client"，都失敗時改為獨立執行並回傳 "standalone"
+        """
+        # engine_ipc 會匯入 multiprocessing.connection（約 20 ms），獨立執行時不需要，不在模組層級匯入
+        from engine_ipc import EngineClient, EngineLock, EngineServer, default_engine_dir
+        if self._engine_file_lock is None:
+            self._engine_dir = self._engine_dir or default_engine_dir()
+            self._engine_file_lock = EngineLock(self._engine_dir)
+        for _ in range(self.ENGINE_CONNECT_ATTEMPTS):
+            if self._engine_file_lock.acquire():
+                self.start_engine_services()
+                engine = EngineServer(self._engine_dir, self._on_client_command,
+                                      lambda: (self.state.snapshot, self.monitoring),
+                                      interval=self.RENDER_INTERVAL_MS / 1000, log=self.log)
+                try:
+                    engine.start()
+                except OSError as e:
+                    self.log(f"⚠️ 無法建立共用引擎的連線通道，其他程序無法連線: {e}", "WARNING")
+                else:
+                    self.engine = engine
+                    self.log("🛰️ 本程序為共用掃描引擎，其他 GUI / AI 模式程序會連線到這裡", "INFO")
+                return "engine"
+            client = EngineClient.connect(self._engine_dir)
+            if client is not None:
+                self.client = client
+                client.start(self._on_engine_message, self._on_engine_lost)
+                self.log(f"🛰️ 已連線到共用引擎（PID {client.pid}），本程序不掃描視窗", "SUCCESS")
+                return "client"
+            time.sleep(0.2)
+        self.log("⚠️ 無法連線到共用引擎，改為獨立執行", "WARNING")
+        self.start_engine_services()
+        return "standalone"
+    
+    def _on_engine_message(self, kind, *data):
+        """用戶端接收執行緒：套用引擎推送的日誌、事件與快照"""
+        if kind == "log":
+            message, level = data
+            self.log(message, level)
+        elif kind == "event":
+            if self.root is not None:
+                event_kind, payload = data
+                self.state.post_event(event_kind, **payload)
+        elif kind == "snapshot":
+            snapshot, monitoring = data
+            self.state.publish(snapshot)
+            self.monitoring = monitoring
+    
+    def _on_engine_lost(self):
+        """用戶端接收執行緒：引擎結束時嘗試接手（多個用戶端同時接手時由鎖定檔決定）"""
+        was_monitoring = self.monitoring
+        self._taking_over = True
+        try:
+            self.client = None
+            self.monitoring = False
+            self.log("⚠️ 共用引擎已結束，嘗試接手", "WARNING")
+            if self.join_shared_engine() != "client" and (was_monitoring or self.headless):
+                self._call_on_ui(self.start_monitoring)
+        finally:
+            self._taking_over = False
+    
+    def _on_client_command(self, op, *args):
+        """引擎：各用戶端接收執行緒收到的命令"""
+        if op == "monitor":
+            self._call_on_ui(self.start_monitoring if args[0] else self.stop_monitoring)
+        elif op == "scan":
+            self._call_on_ui(self.manual_scan)
+        elif op == "command" and args and args[0] in ("reset_all", "reset_failed"):
+            self.submit_command(*args)
+    
+    def _call_on_ui(self, fn):
+        """在 Tk 主線程執行（無介面模式下直接執行）"""
+        if self.root is None:
+            fn()
+        else:
+            self.root.after(0, fn)
         
+    @property
+    def deep_scan_depth(self):
+        """活躍視窗深度掃描"""
+        return self.rules.current.deep_scan_depth
+    
+    @property
+    def shallow_scan_depth(self):
+        """新視窗淺層掃描"""
+        return self.rules.current.shallow_scan_depth
+    
     def setup_ui(self):
         """設置 UI"""
         # 標題區
@@ -155,6 +391,11 @@ class AutoAllowGUI:
             ("active", "活躍視窗", "0"),
             ("scans", "掃描次數", "0"),
             ("clicks", "點擊次數", "0"),
+            ("cpu_budget", "CPU 預算", f"{self.governor.cap * 100:.1f}%" if self.governor.enabled else "不限"),
+            ("cpu_used", "CPU 使用", "0.0%"),
+            ("throttle", "節流狀態", self.governor.status_text()),
+            ("memory", "記憶體", self.memory.status_text()),
+            ("chain", "連續提示", "-"),
             ("status", "狀態", "待命中")
         ]
         
@@ -209,6 +450,13 @@ class AutoAllowGUI:
         self.tree.column("最後掃描", width=120, anchor=tk.CENTER)
         self.tree.column("狀態", width=180, anchor=tk.CENTER)
         
+        # 狀態標籤顏色
+        self.tree.tag_configure("clicked", background="#d5f4e6")
+        self.tree.tag_configure("active", background="#fff3cd")  # 活躍視窗黃色
+        self.tree.tag_configure("normal", background="#ffffff")
+        self.tree.tag_configure("skipped", background="#f8d7da")
+        self.tree.tag_configure("waiting", background="#e2e3e5")
+        
         tree_scroll = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.tree.yview)
         self.tree.configure(yscrollcommand=tree_scroll.set)
         
@@ -271,16 +519,28 @@ class AutoAllowGUI:
             self.log_text.see(tk.END)
         
         # 確保在主線程執行 GUI 操作
-        if threading.current_thread() is threading.main_thread():
-            _log_internal()
-        else:
-            self.root.after(0, _log_internal)
+        self.run_on_ui(_log_internal)
         
-        # 如果是 AI 模式，同時輸出到控制台
-        if self.ai_mode:
+        # 共用引擎：轉送給所有用戶端
+        if self.engine is not None:
+            self.engine.post_log(message, level)
+        
+        # 如果是 AI 模式或無介面模式，同時輸出到控制台
+        if (self.ai_mode or self.headless) and not self.quiet:
             timestamp = datetime.now().strftime("%H:%M:%S")
             print(f"[{timestamp}] [{level}] {message}")
     
+    def run_on_ui(self, fn):
+        """在 Tk 主線程執行 GUI 操作（無介面模式下略過）"""
+        if self.root is None:
+            return
+        for profiler in self.profilers:
+            fn = profiler.wrap_ui_callback(fn)
+        if threading.current_thread() is threading.main_thread():
+            fn()
+        else:
+            self.root.after(0, fn)
+    
     def clear_log(self):
         """清空日誌"""
         self.log_text.delete(1.0, tk.END)
@@ -288,6 +548,36 @@ class AutoAllowGUI:
     
     def reset_all_states(self):
         """重置所有狀態（包括活躍視窗和失敗連接）"""
+        self.submit_command("reset_all")
+    
+    def reset_failed_connections(self):
+        """重置失敗連接記錄"""
+        self.submit_command("reset_failed")
+    
+    def submit_command(self, name, *args):
+        """背景引擎執行中時排入佇列於循環之間套用，否則直接套用（用戶端轉送給共用引擎）"""
+        if self.client is not None and self.client.send("command", name, *args):
+            return
+        with self._engine_lock:
+            if self.monitor_thread is not None and self.monitor_thread.is_alive():
+                self.state.submit(name, *args)
+                return
+        self._apply_command(name, *args)
+    
+    def apply_commands(self):
+        """監控執行緒：套用佇列中的命令"""
+        for name, args in self.state.drain():
+            self._apply_command(name, *args)
+    
+    def _apply_command(self, name, *args):
+        handler = getattr(self, f"_cmd_{name}", None)
+        if handler is None:
+            self.log(f"⚠️ 未知的命令: {name}", "WARNING")
+            return
+        handler(*args)
+        self.publish_state(self.state.snapshot.windows)
+    
+    def _cmd_reset_all(self):
         fail_count = len(self.failed_connections)
         active_count = len(self.active_windows)
         
@@ -295,12 +585,12 @@ class AutoAllowGUI:
         self.active_windows.clear()
         self.known_hwnds.clear()
         self.last_full_scan_time = None
+        self.warm.clear()
         
-        self.log(f"🔄 已重置所有狀態：{fail_count} 個失敗連接、{active_count} 個活躍視窗", "SUCCESS")
+        self.log(f"🔄 已重置所有狀態：{fail_count} 個失敗連接、{active_count} 個活躍視窗（含暖啟動狀態）", "SUCCESS")
         self.log("💡 下次掃描將對所有視窗進行全掃描", "INFO")
     
-    def reset_failed_connections(self):
-        """重置失敗連接記錄"""
+    def _cmd_reset_failed(self):
         count = len(self.failed_connections)
         self.failed_connections.clear()
         self.log(f"🔄 已重置 {count} 個失敗連接記錄", "SUCCESS")
@@ -309,39 +599,29 @@ class AutoAllowGUI:
         """獲取進程名稱"""
         if hwnd == 0:
             return ""
-        try:
-            _, pid = win32process.GetWindowThreadProcessId(hwnd)
-            process = psutil.Process(pid)
-            return process.name().lower().replace(".exe", "")
-        except (psutil.NoSuchProcess, psutil.AccessDenied, OSError):
-            return ""
+        return self.backend.process_name(hwnd)
     
     def find_all_vscode_windows(self):
         """尋找所有 VS Code 視窗"""
         windows = []
         
-        def enum_callback(hwnd, result):
-            if win32gui.IsWindowVisible(hwnd):
-                title = win32gui.GetWindowText(hwnd)
-                process_name = self.get_process_name_from_hwnd(hwnd)
-                
-                # 排除 Extension Development Host
-                if "Extension Development Host" in title:
-                    return True
-                
-                # 排除空標題
-                if not title or len(title.strip()) == 0:
-                    return True
-                
-                if process_name == "code" and "Visual Studio Code" in title:
-                    windows.append({
-                        "hwnd": hwnd,
-                        "title": title,
-                        "process": process_name
-                    })
-            return True
+        for hwnd, title in self.backend.enum_windows():
+            # 排除 Extension Development Host
+            if "Extension Development Host" in title:
+                continue
+            
+            # 排除空標題
+            if not title or len(title.strip()) == 0:
+                continue
+            
+            process_name = self.get_process_name_from_hwnd(hwnd)
+            if process_name == "code" and "Visual Studio Code" in title:
+                windows.append({
+                    "hwnd": hwnd,
+                    "title": title,
+                    "process": process_name
+                })
         
-        win32gui.EnumWindows(enum_callback, None)
         return windows
     
     def find_and_click_allow_button(self, hwnd, deep_scan=False):
@@ -351,9 +631,11 @@ class AutoAllowGUI:
             hwnd: 視窗句柄
             deep_scan: 是否進行深度掃描（活躍視窗使用）
         """
+        started = time.perf_counter()
+        self._window_scans += 1
         try:
             # 檢查視窗是否存在
-            if not win32gui.IsWindow(hwnd):
+            if not self.backend.is_window(hwnd):
                 if hwnd in self.vscode_windows:
                     self.log(f"⚠️ 視窗 {hwnd} 已不存在", "WARNING")
                 # 從活躍視窗中移除
@@ -365,15 +647,14 @@ class AutoAllowGUI:
                 fail_count, last_fail_time = self.failed_connections[hwnd]
                 if fail_count >= self.max_connection_failures:
                     if (datetime.now() - last_fail_time).total_seconds() < 15:
-                        return False
+                        return self.click_visual_fallback(hwnd)
                     else:
                         self.failed_connections[hwnd] = (0, datetime.now())
                         self.log(f"🔄 視窗 {hwnd} 重新嘗試連接", "INFO")
             
             # 連接到視窗
             try:
-                desktop = Desktop(backend="uia")
-                window = desktop.window(handle=hwnd)
+                window = self.backend.connect(hwnd)
                 if hwnd in self.failed_connections:
                     del self.failed_connections[hwnd]
             except Exception as e:
@@ -382,185 +663,249 @@ class AutoAllowGUI:
                     self.failed_connections[hwnd] = (fail_count + 1, datetime.now())
                 else:
                     self.failed_connections[hwnd] = (1, datetime.now())
+                self.journal.record(event_journal.CONNECT_FAILED, hwnd=hwnd)
                 
                 if self.scan_count % 50 == 0:
                     self.log(f"⚠️ 無法連接到視窗 {hwnd}: {e}", "DEBUG")
-                return False
+                return self.click_visual_fallback(hwnd)
             
-            # 🆕 根據掃描模式決定深度
-            scan_depth = self.deep_scan_depth if deep_scan else self.shallow_scan_depth
+            # 整個視窗使用同一份規則（規則檔重新載入時不會中途換掉）
+            rules = self.rules.current
             
-            # 🔧 修改：只搜尋真正的按鈕類型，不搜尋 Text 和 Hyperlink
-            # 這些類型最容易造成誤點擊
-            button_types = [
-                "Button",       # 主要目標
-                "SplitButton",  # 分割按鈕
-            ]
+            # 🆕 根據掃描模式決定深度
+            tier = self.tiers.tier
+            if deep_scan:
+                scan_depth = scale_depth(rules.deep_scan_depth, tier.deep_scale)
+            else:
+                scan_depth = scale_depth(rules.shallow_scan_depth, tier.shallow_scale)
+            scan_depth = self.governor.scan_depth(scan_depth)
             
-            for btn_type in button_types:
+            # 🔧 只搜尋真正的按鈕類型（規則檔 button_types），不搜尋 Text 和 Hyperlink
+            seen_buttons = 0
+            read_failed = False
+            for btn_type in rules.button_types:
                 try:
                     type_depth = scan_depth
                     buttons = window.descendants(control_type=btn_type, depth=type_depth)
+                    seen_buttons += len(buttons)
                     
-                    for button in buttons:
-                        try:
-                            try:
-                                button.element_info.update()
-                            except:
-                                pass
-                            
-                            element_info = button.element_info
-                            name = getattr(element_info, 'name', '')
-                            name_lower = name.lower()
-                            
-                            # 🔧 加強排除邏輯
-                            # 排除關鍵字（更全面）
-                            exclude_keywords = [
-                                # 檔案/資料夾相關
-                                'section', 'explorer', 'folder', 'directory', 'file',
-                                # 否定詞
-                                'disallow', '不允許', 'deny', 'reject', 'cancel',
-                                # 程式相關
-                                'autoallow', 'auto_allow', 'auto-allow',
-                                # 對話/聊天區域（避免點到聊天內容）
-                                'chat', 'message', 'conversation', 'response',
-                                # 編輯器相關
-                                'editor', 'tab', 'panel', 'view', 'tree',
-                                # 其他 UI 元素
-                                'menu', 'toolbar', 'statusbar', 'sidebar',
-                                # 長文字（通常是內容而非按鈕）
-                            ]
-                            
-                            # 檢查是否應該排除
-                            should_exclude = any(ex in name_lower for ex in exclude_keywords)
-                            if should_exclude:
-                                continue
-                            
-                            # 🔧 更嚴格的匹配：按鈕名稱必須簡短且精確
-                            # Allow 按鈕通常很短，例如 "Allow", "允許", "Accept"
-                            if len(name) > 50:  # 按鈕名稱太長，可能是內容而非按鈕
-                                continue
-                            
-                            # 🔧 精確匹配 Allow 相關關鍵字
-                            # 必須是按鈕的主要文字，而非包含在長句中
-                            allow_patterns = [
-                                'allow',    # 英文
-                                '允許',     # 中文
-                                'accept',   # 接受
-                                '接受',
-                                'confirm',  # 確認
-                                '確認',
-                                'yes',      # 是
-                                '是',
-                                'ok',       # OK
-                                '確定',
-                            ]
-                            
-                            # 檢查是否匹配（更嚴格）
-                            is_allow_button = False
-                            matched_pattern = None
-                            
-                            for pattern in allow_patterns:
-                                # 精確匹配：名稱就是這個詞，或者以這個詞開頭/結尾
-                                if name_lower == pattern:
-                                    is_allow_button = True
-                                    matched_pattern = pattern
-                                    break
-                                # 或者名稱中包含這個詞，但名稱很短（<20字元）
-                                elif pattern in name_lower and len(name) < 20:
-                                    is_allow_button = True
-                                    matched_pattern = pattern
-                                    break
-                            
-                            if not is_allow_button:
-                                continue
-                            
-                            # 🔧 額外檢查：確保是真正的按鈕
-                            try:
-                                # 檢查按鈕是否可用
-                                is_enabled = button.is_enabled()
-                                if not is_enabled:
-                                    continue
-                            except:
-                                pass
-                            
-                            try:
-                                # 檢查按鈕是否可見
-                                is_visible = button.is_visible()
-                                if not is_visible:
-                                    continue  # 跳過不可見的按鈕
-                            except:
-                                pass
-                            
-                            # 🔧 檢查按鈕的 automation_id 或 class_name
-                            # VS Code 的真正按鈕通常有特定的 class
-                            try:
-                                class_name = getattr(element_info, 'class_name', '')
-                                automation_id = getattr(element_info, 'automation_id', '')
-                                
-                                # 如果有 automation_id 包含可疑詞，跳過
-                                suspicious_ids = ['editor', 'chat', 'message', 'text', 'content']
-                                if any(s in automation_id.lower() for s in suspicious_ids):
-                                    self.log(f"⏭️ 跳過可疑元素: '{name}' (automation_id: {automation_id})", "DEBUG")
-                                    continue
-                            except:
-                                pass
-                            
-                            # 🔧 檢查按鈕的位置和大小（真正的按鈕通常有合理的大小）
-                            try:
-                                rect = button.rectangle()
-                                width = rect.right - rect.left
-                                height = rect.bottom - rect.top
-                                
-                                # 按鈕太小或太大都可能不是真正的按鈕
-                                if width < 20 or height < 15:
-                                    continue
-                                if width > 500 or height > 100:
-                                    continue
-                            except:
-                                pass
-                            
-                            # 通過所有檢查，準備點擊
-                            scan_mode = "深度" if deep_scan else "淺層"
-                            self.log(f"🎯 [{scan_mode}掃描] 找到 Allow 按鈕: '{name}' (類型: {btn_type}, 匹配: {matched_pattern}, HWND: {hwnd})", "SUCCESS")
-                            
-                            click_methods = ['invoke', 'click_input', 'click']
+                    # 🆕 批次篩選：長度 / 大小規則以遮罩一次套用，關鍵字只比對通過的元素，
+                    # 結果依原本的檢查順序排列（排除關鍵字、Allow 關鍵字、啟用、可見、可疑 AutomationId、大小，見規則檔）
+                    for candidate in iter_candidates(buttons, rules, on_suspicious=self._log_suspicious):
+                        button, name, matched_pattern = candidate
+                        
+                        # 通過所有檢查，準備點擊
+                        scan_mode = "深度" if deep_scan else "淺層"
+                        self.log(f"🎯 [{scan_mode}掃描] 找到 Allow 按鈕: '{name}' (類型: {btn_type}, 匹配: {matched_pattern}, HWND: {hwnd})", "SUCCESS")
+                        self.journal.record(event_journal.DETECT, hwnd=hwnd, depth=scan_depth,
+                                            latency_ms=(time.perf_counter() - started) * 1000)
+                        
+                        # 點擊後按鈕可能立即被移除，父容器要先取得
+                        containers = self.follow_up_containers(button)
+                        method_name = self.invoke_button(button)
+                        if method_name is not None:
+                            self.click_count += 1
+                            self.journal.record(event_journal.CLICK, hwnd=hwnd, depth=scan_depth,
+                                                method=event_journal.METHOD_CODES[method_name],
+                                                latency_ms=(time.perf_counter() - started) * 1000)
+                            self.log(f"✅ 使用 {method_name}() 成功點擊！(第 {self.click_count} 次)", "SUCCESS")
+                            self.tiers.note_activity("點擊 Allow")
                             
-                            for method_name in click_methods:
-                                try:
-                                    method = getattr(button, method_name, None)
-                                    if method:
-                                        method()
-                                        self.click_count += 1
-                                        self.log(f"✅ 使用 {method_name}() 成功點擊！(第 {self.click_count} 次)", "SUCCESS")
-                                        
-                                        # 🆕 標記此視窗為活躍視窗
-                                        if hwnd not in self.active_windows:
-                                            self.active_windows.add(hwnd)
-                                            self.log(f"🔥 視窗 {hwnd} 已標記為活躍視窗，後續將優先深度掃描", "SUCCESS")
-                                        
-                                        return True
-                                except Exception as e:
-                                    self.log(f"⚠️ {method_name}() 失敗: {e}", "DEBUG")
-                                    continue
+                            # 🆕 標記此視窗為活躍視窗
+                            if hwnd not in self.active_windows:
+                                self.active_windows.add(hwnd)
+                                self.log(f"🔥 視窗 {hwnd} 已標記為活躍視窗，後續將優先深度掃描", "SUCCESS")
                             
-                            self.log(f"❌ 所有點擊方法都失敗", "ERROR")
-                            continue
+                            # 🆕 接連出現的提示：只重新探測父容器，不等下一次循環與整個視窗的走訪
+                            self.follow_up_clicks(hwnd, button, containers, rules)
+                            return True
                         
-                        except Exception as e:
-                            continue
+                        self.log(f"❌ 所有點擊方法都失敗", "ERROR")
+                        self.journal.record(event_journal.CLICK_FAILED, hwnd=hwnd, depth=scan_depth)
                             
                 except Exception as e:
+                    read_failed = True
                     continue
             
+            # 🆕 UIA 樹裡只剩標題列按鈕：renderer 可能停用了無障礙樹，改用畫面比對
+            # （讀取失敗或深度被節流 / 輪詢層級調低時，按鈕少不代表樹是空的，不改用畫面比對）
+            if (self.visual is not None and not read_failed and seen_buttons <= self.VISUAL_MAX_UIA_BUTTONS
+                    and self._uia_tree_empty(window, rules)):
+                return self.click_visual_fallback(hwnd)
             return False
             
         except Exception as e:
             self.log(f"❌ 掃描視窗 {hwnd} 時發生錯誤: {e}", "ERROR")
             return False
     
-    def scan_windows(self):
-        """智慧掃描所有視窗"""
+    def invoke_button(self, button):
+        """依序嘗試 invoke / click_input / click，回傳成功的方法名稱，都失敗時回傳 None"""
+        for method_name in ('invoke', 'click_input', 'click'):
+            try:
+                method = getattr(button, method_name, None)
+                if method:
+                    method()
+                    return method_name
+            except Exception as e:
+                self.log(f"⚠️ {method_name}() 失敗: {e}", "DEBUG")
+        return None
+    
+    def follow_up_containers(self, button):
+        """點擊前取得按鈕的父容器與上一層容器（停用追蹤探測時回傳空列表）"""
+        containers = []
+        element = button
+        while self.follow_up_window > 0 and len(containers) < 2:
+            try:
+                element = element.parent()
+            except Exception:
+                break
+            if element is None:
+                break
+            containers.append(element)
+        return containers
+    
+    @staticmethod
+    def _element_present(element):
+        """元素仍在樹中且可見（已移除的元素讀取時會丟出例外）"""
+        try:
+            return bool(element.is_visible())
+        except Exception:
+            return False
+    
+    def _probe_container(self, container, rules):
+        """只在容器內搜尋 Allow 按鈕，回傳第一個候選或 None"""
+        for btn_type in rules.button_types:
+            try:
+                buttons = container.descendants(control_type=btn_type, depth=self.FOLLOW_UP_DEPTH)
+            except Exception:
+                continue
+            for candidate in iter_candidates(buttons, rules, on_suspicious=self._log_suspicious):
+                return candidate
+        return None
+    
+    def follow_up_clicks(self, hwnd, button, containers, rules):
+        """點擊後的追蹤探測，回傳接連點擊的提示數
+        
+        在 follow_up_window 秒內每隔 FOLLOW_UP_INTERVAL 秒：先確認被點擊的按鈕已消失，
+        之後只搜尋它的父容器（父容器也被移除時改用上一層）。找到下一個 Allow 提示就立即點擊，
+        並從這次點擊重新計時；延遲（距上一次點擊完成）記入 chain_latencies 與事件日誌
+        在監控執行緒執行，期間（每次點擊最多 follow_up_window 秒）不會掃描其他視窗
+        """
+        if not containers:
+            return 0
+        clicked_at = time.perf_counter()
+        deadline = clicked_at + self.follow_up_window
+        gone = False
+        chained = 0
+        while chained < self.FOLLOW_UP_MAX_CHAIN:
+            if time.perf_counter() >= deadline:
+                # 只有等到期限結束，最後點擊的按鈕都沒有消失才警告（達到連續上限時不算）
+                if not gone:
+                    self.log(f"⚠️ 點擊後 {self.follow_up_window:.1f} 秒內 Allow 按鈕仍在，點擊可能沒有生效", "WARNING")
+                break
+            time.sleep(self.FOLLOW_UP_INTERVAL)
+            if not gone:
+                gone = not self._element_present(button)
+                if not gone:
+                    continue
+            container = next((c for c in containers if self._element_present(c)), None)
+            if container is None:
+                break
+            candidate = self._probe_container(container, rules)
+            if candidate is None:
+                continue
+            
+            next_containers = self.follow_up_containers(candidate.wrapper)
+            method_name = self.invoke_button(candidate.wrapper)
+            if method_name is None:
+                self.log(f"❌ 接連的 Allow 提示 '{candidate.name}' 所有點擊方法都失敗", "ERROR")
+                self.journal.record(event_journal.CLICK_FAILED, hwnd=hwnd, depth=self.FOLLOW_UP_DEPTH)
+                break
+            now = time.perf_counter()
+            latency_ms = (now - clicked_at) * 1000
+            chained += 1
+            self.click_count += 1
+            self.chain_count += 1
+            self.chain_latencies.append(latency_ms)
+            self.journal.record(event_journal.CHAIN_CLICK, hwnd=hwnd, depth=self.FOLLOW_UP_DEPTH,
+                                method=event_journal.METHOD_CODES[method_name], latency_ms=latency_ms)
+            self.log(f"⛓️ 接連的 Allow 提示 '{candidate.name}'：{method_name}() 點擊成功"
+                     f"（距上次點擊 {latency_ms:.0f} ms，第 {self.click_count} 次）", "SUCCESS")
+            button, containers = candidate.wrapper, next_containers or containers
+            clicked_at = now
+            deadline = now + self.follow_up_window
+            gone = False
+        return chained
+    
+    def chain_status_text(self):
+        """連續提示的次數與最近延遲的中位數"""
+        if not self.chain_latencies:
+            return "-"
+        latencies = sorted(self.chain_latencies)
+        return f"{self.chain_count} 次 / {latencies[len(latencies) // 2]:.0f} ms"
+    
+    def _log_suspicious(self, name, automation_id):
+        self.log(f"⏭️ 跳過可疑元素: '{name}' (automation_id: {automation_id})", "DEBUG")
+    
+    def _uia_tree_empty(self, window, rules):
+        """以規則的完整深度確認視窗的 UIA 樹除了標題列（TitleBar）的按鈕之外沒有任何按鈕"""
+        try:
+            for btn_type in rules.button_types:
+                for button in window.descendants(control_type=btn_type, depth=rules.deep_scan_depth):
+                    parent = button.parent()
+                    if parent is None or parent.element_info.control_type != "TitleBar":
+                        return False
+        except Exception:
+            return False
+        return True
+    
+    def click_visual_fallback(self, hwnd):
+        """UIA 無法使用時擷取畫面，在聊天面板尋找並點擊 Allow 按鈕（每個視窗最多每 VISUAL_INTERVAL 秒一次）"""
+        if self.visual is None:
+            return False
+        now = time.monotonic()
+        last = self._visual_last.get(hwnd)
+        if last is not None and now - last < self.VISUAL_INTERVAL:
+            return False
+        self._visual_last[hwnd] = now
+        
+        started = time.perf_counter()
+        try:
+            frame = self.backend.capture(hwnd)
+        except Exception as e:
+            self.log(f"⚠️ 無法擷取視窗 {hwnd} 的畫面: {e}", "DEBUG")
+            return False
+        if frame is None:
+            return False
+        pixels, (left, top) = frame
+        match = self.visual.detect(pixels)
+        if match is None:
+            return False
+        
+        x = left + match.left + match.width // 2
+        y = top + match.top + match.height // 2
+        self.log(f"🎯 [畫面比對] 找到 Allow 按鈕: ({x}, {y}) {match.width}x{match.height}，"
+                 f"標籤相似度 {match.label:.2f}、文字比例 {match.text:.2f} (HWND: {hwnd})", "SUCCESS")
+        self.journal.record(event_journal.DETECT, hwnd=hwnd, latency_ms=(time.perf_counter() - started) * 1000)
+        try:
+            self.backend.click_at(x, y)
+        except Exception as e:
+            self.log(f"❌ 畫面比對點擊失敗: {e}", "ERROR")
+            self.journal.record(event_journal.CLICK_FAILED, hwnd=hwnd)
+            return False
+        self.click_count += 1
+        self.log(f"✅ 畫面比對點擊成功！(第 {self.click_count} 次)", "SUCCESS")
+        self.journal.record(event_journal.CLICK, hwnd=hwnd, method=event_journal.METHOD_CODES["visual"],
+                            latency_ms=(time.perf_counter() - started) * 1000)
+        self.tiers.note_activity("點擊 Allow")
+        return True
+    
+    def scan_windows(self, progress=None):
+        """智慧掃描所有視窗
+        
+        Args:
+            progress: 每掃完一個視窗呼叫 progress(已完成數, 視窗總數)
+        """
         try:
             self.scan_count += 1
             current_time = datetime.now()
@@ -579,28 +924,10 @@ class AutoAllowGUI:
                 (current_time - self.last_full_scan_time).total_seconds() >= self.full_scan_interval
             )
             
-            # 清理已關閉的視窗
-            closed_hwnds = self.known_hwnds - current_hwnds
-            for hwnd in closed_hwnds:
-                if hwnd in self.vscode_windows:
-                    del self.vscode_windows[hwnd]
-                if hwnd in self.failed_connections:
-                    del self.failed_connections[hwnd]
-                self.active_windows.discard(hwnd)
-            
             # 更新已知視窗列表
             self.known_hwnds = current_hwnds
             
-            # 更新 Treeview
-            def _update_tree():
-                for item in self.tree.get_children():
-                    self.tree.delete(item)
-            
-            if threading.current_thread() is threading.main_thread():
-                _update_tree()
-            else:
-                self.root.after(0, _update_tree)
-            
+            rows = []
             found_allow = False
             skipped_windows = 0
             
@@ -608,6 +935,10 @@ class AutoAllowGUI:
             if has_new_windows:
                 self.log(f"🆕 發現 {len(new_windows)} 個新視窗，進行全掃描", "INFO")
                 self.last_full_scan_time = current_time
+                # 🆕 暖啟動：工作區之前找到過 Allow 按鈕的新視窗直接列為活躍視窗
+                for win in windows:
+                    if win['hwnd'] in new_windows:
+                        self.warm_start_window(win['hwnd'], win['title'])
             
             # 🆕 優先掃描活躍視窗（深度掃描）
             active_hwnds_to_scan = self.active_windows & current_hwnds
@@ -649,10 +980,17 @@ class AutoAllowGUI:
                 # 新視窗：淺層掃描
                 # 其他視窗：只在定期全掃描時淺層掃描
                 if should_skip:
-                    has_allow = False
-                    status = f"⏭️ 跳過 ({skip_reason})"
-                    scan_mode = "跳過"
-                    tag = "skipped"
+                    # 連接失敗太多次：不嘗試 UIA，只做畫面比對備援（未啟用時直接跳過）
+                    has_allow = self.click_visual_fallback(hwnd)
+                    if has_allow:
+                        found_allow = True
+                        status = "✅ 已點擊 Allow（畫面比對）"
+                        scan_mode = "👁️ 畫面"
+                        tag = "clicked"
+                    else:
+                        status = f"⏭️ 跳過 ({skip_reason})"
+                        scan_mode = "跳過"
+                        tag = "skipped"
                 elif is_active:
                     # 活躍視窗：深度掃描
                     has_allow = self.find_and_click_allow_button(hwnd, deep_scan=True)
@@ -682,6 +1020,11 @@ class AutoAllowGUI:
                     status = "⏸️ 等待全掃描"
                     tag = "waiting"
                 
+                # 🆕 標題改變（代理編輯檔案、切換對話）視為視窗活動
+                previous = self.vscode_windows.get(hwnd)
+                if previous is not None and previous["title"] != title:
+                    self.tiers.note_activity("視窗標題變更")
+                
                 # 更新視窗資訊
                 self.vscode_windows[hwnd] = {
                     "title": title,
@@ -689,43 +1032,23 @@ class AutoAllowGUI:
                     "has_allow": has_allow,
                     "is_active": is_active
                 }
+                self.warm.update(workspace_key(title), clicked=has_allow,
+                                 fail_count=self.failed_connections.get(hwnd, (0,))[0])
                 
-                time_str = current_time.strftime("%H:%M:%S")
-                
-                # Treeview 插入
-                def _insert_item(idx=i, h=hwnd, dt=display_title, sm=scan_mode, ts=time_str, st=status, tg=tag):
-                    self.tree.insert(
-                        "",
-                        tk.END,
-                        text=str(idx),
-                        values=(h, dt, sm, ts, st),
-                        tags=(tg,)
-                    )
-                
-                if threading.current_thread() is threading.main_thread():
-                    _insert_item()
-                else:
-                    self.root.after(0, _insert_item)
+                rows.append(WindowRow(i, hwnd, title, display_title, scan_mode,
+                                      current_time.strftime("%H:%M:%S"), status, tag))
+                if progress is not None:
+                    progress(i, len(sorted_windows))
+            
+            # 清理已關閉的視窗（並限制每個結構的大小）
+            self.prune_window_state(current_hwnds)
             
             # 如果進行了全掃描，更新時間
             if need_periodic_full_scan and not has_new_windows:
                 self.last_full_scan_time = current_time
             
-            # 配置標籤顏色
-            def _configure_tags():
-                self.tree.tag_configure("clicked", background="#d5f4e6")
-                self.tree.tag_configure("active", background="#fff3cd")  # 活躍視窗黃色
-                self.tree.tag_configure("normal", background="#ffffff")
-                self.tree.tag_configure("skipped", background="#f8d7da")
-                self.tree.tag_configure("waiting", background="#e2e3e5")
-            
-            if threading.current_thread() is threading.main_thread():
-                _configure_tags()
-            else:
-                self.root.after(0, _configure_tags)
-            
-            # 更新統計
-            self.update_stats(len(windows))
+            # 發布本次循環的狀態快照（GUI 只從快照重繪）
+            self.publish_state(rows)
             
             # 日誌輸出（減少頻率）
             if skipped_windows > 0 and self.scan_count % 30 == 0:
@@ -741,74 +1064,299 @@ class AutoAllowGUI:
             self.log(f"掃描過程出錯: {e}", "ERROR")
             return False
     
-    def update_stats(self, window_count):
+    def warm_start_window(self, hwnd, title):
+        """新視窗出現時，依暖啟動狀態還原所屬工作區的活躍標記與連接失敗次數"""
+        workspace = workspace_key(title)
+        active, fail_count = self.warm.restore(workspace)
+        if active and hwnd not in self.active_windows:
+            self.active_windows.add(hwnd)
+            self.log(f"♻️ 視窗 {hwnd}（{workspace}）依暖啟動狀態列為活躍視窗，直接深度掃描", "INFO")
+        if fail_count and hwnd not in self.failed_connections:
+            # 還原的次數低於上限：仍會先嘗試連接，再失敗一次才進入等待
+            self.failed_connections[hwnd] = (min(fail_count, self.max_connection_failures - 1), datetime.now())
+    
+    def save_warm_state(self, force=False):
+        """監控執行緒：有變更且距離上次寫入超過 STATE_SAVE_INTERVAL 時寫入暖啟動狀態"""
+        now = time.monotonic()
+        if force or now - self._warm_saved >= self.STATE_SAVE_INTERVAL:
+            self._warm_saved = now
+            self.warm.save()
+    
+    def prune_window_state(self, current_hwnds):
+        """只保留目前存在的視窗，每個以視窗為鍵的結構不超過 MAX_TRACKED_WINDOWS 項"""
+        for table in (self.vscode_windows, self.failed_connections, self._visual_last):
+            for hwnd in [hwnd for hwnd in table if hwnd not in current_hwnds]:
+                del table[hwnd]
+            # 超過上限時丟掉最早加入的項目
+            while len(table) > self.MAX_TRACKED_WINDOWS:
+                del table[next(iter(table))]
+        self.active_windows.intersection_update(current_hwnds)
+        for hwnd in list(self.active_windows)[self.MAX_TRACKED_WINDOWS:]:
+            self.active_windows.discard(hwnd)
+    
+    def trim_memory(self):
+        """監控執行緒：RSS 超過上限時釋放快取與 COM 物件"""
+        before = current_rss()
+        self.prune_window_state(self.known_hwnds)
+        release = getattr(self.backend, "release", None)
+        if release is not None:
+            release()
+        collected = gc.collect()
+        self.run_on_ui(self._trim_ui)
+        self.memory.trims += 1
+        after = current_rss()
+        freed = f"，RSS {before / 1048576:.1f} → {after / 1048576:.1f} MB" if before and after else ""
+        self.log(f"🧹 記憶體超過上限，已釋放快取（回收 {collected} 個物件{freed}）", "WARNING")
+    
+    def _trim_ui(self):
+        """Tk 主線程：日誌只保留最近 TRIMMED_LOG_LINES 行"""
+        line_count = int(self.log_text.index('end-1c').split('.')[0])
+        if line_count > self.TRIMMED_LOG_LINES:
+            self.log_text.delete('1.0', f'{line_count - self.TRIMMED_LOG_LINES}.0')
+    
+    def publish_state(self, rows):
+        """監控執行緒：把目前狀態複製成不可變快照並發布"""
+        self.state.publish(MonitorSnapshot(
+            cycle=(self.state.snapshot.cycle + 1),
+            taken_at=datetime.now(),
+            windows=tuple(rows),
+            active_hwnds=frozenset(self.active_windows),
+            failed_count=len(self.failed_connections),
+            scan_count=self.scan_count,
+            click_count=self.click_count,
+            cpu_measured=self.governor.measured,
+            throttle_text=self.governor.status_text(),
+            memory_text=self.memory.status_text(),
+            chain_text=self.chain_status_text(),
+        ))
+    
+    def update_stats(self):
         """更新統計資訊 (線程安全)"""
-        def _update():
-            self.stats_labels["windows"].config(text=str(window_count))
-            self.stats_labels["active"].config(text=str(len(self.active_windows)))
-            self.stats_labels["scans"].config(text=str(self.scan_count))
-            self.stats_labels["clicks"].config(text=str(self.click_count))
+        self.run_on_ui(self._render_state)
+    
+    def _render_loop(self):
+        """Tk 主線程：定期從最新快照重繪"""
+        self._render_state()
+        self.root.after(self.RENDER_INTERVAL_MS, self._render_loop)
+    
+    def _render_state(self):
+        """Tk 主線程：只讀取 self.state.snapshot，快照沒變時不重建視窗列表"""
+        for kind, data in self.state.drain_events():
+            if kind == "scan_progress":
+                self.scan_btn.config(text=f"⏳ 掃描中 {data['done']}/{data['total']}")
+            elif kind == "scan_result":
+                self.scan_btn.config(text="🔍 立即掃描")
+        
+        snapshot = self.state.snapshot
+        if snapshot.cycle != self._rendered_cycle:
+            self._rendered_cycle = snapshot.cycle
+            # 依 hwnd 更新既有列，只新增 / 刪除有變動的視窗（避免每次重建所有列）
+            rows = {row.hwnd: row for row in snapshot.windows}
+            for hwnd in [hwnd for hwnd in self._tree_items if hwnd not in rows]:
+                self.tree.delete(self._tree_items.pop(hwnd))
+            for position, row in enumerate(snapshot.windows):
+                values = (row.hwnd, row.display_title, row.scan_mode, row.last_scan, row.status)
+                item = self._tree_items.get(row.hwnd)
+                if item is None:
+                    self._tree_items[row.hwnd] = self.tree.insert(
+                        "", position, text=str(row.index), values=values, tags=(row.tag,))
+                else:
+                    self.tree.item(item, text=str(row.index), values=values, tags=(row.tag,))
+                    self.tree.move(item, "", position)
             
+            self.stats_labels["windows"].config(text=str(len(snapshot.windows)))
+            self.stats_labels["active"].config(text=str(len(snapshot.active_hwnds)))
+            self.stats_labels["scans"].config(text=str(snapshot.scan_count))
+            self.stats_labels["clicks"].config(text=str(snapshot.click_count))
+            self.stats_labels["cpu_used"].config(text=f"{snapshot.cpu_measured * 100:.1f}%")
+            self.stats_labels["throttle"].config(text=snapshot.throttle_text)
+            self.stats_labels["memory"].config(text=snapshot.memory_text)
+            self.stats_labels["chain"].config(text=snapshot.chain_text)
+        
+        # 用戶端的監控狀態來自共用引擎，按鈕文字依快照同步
+        if self.monitoring != self._rendered_monitoring:
+            self._rendered_monitoring = self.monitoring
             if self.monitoring:
-                self.stats_labels["status"].config(text="🟢 監控中", fg="#27ae60")
+                self.toggle_btn.config(text="⏸️ 停止監控", bg="#e67e22")
             else:
-                self.stats_labels["status"].config(text="⚪ 待命中", fg="#95a5a6")
+                self.toggle_btn.config(text="▶️ 開始監控", bg="#27ae60")
         
-        if threading.current_thread() is threading.main_thread():
-            _update()
+        if self.monitoring:
+            self.stats_labels["status"].config(text="🟢 監控中", fg="#27ae60")
         else:
-            self.root.after(0, _update)
+            self.stats_labels["status"].config(text="⚪ 待命中", fg="#95a5a6")
     
     def manual_scan(self):
-        """手動掃描（強制全掃描）"""
-        self.log("開始手動全掃描...", "INFO")
-        self.last_full_scan_time = None  # 強制下次全掃描
-        found = self.scan_windows()
-        if not found:
-            self.log("掃描完成，未發現 Allow 按鈕", "INFO")
+        """手動全掃描：交給背景引擎以最高優先處理，Tk 主線程不呼叫 UIA"""
+        if self.client is not None:
+            self.client.send("scan")
+            if self.root is not None:
+                self.scan_btn.config(text="⏳ 等待掃描")
+            return
+        request_id, coalesced = self.request_full_scan()
+        if coalesced:
+            self.log(f"⏳ 手動掃描 #{request_id} 尚未開始，本次請求已合併", "INFO")
+            return
+        self.log(f"開始手動全掃描 #{request_id}...", "INFO")
+        if self.root is not None:
+            self.scan_btn.config(text="⏳ 等待掃描")
+    
+    def request_full_scan(self):
+        """送出強制全掃描請求，回傳 (請求編號, 是否合併到尚未開始的請求)"""
+        with self._engine_lock:
+            if self._pending_scan is not None:
+                self._pending_scan["coalesced"] += 1
+                return self._pending_scan["id"], True
+            request = {"id": next(self._scan_ids), "coalesced": 0}
+            self._pending_scan = request
+        self._wake.set()
+        self._ensure_engine()
+        return request["id"], False
+    
+    def _ensure_engine(self):
+        """確保背景引擎在執行（監控中或有待處理的掃描請求時）"""
+        with self._engine_lock:
+            if self.monitor_thread is None or not self.monitor_thread.is_alive():
+                self.monitor_thread = threading.Thread(target=self.monitoring_loop, daemon=True)
+                self.monitor_thread.start()
+    
+    def _post_scan_event(self, kind, request, **data):
+        """把手動掃描的進度 / 結果交給 GUI 與共用引擎的用戶端（無介面且沒有用戶端時不需要）"""
+        if self.root is not None:
+            self.state.post_event(kind, request_id=request["id"], **data)
+        if self.engine is not None:
+            self.engine.post_event(kind, dict(request_id=request["id"], **data))
+    
+    def ensure_backend(self):
+        """第一次掃描前載入自動化模組；缺少模組時停止監控，回傳是否可以掃描"""
+        if getattr(self.backend, "loaded", True):
+            return True
+        started = time.perf_counter()
+        try:
+            self.backend.load()
+        except ImportError as e:
+            self.log(f"❌ 無法載入 UI 自動化模組: {e}", "ERROR")
+            self.monitoring = False
+            self.run_on_ui(lambda: self.toggle_btn.config(text="▶️ 開始監控", bg="#27ae60"))
+            return False
+        self.log(f"🔌 已載入 UI 自動化模組（{(time.perf_counter() - started) * 1000:.0f} ms）", "INFO")
+        return True
     
     def monitoring_loop(self):
-        """監控循環"""
-        while self.monitoring:
+        """背景引擎循環
+        
+        監控中定期掃描；手動掃描請求優先處理（立即喚醒並強制全掃描）。
+        未監控時處理完掃描請求就結束
+        """
+        while True:
+            with self._engine_lock:
+                request, self._pending_scan = self._pending_scan, None
+                if request is None and not self.monitoring:
+                    # 結束前套用最後一次掃描期間送來的命令
+                    self.apply_commands()
+                    if self.monitor_thread is threading.current_thread():
+                        self.monitor_thread = None
+                    return
             try:
-                self.scan_windows()
-                # 🆕 智慧休眠：如果有活躍視窗，掃描更頻繁
+                self.apply_commands()
+                self.rules.check()
+                if self.memory.check():
+                    self.trim_memory()
+                tier = self.tiers.update()
+                if not self.ensure_backend():
+                    if request is not None:
+                        self._post_scan_event("scan_result", request, found=False, elapsed=0.0, error="backend")
+                    continue
+                progress = None
+                if request is not None:
+                    self.last_full_scan_time = None  # 強制全掃描
+                    started = time.perf_counter()
+                    progress = lambda done, total: self._post_scan_event("scan_progress", request, done=done, total=total)
+                for profiler in self.profilers:
+                    profiler.begin_cycle()
+                self.governor.begin_cycle()
+                self._window_scans = 0
+                clicks_before = self.click_count
+                cycle_started = time.perf_counter()
+                try:
+                    found = self.scan_windows(progress=progress)
+                finally:
+                    self.governor.end_cycle()
+                    for profiler in self.profilers:
+                        profiler.end_cycle()
+                self.journal.record(event_journal.CYCLE, windows=self._window_scans,
+                                    latency_ms=(time.perf_counter() - cycle_started) * 1000,
+                                    count=self.click_count - clicks_before)
+                if found:
+                    self.governor.notify_detection()
+                self.save_warm_state()
+                if request is not None:
+                    elapsed = time.perf_counter() - started
+                    merged = f"，合併 {request['coalesced']} 個請求" if request["coalesced"] else ""
+                    if found:
+                        self.log(f"✅ 手動掃描 #{request['id']} 完成：已點擊 Allow（{elapsed:.1f} 秒{merged}）", "SUCCESS")
+                    else:
+                        self.log(f"掃描完成，未發現 Allow 按鈕（#{request['id']}，{elapsed:.1f} 秒{merged}）", "INFO")
+                    self._post_scan_event("scan_result", request, found=found, elapsed=elapsed)
+                    request = None
+                if not self.monitoring:
+                    continue
+                # 🆕 智慧休眠：如果有活躍視窗，掃描更頻繁（間隔依輪詢層級而定）
                 if self.active_windows:
-                    time.sleep(0.3)  # 有活躍視窗時，0.3 秒掃描一次
+                    interval = tier.active_interval  # 使用中：0.3 秒
                 else:
-                    time.sleep(0.8)  # 無活躍視窗時，0.8 秒掃描一次
+                    interval = tier.idle_interval  # 使用中：0.8 秒
+                # 🆕 CPU 預算：循環太耗 CPU 時延長休眠；手動掃描請求或停止監控會提早喚醒
+                if self._wake.wait(self.governor.next_interval(interval)):
+                    self._wake.clear()
             except Exception as e:
                 self.log(f"監控錯誤: {e}", "ERROR")
+                if request is not None:
+                    self._post_scan_event("scan_result", request, found=False, elapsed=0.0, error=str(e))
                 time.sleep(1)
     
+    def start_monitoring(self):
+        if not self.monitoring:
+            self.toggle_monitoring()
+    
+    def stop_monitoring(self):
+        if self.monitoring:
+            self.toggle_monitoring()
+    
     def toggle_monitoring(self):
-        """切換監控狀態"""
+        """切換監控狀態（用戶端切換的是共用引擎的監控）"""
+        if self.client is not None:
+            self.client.send("monitor", not self.monitoring)
+            return
         if not self.monitoring:
             # 開始監控
             self.monitoring = True
-            self.toggle_btn.config(text="⏸️ 停止監控", bg="#e67e22")
-            self.scan_btn.config(state=tk.DISABLED)
+            if self.root is not None:
+                self.toggle_btn.config(text="⏸️ 停止監控", bg="#e67e22")
             
             self.log("=== 開始智慧監控 ===", "SUCCESS")
             self.log(f"🔥 活躍視窗深度掃描: {self.deep_scan_depth} 層", "INFO")
             self.log(f"🔍 新視窗淺層掃描: {self.shallow_scan_depth} 層", "INFO")
+            self.log("🎚️ 掃描深度依輪詢層級的倍率調整（只有電池 + 離開時縮減）", "INFO")
             self.log(f"⏱️ 全掃描間隔: {self.full_scan_interval} 秒", "INFO")
+            if self.governor.enabled:
+                self.log(f"🔋 CPU 預算: {self.governor.cap * 100:.1f}% (找到 Allow 後 {self.governor.burst_seconds:.0f} 秒內不受限)", "INFO")
             self.log("💡 提示：找到 Allow 按鈕的視窗會被標記為活躍視窗", "INFO")
             self.log("💡 活躍視窗會優先進行深度掃描，節省資源", "INFO")
             
-            # 啟動監控執行緒
-            self.monitor_thread = threading.Thread(target=self.monitoring_loop, daemon=True)
-            self.monitor_thread.start()
+            # 啟動背景引擎（手動掃描進行中時沿用同一個執行緒）
+            self._ensure_engine()
             
-            self.update_stats(len(self.vscode_windows))
+            self.update_stats()
         else:
             # 停止監控
             self.monitoring = False
-            self.toggle_btn.config(text="▶️ 開始監控", bg="#27ae60")
-            self.scan_btn.config(state=tk.NORMAL)
+            self._wake.set()
+            if self.root is not None:
+                self.toggle_btn.config(text="▶️ 開始監控", bg="#27ae60")
             
             self.log("=== 監控已停止 ===", "WARNING")
-            self.update_stats(len(self.vscode_windows))
+            self.update_stats()
     
     def run(self):
         """運行 GUI"""
@@ -818,17 +1366,65 @@ class AutoAllowGUI:
         
         if self.ai_mode:
             self.log("🤖 AI 模式已啟用：輸出日誌到控制台", "SUCCESS")
+        
+        if self.headless:
+            self.run_headless()
+            return
             
         # 自動開始監控
         self.log("⏳ 1秒後自動開始監控...", "INFO")
-        self.root.after(1000, self.toggle_monitoring)
+        self.root.after(1000, self.start_monitoring)
         
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         self.root.mainloop()
     
+    def run_headless(self):
+        """無介面模式：直接啟動監控執行緒，Ctrl+C 結束"""
+        self.log("🖥️ 無介面模式已啟用，按 Ctrl+C 結束", "INFO")
+        self.start_monitoring()
+        try:
+            # 用戶端沒有監控執行緒：等到引擎結束且沒有接手為止
+            while True:
+                thread = self.monitor_thread
+                if thread is not None and thread.is_alive():
+                    thread.join(0.5)
+                elif self.client is not None or self._taking_over:
+                    time.sleep(0.5)
+                else:
+                    break
+        except KeyboardInterrupt:
+            self.log("=== 收到中斷，停止監控 ===", "WARNING")
+        finally:
+            self.shutdown()
+    
+    def shutdown(self, timeout=5):
+        """停止監控並輸出尚未寫出的分析結果"""
+        client, self.client = self.client, None
+        if client is not None:
+            client.close()
+        self.monitoring = False
+        with self._engine_lock:
+            self._pending_scan = None
+            thread = self.monitor_thread
+        self._wake.set()
+        if thread is not None:
+            thread.join(timeout=timeout)
+        if thread is None or not thread.is_alive():
+            self.save_warm_state(force=True)
+        for profiler in self.profilers:
+            profiler.close()
+        self.memory.stop()
+        self.journal.close()
+        # 最後才放開鎖定檔：用戶端在連線中斷後接手成為新的引擎
+        if self.engine is not None:
+            self.engine.close()
+            self.engine = None
+        if self._engine_file_lock is not None:
+            self._engine_file_lock.release()
+    
     def on_closing(self):
         """關閉視窗"""
-        self.monitoring = False
+        self.shutdown(timeout=1)
         self.root.destroy()
 
 def main():
@@ -0,0 +1,185 @@
+"""
+Allow 偵測引擎基準測試
+以合成 UI 樹驅動真正的 find_and_click_allow_button，
+量測每次循環耗時、屬性讀取次數與記憶體配置，並可與 JSON 基準比較
+
+用法：
+    python bench_detection.py --save bench_baseline.json
+    python bench_detection.py --compare bench_baseline.json --threshold 0.25
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from auto_GO_gui import AutoAllowGUI
+from synthetic_uia import ReadCounter, SyntheticBackend, generate_tree
+
+HWND = 0x1001
+
+# 固定使用隨附的範例規則檔，結果不受主機上的 detection_rules.json 影響
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "detection_rules.example.json")
+
+DENSITIES = [0.05, 0.2]
+# (深度, 位置)；None 表示樹中沒有 Allow 按鈕（最壞情況：完整走訪）
+PLACEMENTS = [None, (6, "first"), (25, "middle"), (40, "last")]
+LATENCIES_US = [0, 20]
+
+
+def scenario_key(size, density, placement, latency_us):
+    allow = "none" if placement is None else f"{placement[0]}:{placement[1]}"
+    return f"n={size}/density={density}/allow={allow}/latency_us={latency_us}"
+
+
+def make_app(size, density, placement, latency_us, seed):
+    """建立使用合成後端的無介面 AutoAllowGUI"""
+    counter = ReadCounter(latency=latency_us / 1_000_000)
+    depth, position = placement if placement else (None, "last")
+    root = generate_tree(size, button_density=density, allow_depth=depth,
+                         allow_position=position, seed=seed, counter=counter)
+    backend = SyntheticBackend()
+    backend.add_window(HWND, root)
+    app = AutoAllowGUI(argv=["--headless", "--quiet", "--no-journal", "--no-state", "--standalone", "--follow-up", "0",
+                             "--rules", RULES_PATH], backend=backend)
+    return app, counter
+
+
+def rules_digest(path=RULES_PATH):
+    """規則檔內容的雜湊（記錄在基準檔中，比較時確認兩邊使用相同的規則）"""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+def run_scenario(size, density, placement, latency_us, cycles, seed):
+    app, counter = make_app(size, density, placement, latency_us, seed)
+
+    # 暖身一次（建立快取、觸發延遲載入）
+    app.find_and_click_allow_button(HWND, deep_scan=True)
+
+    times = []
+    reads = []
+    visited = []
+    clicked = None
+    for _ in range(cycles):
+        counter.reset()
+        start = time.perf_counter()
+        result = app.find_and_click_allow_button(HWND, deep_scan=True)
+        times.append((time.perf_counter() - start) * 1000)
+        reads.append(counter.reads)
+        visited.append(counter.visited)
+        clicked = result
+
+    # 記憶體配置另外量測一次（tracemalloc 會拖慢執行）
+    counter.reset()
+    tracemalloc.start()
+    base_current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    app.find_and_click_allow_button(HWND, deep_scan=True)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "cycle_ms_median": round(statistics.median(times), 3),
+        "cycle_ms_min": round(min(times), 3),
+        "cycle_ms_max": round(max(times), 3),
+        "reads_per_cycle": int(statistics.median(reads)),
+        "visited_per_cycle": int(statistics.median(visited)),
+        "alloc_peak_kib": round((peak - base_current) / 1024, 1),
+        "clicked": bool(clicked),
+    }
+
+
+def run_suite(sizes, cycles, seed, latencies=LATENCIES_US):
+    results = {}
+    for size, density, placement, latency_us in itertools.product(sizes, DENSITIES, PLACEMENTS, latencies):
+        key = scenario_key(size, density, placement, latency_us)
+        metrics = run_scenario(size, density, placement, latency_us, cycles, seed)
+        results[key] = metrics
+        print(f"{key:60s} {metrics['cycle_ms_median']:10.2f} ms  "
+              f"{metrics['reads_per_cycle']:8d} reads  {metrics['alloc_peak_kib']:9.1f} KiB  "
+              f"{'點擊' if metrics['clicked'] else '-'}")
+    return results
+
+
+def compare(results, baseline, threshold, min_delta_ms=1.0):
+    """與基準比較，回傳退步項目列表
+
+    耗時需同時超過比例門檻與 min_delta_ms，避免亞毫秒情境的計時雜訊誤報
+    """
+    regressions = []
+    for key, metrics in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        limit = max(base["cycle_ms_median"] * (1 + threshold), base["cycle_ms_median"] + min_delta_ms)
+        if metrics["cycle_ms_median"] > limit:
+            regressions.append(f"{key}: 耗時 {base['cycle_ms_median']:.2f} → {metrics['cycle_ms_median']:.2f} ms")
+        if metrics["reads_per_cycle"] > base["reads_per_cycle"] * (1 + threshold):
+            regressions.append(f"{key}: 屬性讀取 {base['reads_per_cycle']} → {metrics['reads_per_cycle']}")
+        if metrics["clicked"] != base["clicked"]:
+            regressions.append(f"{key}: 偵測結果改變 {base['clicked']} → {metrics['clicked']}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Allow 偵測引擎基準測試")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="合成樹元素數")
+    parser.add_argument("--cycles", type=int, default=5, help="每個情境量測的循環次數")
+    parser.add_argument("--seed", type=int, default=0, help="合成樹亂數種子")
+    parser.add_argument("--no-latency", action="store_true", help="只跑無注入延遲的情境")
+    parser.add_argument("--save", metavar="PATH", help="將結果寫入 JSON 基準檔")
+    parser.add_argument("--compare", metavar="PATH", help="與 JSON 基準檔比較")
+    parser.add_argument("--threshold", type=float, default=0.25, help="允許的退步比例（預設 25%%）")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="耗時退步的最小絕對差（毫秒）")
+    args = parser.parse_args(argv)
+
+    latencies = [0] if args.no_latency else LATENCIES_US
+    print(f"Allow 偵測基準測試 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 120)
+    results = run_suite(args.sizes, args.cycles, args.seed, latencies)
+
+    if args.save:
+        payload = {
+            "meta": {
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cycles": args.cycles,
+                "seed": args.seed,
+                "rules": os.path.basename(RULES_PATH),
+                "rules_sha256": rules_digest(),
+            },
+            "results": results,
+        }
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ 已寫入基準: {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            payload = json.load(f)
+        baseline = payload["results"]
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        print("=" * 120)
+        base_rules = payload.get("meta", {}).get("rules_sha256")
+        if base_rules != rules_digest():
+            print(f"⚠️ 基準使用的規則檔不同（{base_rules or '未記錄'} → {rules_digest()}），偵測結果可能因此改變")
+        if regressions:
+            print(f"❌ 發現 {len(regressions)} 項退步（門檻 {args.threshold:.0%}）：")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"✅ 與基準相比無退步（門檻 {args.threshold:.0%}）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""
+啟動時間基準測試
+每次量測都啟動一個新的 Python 行程（冷啟動），分別記錄：
+- 各模組的匯入時間（python -X importtime）
+- 匯入 auto_GO_gui、建立 AutoAllowGUI、載入自動化模組、完成第一次掃描的時間
+
+用法：
+    python bench_startup.py                      # 合成視窗（任何平台）
+    python bench_startup.py --real               # Windows：真實 UIA 後端（含 pywinauto 載入）
+    python bench_startup.py --save startup.json
+    python bench_startup.py --compare startup.json --threshold 0.25
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+PHASES = ["import_ms", "init_ms", "backend_ms", "first_scan_ms", "to_first_scan_ms", "process_ms"]
+
+
+def child(real, elements):
+    """子行程：依序量測各階段，結果以 JSON 印到 stdout"""
+    start = time.perf_counter()
+    from auto_GO_gui import AutoAllowGUI
+    imported = time.perf_counter()
+
+    backend = None
+    if not real:
+        from synthetic_uia import SyntheticBackend, generate_tree
+        backend = SyntheticBackend()
+        backend.add_window(0x1001, generate_tree(elements, allow_depth=None))
+    prepared = time.perf_counter()
+
+    app = AutoAllowGUI(argv=["--headless", "--no-journal", "--no-state", "--standalone", "--cpu-cap", "0"], backend=backend)
+    app.log = lambda message, level="INFO": None
+    created = time.perf_counter()
+    app.ensure_backend()
+    loaded = time.perf_counter()
+    app.scan_windows()
+    scanned = time.perf_counter()
+
+    print(json.dumps({
+        "import_ms": (imported - start) * 1000,
+        "init_ms": (created - prepared) * 1000,
+        "backend_ms": (loaded - created) * 1000,
+        "first_scan_ms": (scanned - loaded) * 1000,
+        # 不含建立合成樹的時間
+        "to_first_scan_ms": (scanned - start - (prepared - imported)) * 1000,
+    }))
+
+
+def measure_once(real, elements):
+    command = [sys.executable, os.path.abspath(__file__), "--child", "--elements", str(elements)]
+    if real:
+        command.append("--real")
+    started = time.perf_counter()
+    output = subprocess.run(command, cwd=HERE, capture_output=True, text=True, check=True).stdout
+    elapsed = (time.perf_counter() - started) * 1000
+    result = json.loads(output.strip().splitlines()[-1])
+    result["process_ms"] = elapsed
+    return result
+
+
+def import_times(top):
+    """以 -X importtime 冷啟動匯入 auto_GO_gui，回傳 [(模組, 自身 us, 累計 us)]，依累計時間排序"""
+    command = [sys.executable, "-X", "importtime", "-c", "import auto_GO_gui"]
+    stderr = subprocess.run(command, cwd=HERE, capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    rows.sort(key=lambda row: row[2], reverse=True)
+    return rows[:top]
+
+
+def compare(results, baseline, threshold, min_delta_ms=5.0):
+    """中位數同時超過比例門檻與 min_delta_ms 才算退步（行程啟動時間雜訊較大）"""
+    regressions = []
+    for key in PHASES:
+        base = baseline.get(key)
+        if base is None or key not in results:
+            continue
+        limit = max(base * (1 + threshold), base + min_delta_ms)
+        if results[key] > limit:
+            regressions.append(f"{key}: {base:.1f} → {results[key]:.1f} ms")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="啟動時間基準測試")
+    parser.add_argument("--runs", type=int, default=5, help="冷啟動次數（取中位數）")
+    parser.add_argument("--real", action="store_true", help="使用真實 UIA 後端（僅限 Windows）")
+    parser.add_argument("--elements", type=int, default=3000, help="合成視窗的元素數")
+    parser.add_argument("--top", type=int, default=20, help="列出匯入最久的前 N 個模組")
+    parser.add_argument("--save", metavar="PATH", help="將結果寫入 JSON 基準檔")
+    parser.add_argument("--compare", metavar="PATH", help="與 JSON 基準檔比較")
+    parser.add_argument("--threshold", type=float, default=0.25, help="允許的退步比例（預設 25%%）")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="退步的最小絕對差（毫秒）")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        child(args.real, args.elements)
+        return 0
+
+    print(f"啟動時間基準測試 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}  "
+          f"({'真實 UIA' if args.real else f'合成視窗 {args.elements} 元素'}，{args.runs} 次冷啟動)")
+    print("=" * 80)
+
+    modules = import_times(args.top)
+    print(f"{'模組':40s} {'自身 ms':>10s} {'累計 ms':>10s}")
+    for name, self_us, cumulative_us in modules:
+        print(f"{name:40s} {self_us / 1000:10.2f} {cumulative_us / 1000:10.2f}")
+
+    runs = [measure_once(args.real, args.elements) for _ in range(args.runs)]
+    results = {key: round(statistics.median(run[key] for run in runs), 2) for key in PHASES}
+    print("=" * 80)
+    print(f"{'階段':24s} {'中位數 ms':>10s} {'最小 ms':>10s} {'最大 ms':>10s}")
+    for key in PHASES:
+        values = [run[key] for run in runs]
+        print(f"{key:24s} {results[key]:10.2f} {min(values):10.2f} {max(values):10.2f}")
+
+    if args.save:
+        payload = {
+            "meta": {
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "runs": args.runs,
+                "real": args.real,
+                "elements": args.elements,
+            },
+            "results": results,
+            "imports": [{"module": name, "self_us": s, "cumulative_us": c} for name, s, c in modules],
+        }
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ 已寫入基準: {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        print("=" * 80)
+        if regressions:
+            print(f"❌ 發現 {len(regressions)} 項退步（門檻 {args.threshold:.0%}）：")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"✅ 與基準相比無退步（門檻 {args.threshold:.0%}）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
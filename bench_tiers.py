@@ -0,0 +1,129 @@
+"""
+輪詢層級模擬
+以 SimulatedActivitySignals 與模擬時鐘驅動 TierPolicy：鍵鼠輸入、插拔電源、Allow 點擊 / 標題變更，
+檢查每個檢查點選到的層級，並統計依各層級間隔輪詢時的喚醒次數；有層級不符時結束碼為 1
+
+用法：
+    python bench_tiers.py
+    python bench_tiers.py --scenario battery --verbose
+"""
+
+import argparse
+import sys
+from collections import namedtuple
+
+from activity_tiers import SimulatedActivitySignals, TierPolicy
+
+# 檢查點依這兩個門檻（與 auto_GO_gui 的預設值相同）計算
+IDLE_AFTER = 300.0
+AGENT_HOLD = 60.0
+
+# timeline：[(秒數, "input" / "ac" / "battery")]；activity：[(秒數, 原因)] 以 note_activity 送入；
+# checkpoints：[(秒數, 預期層級名稱)]
+Scenario = namedtuple("Scenario", "name description timeline activity checkpoints")
+
+SCENARIOS = [
+    Scenario(
+        "desk", "接上電源持續操作 30 分鐘後離開",
+        [(0, "ac")] + [(t, "input") for t in range(0, 1800, 60)],
+        [],
+        [(30, "interactive"), (1790, "interactive"), (2039, "interactive"), (2041, "away"), (4000, "away")],
+    ),
+    Scenario(
+        "battery", "拔掉電源、閒置、重新接上電源、回來操作",
+        [(0, "ac"), (0, "input"), (100, "input"), (200, "battery"), (250, "input"), (600, "ac"), (700, "input")],
+        [],
+        [(150, "interactive"), (210, "battery"), (549, "battery"), (551, "battery_away"),
+         (650, "away"), (700, "interactive")],
+    ),
+    Scenario(
+        "agent", "Allow 點擊與標題變更維持「代理工作中」60 秒，離開時也一樣",
+        [(0, "ac"), (0, "input")],
+        [(100, "點擊 Allow"), (130, "視窗標題變更"), (400, "點擊 Allow")],
+        [(90, "interactive"), (100, "agent"), (189, "agent"), (191, "interactive"), (350, "away"),
+         (400, "agent"), (461, "away")],
+    ),
+    Scenario(
+        "desktop", "桌機（電源狀態未知）不會進入電池層級",
+        [(t, "input") for t in range(0, 600, 30)],
+        [],
+        [(10, "interactive"), (590, "interactive"), (869, "interactive"), (871, "away")],
+    ),
+]
+
+
+class SimulatedClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def run_scenario(scenario, idle_after, agent_hold, verbose=False):
+    """回傳 (不符的檢查點列表, 各層級停留秒數, 喚醒次數)"""
+    clock = SimulatedClock()
+    signals = SimulatedActivitySignals(scenario.timeline, clock)
+    transitions = []
+    policy = TierPolicy(signals, idle_after=idle_after, agent_hold=agent_hold, clock=clock,
+                        log=lambda message, level="INFO": transitions.append((clock.now, message)))
+
+    activity = sorted(scenario.activity)
+    checkpoints = sorted(scenario.checkpoints)
+    end = checkpoints[-1][0] if checkpoints else 0
+
+    # 依目前層級的間隔輪詢（沒有活躍視窗），檢查點與活動時間一定會評估一次
+    stops = sorted({t for t, _ in checkpoints} | {t for t, _ in activity})
+    mismatches = []
+    dwell = {}
+    wakeups = 0
+    while clock.now <= end:
+        while activity and activity[0][0] <= clock.now:
+            policy.note_activity(activity.pop(0)[1])
+        tier = policy.update()
+        wakeups += 1
+        while checkpoints and checkpoints[0][0] <= clock.now:
+            t, expected = checkpoints.pop(0)
+            if tier.name != expected:
+                mismatches.append(f"{t:.0f} 秒: 預期 {expected}，實際 {tier.name}")
+        next_stop = next((t for t in stops if t > clock.now), None)
+        step = tier.idle_interval if next_stop is None else min(tier.idle_interval, next_stop - clock.now)
+        dwell[tier.name] = dwell.get(tier.name, 0.0) + step
+        clock.now += step
+
+    if verbose:
+        for t, message in transitions:
+            print(f"    {t:8.1f}s  {message}")
+    return mismatches, dwell, wakeups
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="以模擬訊號檢查輪詢層級的切換")
+    parser.add_argument("--scenario", choices=[s.name for s in SCENARIOS], help="只執行一個情境")
+    parser.add_argument("--verbose", action="store_true", help="列出每次層級切換")
+    args = parser.parse_args(argv)
+
+    print(f"{'情境':10s} {'檢查點':>6s} {'不符':>4s} {'喚醒':>7s}  各層級停留秒數")
+    print("=" * 100)
+    failed = 0
+    for scenario in SCENARIOS:
+        if args.scenario and scenario.name != args.scenario:
+            continue
+        mismatches, dwell, wakeups = run_scenario(scenario, IDLE_AFTER, AGENT_HOLD, args.verbose)
+        dwell_text = "  ".join(f"{name} {seconds:.0f}" for name, seconds in dwell.items())
+        print(f"{scenario.name:10s} {len(scenario.checkpoints):6d} {len(mismatches):4d} {wakeups:7d}  {dwell_text}"
+              f"  （{scenario.description}）")
+        for line in mismatches:
+            print(f"  ❌ {line}")
+        failed += len(mismatches)
+
+    print("=" * 100)
+    if failed:
+        print(f"❌ {failed} 個檢查點的層級不符")
+        return 1
+    print("✅ 所有檢查點的層級都符合")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+畫面比對備援基準測試
+以合成的 VS Code 畫面（含狀態列、外框、色塊等干擾元素）量測每張畫面的比對耗時，
+並檢查是否找到正確的按鈕、沒有 Allow 按鈕的畫面是否誤判
+
+用法：
+    python bench_visual.py --size 1920x1080 --frames 40
+    python bench_visual.py --save visual_baseline.json
+    python bench_visual.py --compare visual_baseline.json --threshold 0.25
+"""
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+
+from visual_fallback import BUTTON_COLORS, VisualDetector, make_screenshot
+
+
+def make_frames(width, height, count, seed):
+    """一半的畫面有 Allow 按鈕（位置、大小、顏色隨機，落在聊天面板內），一半沒有"""
+    rng = random.Random(seed)
+    frames = []
+    for i in range(count):
+        button = None
+        if i % 2 == 0:
+            w, h = rng.randint(50, 120), rng.randint(20, 30)
+            left = rng.randint(int(width * 0.64), width - 2 * w - 20)
+            top = rng.randint(40, height - 160)
+            button = (left, top, w, h)
+        color = rng.choice(BUTTON_COLORS)
+        frames.append((make_screenshot(width, height, button=button, seed=seed + i, color=color), button))
+    return frames
+
+
+def run(width, height, count, repeats, seed):
+    detector = VisualDetector()
+    frames = make_frames(width, height, count, seed)
+    times = []
+    hits = misses = false_positives = 0
+    for pixels, button in frames:
+        detector.detect(pixels)  # 暖身
+        for _ in range(repeats):
+            start = time.perf_counter()
+            match = detector.detect(pixels)
+            times.append((time.perf_counter() - start) * 1000)
+        if button is None:
+            false_positives += match is not None
+        elif match is not None and (match.left, match.top, match.width, match.height) == button:
+            hits += 1
+        else:
+            misses += 1
+    times.sort()
+    return {
+        "frame_ms_median": round(statistics.median(times), 3),
+        "frame_ms_p95": round(times[int(len(times) * 0.95) - 1], 3),
+        "frame_ms_max": round(times[-1], 3),
+        "hits": hits,
+        "misses": misses,
+        "false_positives": false_positives,
+    }
+
+
+def compare(results, baseline, threshold, min_delta_ms=0.5):
+    regressions = []
+    base = baseline["frame_ms_median"]
+    limit = max(base * (1 + threshold), base + min_delta_ms)
+    if results["frame_ms_median"] > limit:
+        regressions.append(f"耗時 {base:.2f} → {results['frame_ms_median']:.2f} ms")
+    for key in ("misses", "false_positives"):
+        if results[key] > baseline[key]:
+            regressions.append(f"{key}: {baseline[key]} → {results[key]}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="畫面比對備援基準測試")
+    parser.add_argument("--size", default="1920x1080", help="畫面大小（寬x高）")
+    parser.add_argument("--frames", type=int, default=20, help="合成畫面數")
+    parser.add_argument("--repeats", type=int, default=5, help="每張畫面量測次數")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", metavar="PATH", help="將結果寫入 JSON 基準檔")
+    parser.add_argument("--compare", metavar="PATH", help="與 JSON 基準檔比較")
+    parser.add_argument("--threshold", type=float, default=0.25, help="允許的退步比例（預設 25%%）")
+    args = parser.parse_args(argv)
+
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    print(f"畫面比對基準測試 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}  ({width}x{height}，{args.frames} 張)")
+    print("=" * 80)
+    results = run(width, height, args.frames, args.repeats, args.seed)
+    print(f"每張畫面: 中位數 {results['frame_ms_median']:.2f} ms, p95 {results['frame_ms_p95']:.2f} ms, "
+          f"最大 {results['frame_ms_max']:.2f} ms")
+    print(f"找到 {results['hits']}，漏找 {results['misses']}，誤判 {results['false_positives']}")
+
+    if args.save:
+        payload = {
+            "meta": {
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "size": args.size,
+                "frames": args.frames,
+                "seed": args.seed,
+            },
+            "results": results,
+        }
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ 已寫入基準: {args.save}")
+
+    failed = results["misses"] or results["false_positives"]
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        print("=" * 80)
+        if regressions:
+            print(f"❌ 發現 {len(regressions)} 項退步（門檻 {args.threshold:.0%}）：")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"✅ 與基準相比無退步（門檻 {args.threshold:.0%}）")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
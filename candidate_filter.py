@@ -0,0 +1,127 @@
+"""
+Allow 候選按鈕的批次篩選
+一個視窗中同一類型的所有按鈕先收集成欄位，名稱長度與大小規則以遮罩（索引 / 布林列表）一次套用，
+關鍵字比對只對通過長度規則的元素執行；啟用 / 可見 / AutomationId / 大小只讀取通過關鍵字比對的元素
+（這些都是跨行程的 UIA 呼叫，不對被名稱規則排除的元素讀取）
+
+結果依原本逐一檢查的順序排列：第一個候選就是原本會點擊的按鈕，點擊失敗時再試下一個
+按鈕分批處理（批次大小從 FIRST_CHUNK 倍增到 MAX_CHUNK），Allow 按鈕在前面時不必讀完整個視窗，
+多讀的名稱最多一個批次
+批次最多 128 個元素，numpy 向量化只快幾個百分點卻要在啟動時多花約 100 ms 匯入，因此只用純 Python
+"""
+
+from collections import namedtuple
+
+Candidate = namedtuple("Candidate", "wrapper name matched")
+
+# 無法讀取的布林屬性（原本的逐一檢查遇到例外時視為通過）
+UNKNOWN = -1
+
+FIRST_CHUNK = 8
+MAX_CHUNK = 128
+
+
+def read_name(wrapper):
+    """更新快取後讀取名稱，無法讀取時回傳 None（原本遇到例外就略過該元素）"""
+    try:
+        wrapper.element_info.update()
+    except Exception:
+        pass
+    try:
+        return wrapper.element_info.name or ""
+    except Exception:
+        return None
+
+
+def _read_flag(method):
+    try:
+        return 1 if method() else 0
+    except Exception:
+        return UNKNOWN
+
+
+def _read_id(wrapper):
+    try:
+        return getattr(wrapper.element_info, "automation_id", "") or ""
+    except Exception:
+        return None
+
+
+def _read_size(wrapper):
+    try:
+        rect = wrapper.rectangle()
+        return rect.right - rect.left, rect.bottom - rect.top
+    except Exception:
+        return None
+
+
+def _length_mask(names, max_length):
+    """名稱長度在上限內的元素索引（無法讀取名稱的元素排除）"""
+    return [i for i, n in enumerate(names) if n is not None and len(n) <= max_length]
+
+
+def _property_mask(enabled, visible, sizes, rules):
+    """啟用、可見、大小都通過的位置（無法讀取的屬性視為通過）"""
+    return [e != 0 and v != 0 and (s is None or rules.size_ok(*s)) for e, v, s in zip(enabled, visible, sizes)]
+
+
+def iter_candidates(wrappers, rules, on_suspicious=None):
+    """依檢查順序逐批產生候選按鈕，呼叫端點擊成功就可以停止（後面的按鈕不再讀取）
+
+    Args:
+        wrappers: descendants() 回傳的按鈕列表
+        rules: CompiledRules
+        on_suspicious: 因 AutomationId 可疑而排除時呼叫 on_suspicious(name, automation_id)，
+            與原本逐一檢查一樣只對走訪到的元素呼叫
+    """
+    start = 0
+    chunk = FIRST_CHUNK
+    while start < len(wrappers):
+        for candidate, suspicious_id in _filter_chunk(wrappers[start:start + chunk], rules):
+            if suspicious_id is None:
+                yield candidate
+            elif on_suspicious is not None:
+                on_suspicious(candidate.name, suspicious_id)
+        start += chunk
+        chunk = min(chunk * 2, MAX_CHUNK)
+
+
+def filter_candidates(wrappers, rules, on_suspicious=None):
+    """篩選整批按鈕，回傳依檢查順序排列的 [Candidate, ...]"""
+    return list(iter_candidates(wrappers, rules, on_suspicious))
+
+
+def _filter_chunk(wrappers, rules):
+    """回傳依檢查順序排列的 [(Candidate, 可疑的 AutomationId 或 None), ...]"""
+    names = [read_name(w) for w in wrappers]
+
+    # 第一階段：長度遮罩 → 關鍵字比對（只對通過長度規則的名稱）
+    matched = []
+    for i in _length_mask(names, rules.max_name_length):
+        name = names[i]
+        name_lower = name.lower()
+        if rules.is_excluded(name_lower):
+            continue
+        pattern = rules.match_allow(name, name_lower)
+        if pattern is not None:
+            matched.append((i, pattern))
+    if not matched:
+        return []
+
+    # 第二階段：只讀取通過關鍵字比對的元素的屬性，收集成欄位後一次套用
+    survivors = [wrappers[i] for i, _ in matched]
+    enabled = [_read_flag(w.is_enabled) for w in survivors]
+    visible = [_read_flag(w.is_visible) for w in survivors]
+    automation_ids = [_read_id(w) for w in survivors]
+    sizes = [_read_size(w) for w in survivors]
+    passed = _property_mask(enabled, visible, sizes, rules)
+
+    results = []
+    for (i, pattern), ok, e, v, automation_id in zip(matched, passed, enabled, visible, automation_ids):
+        candidate = Candidate(wrappers[i], names[i], pattern)
+        # AutomationId 可疑的元素（原本在啟用、可見檢查之後才判斷並寫入日誌）
+        if e != 0 and v != 0 and automation_id is not None and rules.is_suspicious_id(automation_id):
+            results.append((candidate, automation_id))
+        elif ok:
+            results.append((candidate, None))
+    return results
@@ -0,0 +1,111 @@
+"""
+監控循環 CPU 預算控制器
+量測每次循環花費的進程 CPU 時間，調整休眠間隔與掃描深度，
+讓平均 CPU 使用率維持在上限以下；偵測到 Allow 按鈕後短暫允許超出上限
+"""
+
+import time
+from collections import deque
+
+
+class CpuGovernor:
+    """依 CPU 預算決定下一次休眠時間與掃描深度
+
+    Args:
+        cap: CPU 使用上限（單核心比例，0.02 = 2%）
+        window: 計算平均使用率的時間窗（秒）
+        max_interval: 最長休眠間隔（秒），超過仍不夠時改為降低掃描深度
+        min_depth: 節流時的最淺掃描深度
+        burst_seconds: 偵測到 Allow 按鈕後允許超出上限的時間（秒）
+    """
+
+    MAX_LEVEL = 4
+    DEPTH_FACTOR = 0.75
+
+    def __init__(self, cap=0.02, window=30.0, max_interval=5.0, min_depth=10, burst_seconds=20.0,
+                 clock=time.monotonic, cpu_clock=time.process_time):
+        self.cap = cap
+        self.window = window
+        self.max_interval = max_interval
+        self.min_depth = min_depth
+        self.burst_seconds = burst_seconds
+        self._clock = clock
+        self._cpu_clock = cpu_clock
+
+        self.level = 0  # 節流等級：0 = 不降深度
+        self.cycle_cpu = 0.0  # 每次循環 CPU 時間（指數移動平均，秒）
+        self.measured = 0.0  # 時間窗內的平均 CPU 使用率
+        self._last_cycle_wall = 0.0
+        self._burst_until = 0.0
+        self._cycle_start = None
+        self._samples = deque()  # [(wall, cpu)]
+
+    @property
+    def enabled(self):
+        return self.cap > 0
+
+    @property
+    def bursting(self):
+        return self._clock() < self._burst_until
+
+    def begin_cycle(self):
+        self._cycle_start = (self._clock(), self._cpu_clock())
+
+    def end_cycle(self):
+        if self._cycle_start is None:
+            return
+        wall0, cpu0 = self._cycle_start
+        wall1, cpu1 = self._clock(), self._cpu_clock()
+        self._cycle_start = None
+
+        cpu = max(0.0, cpu1 - cpu0)
+        self._last_cycle_wall = max(0.0, wall1 - wall0)
+        self.cycle_cpu = cpu if self.cycle_cpu == 0.0 else 0.7 * self.cycle_cpu + 0.3 * cpu
+
+        # 時間窗內平均使用率（含休眠期間其他執行緒的 CPU，例如 Tk 主線程）
+        self._samples.append((wall1, cpu1))
+        while len(self._samples) > 2 and wall1 - self._samples[0][0] > self.window:
+            self._samples.popleft()
+        first_wall, first_cpu = self._samples[0]
+        if wall1 > first_wall:
+            self.measured = (cpu1 - first_cpu) / (wall1 - first_wall)
+
+        self._adjust_level()
+
+    def notify_detection(self):
+        """找到 Allow 按鈕：接下來一段時間以最快速度掃描"""
+        self._burst_until = self._clock() + self.burst_seconds
+        self.level = 0
+
+    def _adjust_level(self):
+        if not self.enabled or self.bursting:
+            return
+        needed_sleep = self.cycle_cpu / self.cap - self._last_cycle_wall
+        if needed_sleep > self.max_interval or self.measured > self.cap * 1.1:
+            self.level = min(self.MAX_LEVEL, self.level + 1)
+        elif self.level and self.measured < self.cap * 0.6 and needed_sleep < self.max_interval * 0.5:
+            self.level -= 1
+
+    def next_interval(self, base_interval):
+        """下一次循環前的休眠秒數"""
+        if not self.enabled or self.bursting:
+            return base_interval
+        # 週期 = 循環 CPU / 上限，扣除循環本身的耗時
+        needed_sleep = self.cycle_cpu / self.cap - self._last_cycle_wall
+        return min(self.max_interval, max(base_interval, needed_sleep))
+
+    def scan_depth(self, base_depth):
+        """依節流等級縮減掃描深度"""
+        if not self.enabled or self.level == 0 or self.bursting:
+            return base_depth
+        return max(min(self.min_depth, base_depth), int(base_depth * self.DEPTH_FACTOR ** self.level))
+
+    def status_text(self):
+        """統計面板顯示用的節流狀態"""
+        if not self.enabled:
+            return "停用"
+        if self.bursting:
+            return "⚡ 爆發"
+        if self.level:
+            return f"🐢 節流 L{self.level}"
+        return "正常"
@@ -0,0 +1,212 @@
+"""
+Allow 偵測規則
+規則檔（JSON）編譯成一次建好的比對器：關鍵字合併成單一正規表示式、完全相符的名稱放進集合
+監控循環之間只檢查檔案的修改時間，有變更才重新載入；新規則整個替換（單一參照指派），
+檔案無效時保留目前的規則
+
+規則檔只需寫要覆寫的欄位，其餘沿用 DEFAULT_RULES
+"""
+
+import json
+import os
+import re
+import sys
+from collections import namedtuple
+
+RULES_FILENAME = "detection_rules.json"
+
+DEFAULT_RULES = {
+    # 只搜尋真正的按鈕類型，不搜尋 Text 和 Hyperlink（這些類型最容易造成誤點擊）
+    "button_types": ["Button", "SplitButton"],
+    # 名稱包含這些字就排除（不分大小寫）
+    "exclude_keywords": [
+        # 檔案/資料夾相關
+        "section", "explorer", "folder", "directory", "file",
+        # 否定詞
+        "disallow", "不允許", "deny", "reject", "cancel",
+        # 程式相關
+        "autoallow", "auto_allow", "auto-allow",
+        # 對話/聊天區域（避免點到聊天內容）
+        "chat", "message", "conversation", "response",
+        # 編輯器相關
+        "editor", "tab", "panel", "view", "tree",
+        # 其他 UI 元素
+        "menu", "toolbar", "statusbar", "sidebar",
+    ],
+    # 名稱超過此長度視為內容而非按鈕
+    "max_name_length": 50,
+    # 名稱等於這些字，或名稱短於 short_name_length 且包含這些字，視為 Allow 按鈕
+    "allow_patterns": ["allow", "允許", "accept", "接受", "confirm", "確認", "yes", "是", "ok", "確定"],
+    "short_name_length": 20,
+    # automation_id 包含這些字就跳過
+    "suspicious_ids": ["editor", "chat", "message", "text", "content"],
+    # 按鈕大小範圍（像素）
+    "min_width": 20,
+    "min_height": 15,
+    "max_width": 500,
+    "max_height": 100,
+    # 掃描深度
+    "deep_scan_depth": 50,
+    "shallow_scan_depth": 20,
+}
+
+_LIST_KEYS = ("button_types", "exclude_keywords", "allow_patterns", "suspicious_ids")
+_INT_KEYS = ("max_name_length", "short_name_length", "min_width", "min_height", "max_width", "max_height",
+             "deep_scan_depth", "shallow_scan_depth")
+
+
+class RulesError(ValueError):
+    """規則檔內容無效"""
+
+
+def _keyword_regex(words):
+    """多個關鍵字合併成一個正規表示式（較長的在前），空列表回傳 None"""
+    words = sorted({w.lower() for w in words if w}, key=len, reverse=True)
+    if not words:
+        return None
+    return re.compile("|".join(re.escape(w) for w in words))
+
+
+class CompiledRules(namedtuple("CompiledRules", "source button_types max_name_length short_name_length "
+                                                 "min_width min_height max_width max_height "
+                                                 "deep_scan_depth shallow_scan_depth raw "
+                                                 "exclude_re allow_exact allow_re suspicious_re")):
+    """編譯後的規則（不可變，可在執行緒間共用）"""
+
+    __slots__ = ()
+
+    def is_excluded(self, name_lower):
+        return self.exclude_re is not None and self.exclude_re.search(name_lower) is not None
+
+    def match_allow(self, name, name_lower):
+        """回傳符合的 Allow 關鍵字，不符合時回傳 None"""
+        if len(name) > self.max_name_length:
+            return None
+        if name_lower in self.allow_exact:
+            return name_lower
+        if self.allow_re is not None and len(name) < self.short_name_length:
+            match = self.allow_re.search(name_lower)
+            if match:
+                return match.group(0)
+        return None
+
+    def is_suspicious_id(self, automation_id):
+        return self.suspicious_re is not None and self.suspicious_re.search(automation_id.lower()) is not None
+
+    def size_ok(self, width, height):
+        if width < self.min_width or height < self.min_height:
+            return False
+        if width > self.max_width or height > self.max_height:
+            return False
+        return True
+
+
+def compile_rules(overrides=None, source="預設"):
+    """驗證並編譯規則，無效時丟出 RulesError"""
+    if overrides is None:
+        overrides = {}
+    if not isinstance(overrides, dict):
+        raise RulesError("規則檔必須是 JSON 物件")
+    unknown = sorted(set(overrides) - set(DEFAULT_RULES))
+    if unknown:
+        raise RulesError(f"未知的欄位: {', '.join(unknown)}")
+
+    raw = dict(DEFAULT_RULES)
+    raw.update(overrides)
+    for key in _LIST_KEYS:
+        value = raw[key]
+        if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+            raise RulesError(f"{key} 必須是字串列表")
+    for key in _INT_KEYS:
+        value = raw[key]
+        if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+            raise RulesError(f"{key} 必須是非負整數")
+    if not raw["button_types"]:
+        raise RulesError("button_types 不可為空")
+    if not raw["allow_patterns"]:
+        raise RulesError("allow_patterns 不可為空")
+    if raw["min_width"] > raw["max_width"] or raw["min_height"] > raw["max_height"]:
+        raise RulesError("按鈕大小下限不可大於上限")
+    if raw["deep_scan_depth"] < 1 or raw["shallow_scan_depth"] < 1:
+        raise RulesError("掃描深度至少為 1")
+
+    return CompiledRules(
+        source=source,
+        button_types=tuple(raw["button_types"]),
+        max_name_length=raw["max_name_length"],
+        short_name_length=raw["short_name_length"],
+        min_width=raw["min_width"],
+        min_height=raw["min_height"],
+        max_width=raw["max_width"],
+        max_height=raw["max_height"],
+        deep_scan_depth=raw["deep_scan_depth"],
+        shallow_scan_depth=raw["shallow_scan_depth"],
+        raw=raw,
+        exclude_re=_keyword_regex(raw["exclude_keywords"]),
+        allow_exact=frozenset(p.lower() for p in raw["allow_patterns"]),
+        allow_re=_keyword_regex(raw["allow_patterns"]),
+        suspicious_re=_keyword_regex(raw["suspicious_ids"]),
+    )
+
+
+def load_rules(path):
+    """讀取並編譯規則檔"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            overrides = json.load(f)
+    except ValueError as e:
+        raise RulesError(f"JSON 格式錯誤: {e}")
+    return compile_rules(overrides, source=path)
+
+
+def default_rules_path():
+    """打包成 exe 時為 exe 所在目錄，否則為程式所在目錄"""
+    if getattr(sys, "frozen", False):
+        base = os.path.dirname(sys.executable)
+    else:
+        base = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base, RULES_FILENAME)
+
+
+class RulesWatcher:
+    """監看規則檔，current 永遠是一份完整有效的 CompiledRules
+
+    check() 只做一次 os.stat；檔案不存在時使用預設規則
+    """
+
+    def __init__(self, path, log=None):
+        self.path = path
+        self.log = log or (lambda msg, level="INFO": None)
+        self.current = compile_rules()
+        self._stamp = None
+        self.check()
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def check(self):
+        """檔案有變更時重新載入，回傳 True 表示規則已替換"""
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return False
+        self._stamp = stamp
+
+        if stamp is None:
+            if self.current.source != "預設":
+                self.current = compile_rules()
+                self.log(f"📜 規則檔已移除，改用預設規則: {self.path}", "WARNING")
+                return True
+            return False
+
+        try:
+            rules = load_rules(self.path)
+        except (OSError, RulesError) as e:
+            self.log(f"❌ 規則檔無效，保留目前的規則: {e}", "ERROR")
+            return False
+        self.current = rules
+        self.log(f"📜 已載入規則檔: {self.path}", "SUCCESS")
+        return True
@@ -0,0 +1,362 @@
+"""
+單一共用掃描引擎與本機 IPC
+同時開啟 GUI 與 --ai-mode（或多個複本）時，只有取得鎖定檔的程序執行監控循環（引擎），
+其他程序以用戶端連線：訂閱狀態快照、日誌與掃描事件，並把開始 / 停止、立即掃描、重置等命令送給引擎。
+不論連上幾個用戶端，每個視窗每次循環只走訪一次，也不會有兩個程序搶著點擊同一個按鈕
+
+- 鎖定檔 engine.lock：以 msvcrt.locking / fcntl.flock 鎖定，程序結束（包括當機）時由作業系統釋放
+- 連線資訊 engine.json：位址與驗證金鑰，只有目前使用者可讀
+- 通道：multiprocessing.connection；Windows 為具名管道，其他平台為 Unix socket
+
+訊息（皆為 tuple）：
+    引擎 → 用戶端: ("hello", 最近的日誌, 快照, 是否監控中)、("batch", [訊息, ...])、("bye",)（引擎結束）
+        批次內: ("log", 訊息, 等級)、("event", 種類, 資料)、("snapshot", 快照, 是否監控中)
+    用戶端 → 引擎: ("monitor", True/False)、("scan",)、("command", 名稱)
+"""
+
+import json
+import os
+import queue
+import secrets
+import socket
+import sys
+import tempfile
+import threading
+from collections import deque
+from multiprocessing.connection import Client, Listener
+
+LOCK_FILENAME = "engine.lock"
+INFO_FILENAME = "engine.json"
+
+# 新用戶端連上時補送的最近日誌行數
+LOG_BACKLOG = 200
+
+# 等待推送的日誌 / 事件上限（超過時丟掉最舊的）
+OUTBOX_LIMIT = 2000
+
+# 每個用戶端最多排隊的批次數；超過表示用戶端停止讀取（例如程序被暫停），中斷該用戶端
+CLIENT_QUEUE = 64
+
+
+def default_engine_dir():
+    """Windows 為 %LOCALAPPDATA%\\VSCodeAutoAllow，其他平台為暫存目錄下的每使用者目錄"""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or tempfile.gettempdir()
+        return os.path.join(base, "VSCodeAutoAllow")
+    return os.path.join(tempfile.gettempdir(), f"vscode-autoallow-{os.getuid()}")
+
+
+def _family():
+    return "AF_PIPE" if sys.platform == "win32" else "AF_UNIX"
+
+
+def _shutdown(conn):
+    """關閉 socket 的雙向傳輸：POSIX 上 conn.close() 不會喚醒其他執行緒阻塞中的 recv()，
+    shutdown 讓本程序與對方的 recv() 都立即收到連線結束（Windows 具名管道不需要）"""
+    if _family() != "AF_UNIX":
+        return
+    try:
+        with socket.fromfd(conn.fileno(), socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+class EngineLock:
+    """不阻塞的獨占鎖；acquire() 成功的程序就是引擎，直到 release() 或程序結束"""
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, LOCK_FILENAME)
+        self._file = None
+
+    def acquire(self):
+        if self._file is not None:
+            return True
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        f = open(self.path, "a+b")
+        try:
+            if sys.platform == "win32":
+                import msvcrt
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._file = f
+        return True
+
+    def release(self):
+        if self._file is None:
+            return
+        try:
+            if sys.platform == "win32":
+                import msvcrt
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        except OSError:
+            pass
+        self._file.close()
+        self._file = None
+
+
+class _ClientLink:
+    """引擎端的單一用戶端連線：自己的送出佇列與送出執行緒，卡住的用戶端不會擋住推送與接受新連線"""
+
+    def __init__(self, conn, on_broken):
+        self.conn = conn
+        self._queue = queue.Queue(maxsize=CLIENT_QUEUE)
+        self._on_broken = on_broken
+        self._thread = threading.Thread(target=self._send_loop, daemon=True)
+        self._thread.start()
+
+    def push(self, message):
+        """排入送出佇列，佇列已滿時回傳 False"""
+        try:
+            self._queue.put_nowait(message)
+            return True
+        except queue.Full:
+            return False
+
+    def _send_loop(self):
+        while True:
+            message = self._queue.get()
+            if message is None:
+                return
+            try:
+                self.conn.send(message)
+            except Exception:
+                self._on_broken(self)
+                return
+
+    def close(self, drain_timeout=0.0):
+        """停止送出並關閉連線；drain_timeout > 0 時先等已排隊的訊息送完（最多該秒數）"""
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        if drain_timeout and threading.current_thread() is not self._thread:
+            self._thread.join(drain_timeout)
+        _shutdown(self.conn)
+        self.conn.close()
+
+
+class EngineServer:
+    """引擎端：接受用戶端連線，定期批次推送日誌、事件與新快照，把收到的命令交給 on_command
+
+    Args:
+        directory: 鎖定檔與連線資訊所在目錄（呼叫端須已取得 EngineLock）
+        on_command: on_command(*訊息)，在各用戶端的接收執行緒呼叫
+        state: state() 回傳 (最新快照, 是否監控中)
+        interval: 推送間隔（秒）
+    """
+
+    def __init__(self, directory, on_command, state, interval=0.25, log=None):
+        self.directory = directory
+        self.on_command = on_command
+        self.state = state
+        self.interval = interval
+        self.log = log or (lambda msg, level="INFO": None)
+        self.info_path = os.path.join(directory, INFO_FILENAME)
+        self._authkey = secrets.token_bytes(32)
+        if _family() == "AF_PIPE":
+            self.address = rf"\\.\pipe\vscode-autoallow-{secrets.token_hex(8)}"
+        else:
+            self.address = os.path.join(directory, "engine.sock")
+        self._listener = None
+        self._clients = []
+        self._lock = threading.Lock()  # 保護 _clients（送出在各連線自己的執行緒，不持有此鎖）
+        self._outbox = deque(maxlen=OUTBOX_LIMIT)  # 等待推送的 ("log" / "event", ...) 訊息
+        self._backlog = deque(maxlen=LOG_BACKLOG)
+        self._sent_state = None
+        self._stop = threading.Event()
+        self._threads = []
+
+    @property
+    def client_count(self):
+        return len(self._clients)
+
+    def start(self):
+        if _family() == "AF_UNIX" and os.path.exists(self.address):
+            os.remove(self.address)  # 上一個引擎當機留下的 socket（已持有鎖，不會是別人的）
+        self._listener = Listener(self.address, family=_family(), authkey=self._authkey)
+        self._write_info()
+        for target in (self._accept_loop, self._push_loop):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _write_info(self):
+        payload = {"pid": os.getpid(), "address": self.address, "family": _family(), "authkey": self._authkey.hex()}
+        tmp = self.info_path + ".tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(tmp, self.info_path)
+
+    def post_log(self, message, level):
+        """任何執行緒：日誌行在下一次推送時送給所有用戶端"""
+        self._outbox.append(("log", message, level))
+        self._backlog.append(("log", message, level))
+
+    def post_event(self, kind, data):
+        self._outbox.append(("event", kind, data))
+
+    def _accept_loop(self):
+        while not self._stop.is_set():
+            try:
+                conn = self._listener.accept()
+            except Exception:
+                if self._stop.is_set():
+                    return
+                continue
+            if self._stop.is_set():
+                conn.close()
+                return
+            snapshot, monitoring = self.state()
+            link = _ClientLink(conn, self._drop)
+            link.push(("hello", list(self._backlog), snapshot, monitoring))
+            with self._lock:
+                self._clients.append(link)
+            self.log(f"🛰️ 用戶端已連線（共 {len(self._clients)} 個）", "INFO")
+            thread = threading.Thread(target=self._receive_loop, args=(link,), daemon=True)
+            thread.start()
+
+    def _receive_loop(self, link):
+        while not self._stop.is_set():
+            try:
+                message = link.conn.recv()
+            except Exception:
+                break
+            try:
+                self.on_command(*message)
+            except Exception as e:
+                self.log(f"⚠️ 無法處理用戶端命令 {message!r}: {e}", "WARNING")
+        if self._drop(link):
+            self.log(f"🛰️ 用戶端已中斷（剩 {len(self._clients)} 個）", "INFO")
+
+    def _drop(self, link):
+        with self._lock:
+            if link not in self._clients:
+                return False
+            self._clients.remove(link)
+        link.close()
+        return True
+
+    def _push_loop(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def flush(self):
+        """送出累積的日誌 / 事件，以及有變動的快照（沒有用戶端時只清空待送訊息）"""
+        messages = []
+        while self._outbox:
+            messages.append(self._outbox.popleft())
+        snapshot, monitoring = self.state()
+        state = (snapshot.cycle, monitoring)
+        if state != self._sent_state:
+            self._sent_state = state
+            messages.append(("snapshot", snapshot, monitoring))
+        if not messages:
+            return
+        with self._lock:
+            clients = list(self._clients)
+        for link in clients:
+            if not link.push(("batch", messages)) and self._drop(link):
+                self.log(f"⚠️ 用戶端停止接收，已中斷（剩 {len(self._clients)} 個）", "WARNING")
+
+    def close(self):
+        """停止接受連線並中斷所有用戶端（用戶端會嘗試接手成為新的引擎）"""
+        if self._stop.is_set():
+            return
+        self.flush()
+        self._stop.set()
+        try:
+            # 喚醒阻塞在 accept() 的執行緒
+            Client(self.address, family=_family(), authkey=self._authkey).close()
+        except Exception:
+            pass
+        with self._lock:
+            clients, self._clients = self._clients, []
+        for link in clients:
+            link.push(("bye",))
+            link.close(drain_timeout=1.0)
+        try:
+            self._listener.close()
+        except Exception:
+            pass
+        try:
+            os.remove(self.info_path)
+        except OSError:
+            pass
+        for thread in self._threads:
+            thread.join(timeout=1)
+
+
+class EngineClient:
+    """用戶端：連到目前的引擎，接收執行緒把訊息交給 on_message(種類, *資料)
+
+    引擎結束（連線中斷）時呼叫 on_lost()；自己呼叫 close() 時不會
+    """
+
+    def __init__(self, conn, pid):
+        self.conn = conn
+        self.pid = pid
+        self._closing = False
+        self._send_lock = threading.Lock()
+
+    @classmethod
+    def connect(cls, directory):
+        """讀取連線資訊並連線，引擎不存在或尚未就緒時回傳 None"""
+        try:
+            with open(os.path.join(directory, INFO_FILENAME), encoding="utf-8") as f:
+                info = json.load(f)
+            conn = Client(info["address"], family=info["family"], authkey=bytes.fromhex(info["authkey"]))
+        except Exception:
+            return None
+        return cls(conn, info.get("pid"))
+
+    def start(self, on_message, on_lost):
+        thread = threading.Thread(target=self._receive_loop, args=(on_message, on_lost), daemon=True)
+        thread.start()
+
+    def _receive_loop(self, on_message, on_lost):
+        while True:
+            try:
+                message = self.conn.recv()
+            except Exception:
+                break
+            if message[0] == "batch":
+                for item in message[1]:
+                    on_message(*item)
+            elif message[0] == "hello":
+                _, backlog, snapshot, monitoring = message
+                for item in backlog:
+                    on_message(*item)
+                on_message("snapshot", snapshot, monitoring)
+            elif message[0] == "bye":
+                break
+        if not self._closing:
+            on_lost()
+
+    def send(self, *message):
+        """送出命令，連線已中斷時回傳 False"""
+        try:
+            with self._send_lock:
+                self.conn.send(message)
+            return True
+        except Exception:
+            return False
+
+    def close(self):
+        self._closing = True
+        _shutdown(self.conn)
+        try:
+            self.conn.close()
+        except Exception:
+            pass
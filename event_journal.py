@@ -0,0 +1,346 @@
+"""
+掃描 / 點擊事件日誌
+只附加寫入的固定長度二進位紀錄（每筆 32 bytes），超過大小上限就輪替成新檔，
+記錄循環摘要、找到 Allow、點擊成功 / 失敗與連接失敗，結束程式後仍可統計
+
+監控執行緒只把事件 tuple 放進佇列，由背景執行緒批次打包寫入，不在掃描路徑上做檔案 I/O
+
+用法：
+    python event_journal.py summary                 # 每日點擊數、點擊耗時百分位、失敗率
+    python event_journal.py summary --days 7 --json
+    python event_journal.py dump --limit 50         # 最近的事件
+"""
+
+import argparse
+import glob
+import json
+import os
+import struct
+import sys
+import threading
+import time
+from collections import deque
+from datetime import date, datetime, timedelta
+
+MAGIC = b"AAJRNL\0\0"
+VERSION = 1
+HEADER = struct.Struct("<8sHH4x")
+# ts kind method depth windows hwnd latency_ms count
+RECORD = struct.Struct("<dBBHHqfI2x")
+
+CURRENT_NAME = "events.jrnl"
+ROTATED_PATTERN = "events-*.jrnl"
+
+# 事件種類
+SESSION = 1  # 程式啟動
+CYCLE = 2  # 一次監控循環：latency = 循環耗時，windows = 掃描的視窗數，count = 點擊數
+DETECT = 3  # 找到 Allow 按鈕：latency = 從開始掃描該視窗到找到的時間
+CLICK = 4  # 點擊成功：latency = 從開始掃描該視窗到點擊完成的時間
+CLICK_FAILED = 5  # 所有點擊方法都失敗
+CONNECT_FAILED = 6  # 無法連接視窗
+CHAIN_CLICK = 7  # 點擊後追蹤探測點擊到接連出現的提示：latency = 距離上一次點擊完成的時間
+
+KIND_NAMES = {
+    SESSION: "session",
+    CYCLE: "cycle",
+    DETECT: "detect",
+    CLICK: "click",
+    CLICK_FAILED: "click_failed",
+    CONNECT_FAILED: "connect_failed",
+    CHAIN_CLICK: "chain_click",
+}
+
+METHODS = ["", "invoke", "click_input", "click", "visual"]  # visual：畫面比對備援
+METHOD_CODES = {name: code for code, name in enumerate(METHODS) if name}
+
+
+class EventJournal:
+    """緩衝寫入的事件日誌
+
+    Args:
+        directory: 日誌目錄
+        max_bytes: 單一檔案大小上限，超過就輪替
+        keep: 保留的輪替檔數
+        flush_interval: 背景執行緒寫出的間隔（秒）
+    """
+
+    FLUSH_RECORDS = 4096
+    # 無法寫出（檔案無法開啟）時佇列最多保留的事件數，超過時丟掉最舊的
+    MAX_PENDING = 65536
+
+    def __init__(self, directory, max_bytes=8 * 1024 * 1024, keep=40, flush_interval=1.0, clock=time.time):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.keep = keep
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self.path = os.path.join(directory, CURRENT_NAME)
+        self._pending = deque(maxlen=self.MAX_PENDING)
+        self._wake = threading.Event()
+        self._write_lock = threading.Lock()
+        self._closed = True  # open() 之前的 record() 不記錄（停用日誌時不必判斷）
+        self._file = None
+        self._thread = None
+
+    def open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._open_current()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="event-journal", daemon=True)
+        self._thread.start()
+        self.record(SESSION)
+        return self
+
+    def record(self, kind, hwnd=0, depth=0, method=0, windows=0, latency_ms=0.0, count=0):
+        """任何執行緒：記錄一筆事件（只放進佇列）"""
+        if self._closed:
+            return
+        self._pending.append((self.clock(), kind, method, depth, windows, hwnd, latency_ms, count))
+        if len(self._pending) >= self.FLUSH_RECORDS:
+            self._wake.set()
+
+    def flush(self):
+        """打包並寫出佇列中的事件"""
+        with self._write_lock:
+            if self._file is None:
+                return
+            pack = RECORD.pack
+            chunks = []
+            pending = self._pending
+            while pending:
+                ts, kind, method, depth, windows, hwnd, latency_ms, count = pending.popleft()
+                chunks.append(pack(ts, kind, method, min(depth, 0xFFFF), min(windows, 0xFFFF),
+                                   hwnd, latency_ms, min(count, 0xFFFFFFFF)))
+            if not chunks:
+                return
+            self._file.write(b"".join(chunks))
+            self._file.flush()
+            if self._file.tell() >= self.max_bytes:
+                self._rotate()
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
+        with self._write_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except (OSError, ValueError):
+                # 磁碟已滿、檔案已關閉等錯誤：丟掉這批事件，不影響監控，下一次再試
+                self._pending.clear()
+
+    def _open_current(self):
+        """開啟目前的檔案；標頭不符時先輪替掉，結尾不完整的紀錄截掉"""
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                header = f.read(HEADER.size)
+            if len(header) < HEADER.size or HEADER.unpack(header)[:2] != (MAGIC, VERSION):
+                os.replace(self.path, self._rotated_path())
+        self._file = open(self.path, "ab")
+        size = self._file.seek(0, os.SEEK_END)
+        if size == 0:
+            self._file.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+        elif (size - HEADER.size) % RECORD.size:
+            self._file.truncate(size - (size - HEADER.size) % RECORD.size)
+            self._file.seek(0, os.SEEK_END)
+
+    def _rotated_path(self):
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(self.directory, f"events-{stamp}.jrnl")
+        suffix = 1
+        while os.path.exists(path):
+            path = os.path.join(self.directory, f"events-{stamp}-{suffix}.jrnl")
+            suffix += 1
+        return path
+
+    def _rotate(self):
+        """輪替目前的檔案；改名失敗（例如 Windows 上檔案被其他程式開啟）時重新開啟目前的檔案繼續附加，下次寫出時再試"""
+        self._file.close()
+        self._file = None
+        try:
+            os.replace(self.path, self._rotated_path())
+        except OSError:
+            self._file = open(self.path, "ab")
+            return
+        if self.keep > 0:
+            for old in _rotated_files(self.directory)[:-self.keep]:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+        self._open_current()
+
+
+def default_journal_dir():
+    """打包成 exe 時為 exe 所在目錄，否則為程式所在目錄"""
+    if getattr(sys, "frozen", False):
+        base = os.path.dirname(sys.executable)
+    else:
+        base = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base, "journal")
+
+
+def _rotated_files(directory):
+    paths = glob.glob(os.path.join(directory, ROTATED_PATTERN))
+    return sorted(paths, key=lambda path: (os.path.getmtime(path), path))
+
+
+def journal_files(directory):
+    """依時間排序的日誌檔（目前的檔案在最後）"""
+    files = _rotated_files(directory)
+    current = os.path.join(directory, CURRENT_NAME)
+    if os.path.exists(current):
+        files.append(current)
+    return files
+
+
+def iter_records(path):
+    """逐筆讀取 (ts, kind, method, depth, windows, hwnd, latency_ms, count)；標頭不符的檔案略過"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < HEADER.size:
+        return iter(())
+    magic, version, record_size = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+        return iter(())
+    end = HEADER.size + (len(data) - HEADER.size) // RECORD.size * RECORD.size
+    return RECORD.iter_unpack(memoryview(data)[HEADER.size:end])
+
+
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(p * len(sorted_values)))]
+
+
+def _new_day():
+    return {"sessions": 0, "cycles": 0, "window_scans": 0, "detections": 0, "clicks": 0,
+            "click_failures": 0, "connect_failures": 0, "chain_clicks": 0, "methods": {},
+            "cycle_ms": [], "click_ms": [], "chain_ms": []}
+
+
+def summarize(directory, since=None):
+    """依日期（本地時間）統計，回傳 {日期字串: 統計}"""
+    days = {}
+    day_start = day_end = None
+    stats = None
+    since_ts = datetime.combine(since, datetime.min.time()).timestamp() if since else None
+
+    for path in journal_files(directory):
+        for ts, kind, method, depth, windows, hwnd, latency_ms, count in iter_records(path):
+            if since_ts is not None and ts < since_ts:
+                continue
+            # 紀錄依時間排序，同一天的範圍只計算一次
+            if day_start is None or not day_start <= ts < day_end:
+                day = datetime.fromtimestamp(ts).date()
+                day_start = datetime.combine(day, datetime.min.time()).timestamp()
+                day_end = datetime.combine(day + timedelta(days=1), datetime.min.time()).timestamp()
+                stats = days.setdefault(day.isoformat(), _new_day())
+            if kind == CYCLE:
+                stats["cycles"] += 1
+                stats["window_scans"] += windows
+                stats["cycle_ms"].append(latency_ms)
+            elif kind == CLICK:
+                stats["clicks"] += 1
+                stats["click_ms"].append(latency_ms)
+                name = METHODS[method] if method < len(METHODS) else str(method)
+                stats["methods"][name] = stats["methods"].get(name, 0) + 1
+            elif kind == DETECT:
+                stats["detections"] += 1
+            elif kind == CLICK_FAILED:
+                stats["click_failures"] += 1
+            elif kind == CONNECT_FAILED:
+                stats["connect_failures"] += 1
+            elif kind == CHAIN_CLICK:
+                stats["chain_clicks"] += 1
+                stats["chain_ms"].append(latency_ms)
+            elif kind == SESSION:
+                stats["sessions"] += 1
+
+    result = {}
+    for day in sorted(days):
+        stats = days[day]
+        cycle_ms = sorted(stats.pop("cycle_ms"))
+        click_ms = sorted(stats.pop("click_ms"))
+        chain_ms = sorted(stats.pop("chain_ms"))
+        attempts = stats["clicks"] + stats["click_failures"]
+        stats["click_failure_rate"] = stats["click_failures"] / attempts if attempts else 0.0
+        stats["connect_failure_rate"] = (stats["connect_failures"] / stats["window_scans"]
+                                         if stats["window_scans"] else 0.0)
+        stats["click_ms"] = {f"p{int(p * 100)}": _percentile(click_ms, p) for p in (0.5, 0.9, 0.99)}
+        stats["cycle_ms"] = {f"p{int(p * 100)}": _percentile(cycle_ms, p) for p in (0.5, 0.95)}
+        stats["chain_ms"] = {f"p{int(p * 100)}": _percentile(chain_ms, p) for p in (0.5, 0.9)}
+        result[day] = stats
+    return result
+
+
+def _ms(value):
+    return "-" if value is None else f"{value:.1f}"
+
+
+def print_summary(result):
+    print(f"{'日期':12s} {'啟動':>4s} {'循環':>9s} {'點擊':>6s} {'點擊p50':>9s} {'點擊p90':>9s} {'點擊p99':>9s} "
+          f"{'點擊失敗':>8s} {'連接失敗':>8s} {'循環p50':>8s} {'循環p95':>8s} {'連續':>6s} {'連續p50':>8s} {'連續p90':>8s}")
+    for day, stats in result.items():
+        print(f"{day:12s} {stats['sessions']:4d} {stats['cycles']:9d} {stats['clicks']:6d} "
+              f"{_ms(stats['click_ms']['p50']):>9s} {_ms(stats['click_ms']['p90']):>9s} "
+              f"{_ms(stats['click_ms']['p99']):>9s} {stats['click_failure_rate']:8.1%} "
+              f"{stats['connect_failure_rate']:8.1%} {_ms(stats['cycle_ms']['p50']):>8s} "
+              f"{_ms(stats['cycle_ms']['p95']):>8s} {stats['chain_clicks']:6d} "
+              f"{_ms(stats['chain_ms']['p50']):>8s} {_ms(stats['chain_ms']['p90']):>8s}")
+
+
+def dump(directory, limit):
+    recent = deque(maxlen=limit)
+    for path in journal_files(directory):
+        recent.extend(iter_records(path))
+    for ts, kind, method, depth, windows, hwnd, latency_ms, count in recent:
+        stamp = datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+        method_name = METHODS[method] if method < len(METHODS) else str(method)
+        print(f"{stamp} {KIND_NAMES.get(kind, kind):15s} hwnd={hwnd} depth={depth} windows={windows} "
+              f"method={method_name or '-'} latency={latency_ms:.1f}ms count={count}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="掃描 / 點擊事件日誌")
+    parser.add_argument("--dir", default=default_journal_dir(), help="日誌目錄")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("summary", help="每日統計")
+    p.add_argument("--days", type=int, help="只統計最近 N 天")
+    p.add_argument("--json", action="store_true", help="輸出 JSON")
+
+    p = sub.add_parser("dump", help="列出最近的事件")
+    p.add_argument("--limit", type=int, default=50)
+
+    args = parser.parse_args(argv)
+    if not journal_files(args.dir):
+        print(f"找不到日誌: {args.dir}")
+        return 1
+
+    if args.command == "summary":
+        since = date.today() - timedelta(days=args.days - 1) if args.days else None
+        started = time.perf_counter()
+        result = summarize(args.dir, since)
+        if args.json:
+            print(json.dumps(result, ensure_ascii=False, indent=2))
+        else:
+            print_summary(result)
+            print(f"\n（統計耗時 {time.perf_counter() - started:.2f} 秒）")
+    else:
+        dump(args.dir, args.limit)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,332 @@
+"""
+多視窗負載測試
+以合成後端模擬 1~64 個 VS Code 視窗（活躍 / 閒置 / 無響應 / 新開啟），
+在固定時間內執行真正的 monitoring_loop / scan_windows，
+輸出各視窗數下的循環耗時百分位、Allow 點擊延遲與 GUI 佇列深度
+--chain-prob 讓點擊後在同一個容器接著出現下一個 Allow 提示（連續提示），延遲另外統計
+
+用法：
+    python loadtest_windows.py                      # 無介面模式（只統計 GUI 投遞數）
+    python loadtest_windows.py --gui                # 使用真正的 Tk 介面（量測佇列深度）
+    python loadtest_windows.py --save load.json
+    python loadtest_windows.py --compare load.json --threshold 0.3
+    python loadtest_windows.py --chain-prob 0.5 --follow-up 0   # 比較有無點擊後追蹤探測
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+
+from activity_tiers import SimulatedActivitySignals
+from auto_GO_gui import AutoAllowGUI
+from synthetic_uia import ReadCounter, SyntheticBackend, generate_tree, make_allow_button, place_allow_button
+
+WINDOW_COUNTS = [1, 2, 4, 8, 16, 32, 64]
+
+# 固定的活動訊號：一直有人操作、接上電源，結果不受主機的閒置 / 電池狀態影響
+PINNED_TIMELINE = [(0.0, "input"), (0.0, "ac")]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class LoadProbe:
+    """掛在 app.profilers 上：記錄循環耗時與 GUI 回呼佇列深度"""
+
+    def __init__(self):
+        self.cycle_times = []
+        self.posted = 0
+        self.executed = 0
+        self.max_depth = 0
+        self._lock = threading.Lock()
+        self._start = None
+
+    def begin_cycle(self):
+        self._start = time.perf_counter()
+
+    def end_cycle(self):
+        if self._start is not None:
+            self.cycle_times.append((time.perf_counter() - self._start) * 1000)
+            self._start = None
+
+    def wrap_ui_callback(self, fn):
+        with self._lock:
+            self.posted += 1
+            self.max_depth = max(self.max_depth, self.posted - self.executed)
+
+        def _wrapped():
+            try:
+                fn()
+            finally:
+                with self._lock:
+                    self.executed += 1
+        return _wrapped
+
+    def close(self):
+        pass
+
+
+class WindowFarm:
+    """產生與維護模擬視窗，並在活躍視窗中定時放入 Allow 提示"""
+
+    def __init__(self, count, elements, mix, prompt_interval, hang, seed, chain_prob=0.0, chain_delay=0.15):
+        self.rng = random.Random(seed)
+        self.chain_rng = random.Random(seed + 1)  # 在監控執行緒（點擊回呼）中使用
+        self.backend = SyntheticBackend()
+        self.elements = elements
+        self.prompt_interval = prompt_interval
+        self.hang = hang
+        self.pending_prompts = {}  # {id(button): 出現時間}
+        self.latencies = []
+        self.chain_prob = chain_prob
+        self.chain_delay = chain_delay
+        self.chain_latencies = []
+        self.chained_prompts = set()  # 連續提示按鈕的 id
+        self.due_chains = []  # [(出現時間, 父容器)]
+        self.active_hwnds = []
+        self.late_windows = []  # [(出現時間偏移, hwnd, root)]
+        self._lock = threading.Lock()
+
+        kinds = self._assign_kinds(count, mix)
+        for i, kind in enumerate(kinds):
+            hwnd = 0x2000 + i
+            root = generate_tree(
+                elements, button_density=0.1, seed=seed * 1000 + i, counter=ReadCounter(),
+                title=f"project-{i} ({kind}) - Visual Studio Code",
+            )
+            if kind == "hung":
+                root.hang = hang
+            if kind == "active":
+                self.active_hwnds.append(hwnd)
+            if kind == "new":
+                self.late_windows.append((self.rng.uniform(0.1, 0.5), hwnd, root))
+                continue
+            self.backend.add_window(hwnd, root)
+
+    def _assign_kinds(self, count, mix):
+        kinds = []
+        for kind, ratio in mix.items():
+            kinds.extend([kind] * round(count * ratio))
+        # 至少保留一個活躍視窗，數量不足或過多時以閒置視窗補齊/截斷
+        kinds = kinds[:count]
+        while len(kinds) < count:
+            kinds.append("idle")
+        if "active" not in kinds:
+            kinds[0] = "active"
+        self.rng.shuffle(kinds)
+        return kinds
+
+    def _on_click(self, button):
+        now = time.perf_counter()
+        parent = button.parent()
+        with self._lock:
+            appeared = self.pending_prompts.pop(id(button), None)
+            chained = id(button) in self.chained_prompts
+            self.chained_prompts.discard(id(button))
+            if parent is not None and self.chain_rng.random() < self.chain_prob:
+                self.due_chains.append((now + self.chain_delay, parent))
+        if appeared is not None:
+            (self.chain_latencies if chained else self.latencies).append((now - appeared) * 1000)
+        button.detach()
+
+    def _inject_chains(self):
+        """在被點擊按鈕的父容器放入下一個 Allow 提示"""
+        now = time.perf_counter()
+        with self._lock:
+            due = [item for item in self.due_chains if item[0] <= now]
+            self.due_chains = [item for item in self.due_chains if item[0] > now]
+            for _, parent in due:
+                button = make_allow_button(parent.counter)
+                button.on_click = self._on_click
+                self.pending_prompts[id(button)] = time.perf_counter()
+                self.chained_prompts.add(id(button))
+                parent.append(button)
+
+    def run_injector(self, duration, stop_event):
+        """背景執行緒：新視窗依序出現，活躍視窗定時出現 Allow 提示"""
+        start = time.perf_counter()
+        next_prompt = {hwnd: self.rng.uniform(0, self.prompt_interval) for hwnd in self.active_hwnds}
+        late = sorted(self.late_windows)
+        while not stop_event.is_set():
+            elapsed = time.perf_counter() - start
+            if elapsed >= duration:
+                break
+            while late and late[0][0] * duration <= elapsed:
+                _, hwnd, root = late.pop(0)
+                self.backend.add_window(hwnd, root)
+            for hwnd, due in next_prompt.items():
+                if elapsed < due or hwnd not in self.backend.windows:
+                    continue
+                root = self.backend.windows[hwnd]["root"]
+                button = make_allow_button(root.counter)
+                button.on_click = self._on_click
+                with self._lock:
+                    self.pending_prompts[id(button)] = time.perf_counter()
+                place_allow_button(root, self.rng.randrange(6, 18), self.rng.choice(["first", "middle", "last"]), button)
+                next_prompt[hwnd] = elapsed + self.prompt_interval * self.rng.uniform(0.5, 1.5)
+            self._inject_chains()
+            stop_event.wait(0.01 if self.due_chains else 0.02)
+
+
+def run_load(count, args, use_gui):
+    mix = {"active": args.active, "idle": args.idle, "hung": args.hung, "new": args.new}
+    farm = WindowFarm(count, args.elements, mix, args.prompt_interval, args.hang, args.seed,
+                      chain_prob=args.chain_prob, chain_delay=args.chain_delay)
+    probe = LoadProbe()
+
+    # CPU 預算固定停用：循環數與點擊延遲只反映視窗數，不受節流影響；
+    # 無介面模式不輸出日誌（規則、層級等元件建立時就取得了 app.log，事後替換不會生效）
+    argv = ["--no-journal", "--no-state", "--standalone", "--cpu-cap", "0"]
+    if not use_gui:
+        argv[:0] = ["--headless", "--quiet"]
+    if args.follow_up is not None:
+        argv += ["--follow-up", str(args.follow_up)]
+    app = AutoAllowGUI(argv=argv, backend=farm.backend)
+    app.tiers.signals = SimulatedActivitySignals(PINNED_TIMELINE, clock=lambda: 0.0)
+    app.profilers.append(probe)
+
+    stop_event = threading.Event()
+    injector = threading.Thread(target=farm.run_injector, args=(args.duration, stop_event), daemon=True)
+
+    app.monitoring = True
+    app.monitor_thread = threading.Thread(target=app.monitoring_loop, daemon=True)
+    injector.start()
+    app.monitor_thread.start()
+
+    if use_gui:
+        app.root.after(int(args.duration * 1000), app.root.quit)
+        app.root.mainloop()
+    else:
+        time.sleep(args.duration)
+
+    stop_event.set()
+    app.monitoring = False
+    app.monitor_thread.join(timeout=10)
+    if use_gui:
+        app.root.update()
+        app.root.destroy()
+
+    cycles = probe.cycle_times
+    return {
+        "windows": count,
+        "cycles": len(cycles),
+        "cycle_ms_p50": round(percentile(cycles, 50), 2),
+        "cycle_ms_p90": round(percentile(cycles, 90), 2),
+        "cycle_ms_p99": round(percentile(cycles, 99), 2),
+        "cycle_ms_max": round(max(cycles, default=0.0), 2),
+        "clicks": len(farm.latencies),
+        "missed_prompts": len(farm.pending_prompts),
+        "click_ms_p50": round(percentile(farm.latencies, 50), 1),
+        "click_ms_p95": round(percentile(farm.latencies, 95), 1),
+        "click_ms_max": round(max(farm.latencies, default=0.0), 1),
+        "chain_clicks": len(farm.chain_latencies),
+        "chain_ms_p50": round(percentile(farm.chain_latencies, 50), 1),
+        "chain_ms_p95": round(percentile(farm.chain_latencies, 95), 1),
+        "ui_posts_per_cycle": round(probe.posted / max(1, len(cycles)), 1),
+        "ui_queue_max_depth": probe.max_depth if use_gui else None,
+    }
+
+
+def print_row(r):
+    depth = "-" if r["ui_queue_max_depth"] is None else str(r["ui_queue_max_depth"])
+    print(f"{r['windows']:5d} {r['cycles']:7d} {r['cycle_ms_p50']:9.1f} {r['cycle_ms_p90']:9.1f} "
+          f"{r['cycle_ms_p99']:9.1f} {r['cycle_ms_max']:9.1f} {r['clicks']:7d} {r['missed_prompts']:7d} "
+          f"{r['click_ms_p50']:9.1f} {r['click_ms_p95']:9.1f} {r['chain_clicks']:7d} {r['chain_ms_p50']:9.1f} "
+          f"{r['chain_ms_p95']:9.1f} {r['ui_posts_per_cycle']:8.1f} {depth:>8s}")
+
+
+def compare(results, baseline, threshold):
+    base_by_count = {r["windows"]: r for r in baseline}
+    regressions = []
+    for r in results:
+        base = base_by_count.get(r["windows"])
+        if base is None:
+            continue
+        for metric in ("cycle_ms_p90", "click_ms_p95", "chain_ms_p95"):
+            if metric not in base:
+                continue  # 舊的結果沒有這項統計
+            if metric == "chain_ms_p95" and not (r.get("chain_clicks") and base.get("chain_clicks")):
+                continue  # 其中一邊沒有連續提示
+            if r[metric] > base[metric] * (1 + threshold) and r[metric] - base[metric] > 5:
+                regressions.append(f"{r['windows']} 視窗 {metric}: {base[metric]} → {r[metric]}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="scan_windows 多視窗負載測試")
+    parser.add_argument("--windows", type=int, nargs="+", default=WINDOW_COUNTS, help="模擬的視窗數")
+    parser.add_argument("--duration", type=float, default=10.0, help="每個視窗數的執行秒數")
+    parser.add_argument("--elements", type=int, default=3000, help="每個視窗的元素數")
+    parser.add_argument("--active", type=float, default=0.25, help="活躍視窗比例（定時出現 Allow 提示）")
+    parser.add_argument("--idle", type=float, default=0.5, help="閒置視窗比例")
+    parser.add_argument("--hung", type=float, default=0.1, help="無響應視窗比例")
+    parser.add_argument("--new", type=float, default=0.15, help="執行中途才開啟的視窗比例")
+    parser.add_argument("--hang", type=float, default=0.25, help="無響應視窗每次查詢卡住的秒數")
+    parser.add_argument("--prompt-interval", type=float, default=2.0, help="活躍視窗出現 Allow 提示的平均間隔（秒）")
+    parser.add_argument("--chain-prob", type=float, default=0.0, help="點擊後在同一個容器接著出現下一個 Allow 提示的機率")
+    parser.add_argument("--chain-delay", type=float, default=0.15, help="連續提示在點擊後多久出現（秒）")
+    parser.add_argument("--follow-up", type=float, metavar="SECONDS", help="傳給 auto_GO_gui 的 --follow-up（預設使用程式預設值）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--gui", action="store_true", help="使用真正的 Tk 介面（量測 GUI 佇列深度）")
+    parser.add_argument("--save", metavar="PATH", help="將結果寫入 JSON")
+    parser.add_argument("--compare", metavar="PATH", help="與先前的 JSON 結果比較")
+    parser.add_argument("--threshold", type=float, default=0.3, help="允許的退步比例")
+    args = parser.parse_args(argv)
+
+    print(f"scan_windows 負載測試 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}  "
+          f"({'Tk 介面' if args.gui else '無介面'}，每組 {args.duration:.0f} 秒，每視窗 {args.elements} 元素)")
+    print("=" * 150)
+    print(f"{'視窗':>5s} {'循環':>7s} {'p50 ms':>9s} {'p90 ms':>9s} {'p99 ms':>9s} {'max ms':>9s} "
+          f"{'點擊':>7s} {'未點':>7s} {'點擊p50':>9s} {'點擊p95':>9s} {'連續':>7s} {'連續p50':>9s} {'連續p95':>9s} "
+          f"{'投遞/圈':>8s} {'佇列深':>8s}")
+
+    results = []
+    for count in args.windows:
+        result = run_load(count, args, args.gui)
+        results.append(result)
+        print_row(result)
+
+    if args.save:
+        payload = {
+            "meta": {
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "gui": args.gui,
+                "duration": args.duration,
+                "elements": args.elements,
+                "chain_prob": args.chain_prob,
+                "follow_up": args.follow_up,
+            },
+            "results": results,
+        }
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ 已寫入: {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        print("=" * 150)
+        if regressions:
+            print(f"❌ 發現 {len(regressions)} 項擴展性退步：")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("✅ 與基準相比無擴展性退步")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+"""
+監控循環效能分析工具
+- LoopProfiler：對 monitoring_loop 的前 N 次迭代做 cProfile，並輸出火焰圖用的 collapsed stack
+- CycleSampler：低頻率堆疊取樣，可長時間開啟，只保留最慢的幾次循環
+"""
+
+import cProfile
+import heapq
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+
+def _frame_label(code):
+    """堆疊框架名稱：檔名:函式:行號"""
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{code.co_firstlineno}"
+
+
+def _collapse(frame):
+    """將框架鏈轉成 collapsed stack 字串（根在前）"""
+    parts = []
+    while frame is not None:
+        parts.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    parts.reverse()
+    return ";".join(parts)
+
+
+def _write_folded(path, counts):
+    """寫出 flamegraph.pl / speedscope 可讀的 collapsed stack 檔"""
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, count in counts.most_common():
+            f.write(f"{stack} {count}\n")
+
+
+class _StackSampler:
+    """背景執行緒：定時取樣指定執行緒的呼叫堆疊"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.target_ident = None
+        self.active = False
+        self.bucket = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, target_ident):
+        self.target_ident = target_ident
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+            self._thread.start()
+
+    def swap_bucket(self):
+        """取出目前累積的樣本並換上新的容器"""
+        with self._lock:
+            bucket, self.bucket = self.bucket, Counter()
+        return bucket
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if not self.active:
+                continue
+            frame = sys._current_frames().get(self.target_ident)
+            if frame is None:
+                continue
+            stack = _collapse(frame)
+            with self._lock:
+                self.bucket[stack] += 1
+
+
+class LoopProfiler:
+    """對監控循環的前 N 次迭代做完整分析
+
+    - cProfile 統計（.prof 原始檔 + 依累計時間排序的文字報表）
+    - 同期間的堆疊取樣（.folded，可直接產生火焰圖）
+    - Tk 主線程回呼的耗時（以 [tk] 為根的堆疊）
+    """
+
+    def __init__(self, iterations, out_dir="profiles", sample_interval=0.001, log=None):
+        self.iterations = iterations
+        self.out_dir = out_dir
+        self.log = log or (lambda msg, level="INFO": None)
+        self.completed = 0
+        self.done = iterations <= 0
+        self._profile = cProfile.Profile()
+        self._sampler = _StackSampler(sample_interval)
+        self._stacks = Counter()
+        self._tk_stacks = Counter()
+        self._tk_lock = threading.Lock()
+        self._cycle_times = []
+        self._cycle_start = None
+
+    def begin_cycle(self):
+        if self.done:
+            return
+        self._sampler.start(threading.get_ident())
+        self._sampler.active = True
+        self._cycle_start = time.perf_counter()
+        self._profile.enable()
+
+    def end_cycle(self):
+        if self.done or self._cycle_start is None:
+            return
+        self._profile.disable()
+        self._sampler.active = False
+        self._cycle_times.append(time.perf_counter() - self._cycle_start)
+        self._cycle_start = None
+        self._stacks.update(self._sampler.swap_bucket())
+        self.completed += 1
+        if self.completed >= self.iterations:
+            self.done = True
+            self._sampler.stop()
+            self.dump()
+
+    def wrap_ui_callback(self, fn):
+        """包裝 root.after 回呼，記錄其在 Tk 主線程上的耗時（毫秒）"""
+        if self.done:
+            return fn
+        name = getattr(fn, "__qualname__", repr(fn))
+
+        def _wrapped():
+            start = time.perf_counter()
+            try:
+                fn()
+            finally:
+                if not self.done:
+                    ms = max(1, round((time.perf_counter() - start) * 1000))
+                    with self._tk_lock:
+                        self._tk_stacks[f"[tk];{name}"] += ms
+        return _wrapped
+
+    def dump(self):
+        """輸出統計檔，回傳報表路徑"""
+        os.makedirs(self.out_dir, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        base = os.path.join(self.out_dir, f"monitor_{stamp}")
+
+        self._profile.dump_stats(base + ".prof")
+
+        buf = io.StringIO()
+        stats = pstats.Stats(self._profile, stream=buf)
+        stats.sort_stats("cumulative").print_stats(60)
+        stats.sort_stats("tottime").print_stats(30)
+
+        times = sorted(self._cycle_times)
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(f"# 分析迭代數: {self.completed}\n")
+            if times:
+                f.write(f"# 循環耗時 (ms): 平均 {sum(times) / len(times) * 1000:.1f}, "
+                        f"中位 {times[len(times) // 2] * 1000:.1f}, 最大 {times[-1] * 1000:.1f}\n")
+            with self._tk_lock:
+                tk_items = self._tk_stacks.most_common()
+            if tk_items:
+                f.write("# Tk 回呼耗時 (ms):\n")
+                for stack, ms in tk_items:
+                    f.write(f"#   {stack.split(';', 1)[1]}: {ms}\n")
+            f.write("\n")
+            f.write(buf.getvalue())
+
+        # 監控線程樣本與 Tk 回呼寫入同一個 folded 檔，火焰圖上可直接比較
+        folded = Counter(self._stacks)
+        folded.update(self._tk_stacks)
+        _write_folded(base + ".folded", folded)
+
+        self.log(f"📈 效能分析完成（{self.completed} 次迭代）：{base}.txt / .prof / .folded", "SUCCESS")
+        return base + ".txt"
+
+    def close(self):
+        """提前結束時，輸出已完成的部分"""
+        if not self.done:
+            self.done = True
+            self._sampler.stop()
+            if self.completed:
+                self.dump()
+
+
+class CycleSampler:
+    """低頻率取樣模式：可開啟數小時，只保留最慢的 keep 次循環的堆疊"""
+
+    def __init__(self, out_dir="profiles", interval=0.05, keep=20, flush_every=300, log=None):
+        self.out_dir = out_dir
+        self.keep = keep
+        self.flush_every = flush_every
+        self.log = log or (lambda msg, level="INFO": None)
+        self.done = False
+        self._sampler = _StackSampler(interval)
+        self._worst = []  # min-heap: (duration, seq, started_at, Counter)
+        self._seq = 0
+        self._cycle_start = None
+        self._last_flush = time.monotonic()
+        os.makedirs(out_dir, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self._base = os.path.join(out_dir, f"worst_cycles_{stamp}")
+
+    def begin_cycle(self):
+        self._sampler.start(threading.get_ident())
+        self._sampler.swap_bucket()
+        self._sampler.active = True
+        self._cycle_start = time.perf_counter()
+
+    def end_cycle(self):
+        if self._cycle_start is None:
+            return
+        self._sampler.active = False
+        duration = time.perf_counter() - self._cycle_start
+        self._cycle_start = None
+        bucket = self._sampler.swap_bucket()
+        self._seq += 1
+
+        if len(self._worst) < self.keep:
+            heapq.heappush(self._worst, (duration, self._seq, datetime.now(), bucket))
+        elif duration > self._worst[0][0]:
+            heapq.heapreplace(self._worst, (duration, self._seq, datetime.now(), bucket))
+
+        if time.monotonic() - self._last_flush >= self.flush_every:
+            self.dump()
+
+    def wrap_ui_callback(self, fn):
+        return fn
+
+    def dump(self):
+        """寫出目前最慢循環的摘要與合併後的 collapsed stack"""
+        self._last_flush = time.monotonic()
+        worst = sorted(self._worst, reverse=True)
+        merged = Counter()
+        with open(self._base + ".txt", "w", encoding="utf-8") as f:
+            f.write(f"# 最慢的 {len(worst)} 次循環（共觀察 {self._seq} 次）\n")
+            for duration, seq, when, bucket in worst:
+                f.write(f"\n## 第 {seq} 次循環  {when.strftime('%Y-%m-%d %H:%M:%S')}  {duration * 1000:.1f} ms\n")
+                for stack, count in bucket.most_common(5):
+                    leaf = stack.rsplit(";", 1)[-1]
+                    f.write(f"  {count:4d}  {leaf}\n")
+                merged.update({f"cycle_{seq};{stack}": count for stack, count in bucket.items()})
+        _write_folded(self._base + ".folded", merged)
+        return self._base + ".txt"
+
+    def close(self):
+        self._sampler.stop()
+        if self._seq:
+            path = self.dump()
+            self.log(f"📈 最慢循環取樣已寫入：{path}", "INFO")
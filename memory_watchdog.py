@@ -0,0 +1,149 @@
+"""
+長時間執行的記憶體監看
+定期記錄進程 RSS 與 tracemalloc 配置最多的程式位置（與上一次取樣比較的增量），
+RSS 超過上限時通知呼叫端釋放快取
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+
+MemorySample = namedtuple("MemorySample", "taken_at rss traced peak top")
+
+
+def _rss_windows():
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    process = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+        return None
+    return counters.WorkingSetSize
+
+
+def _rss_proc():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def current_rss():
+    """目前的常駐記憶體（bytes），無法取得時回傳 None"""
+    try:
+        if sys.platform == "win32":
+            return _rss_windows()
+        return _rss_proc()
+    except (OSError, AttributeError, ValueError):
+        return None
+
+
+def _mb(size):
+    return size / (1024 * 1024)
+
+
+class MemoryWatchdog:
+    """每 interval 秒取樣一次，check() 在監控循環之間呼叫
+
+    Args:
+        interval: 取樣間隔（秒），0 表示停用
+        rss_limit_mb: RSS 上限（MB），超過時 check() 回傳 True
+        top: 日誌列出的配置位置數
+        frames: tracemalloc 記錄的堆疊深度
+    """
+
+    def __init__(self, interval=0.0, rss_limit_mb=300.0, top=10, frames=1, clock=time.monotonic, log=None):
+        self.interval = interval
+        self.rss_limit = rss_limit_mb * 1024 * 1024
+        self.top = top
+        self.frames = frames
+        self.clock = clock
+        self.log = log or (lambda msg, level="INFO": None)
+        self.last = None
+        self.trims = 0
+        self._next_at = None
+        self._snapshot = None
+
+    @property
+    def enabled(self):
+        return self.interval > 0
+
+    def start(self):
+        if not self.enabled:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        self._next_at = self.clock() + self.interval
+        self.log(f"🧠 記憶體監看：每 {self.interval:.0f} 秒取樣，RSS 上限 {_mb(self.rss_limit):.0f} MB", "INFO")
+
+    def stop(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._snapshot = None
+
+    def check(self):
+        """到了取樣時間就取樣並寫入日誌，回傳 RSS 是否超過上限"""
+        if not self.enabled or self._next_at is None or self.clock() < self._next_at:
+            return False
+        self._next_at = self.clock() + self.interval
+        sample = self.sample()
+        return sample.rss is not None and sample.rss > self.rss_limit
+
+    def sample(self):
+        rss = current_rss()
+        traced, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        top = []
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            ))
+            if self._snapshot is None:
+                stats = snapshot.statistics("lineno")
+            else:
+                stats = snapshot.compare_to(self._snapshot, "lineno")
+            self._snapshot = snapshot
+            top = [
+                (str(stat.traceback[0]), stat.size, getattr(stat, "size_diff", stat.size), stat.count)
+                for stat in stats[:self.top]
+            ]
+            tracemalloc.reset_peak()
+
+        previous = self.last
+        self.last = MemorySample(time.time(), rss, traced, peak, top)
+
+        if rss is None:
+            rss_text = "RSS 未知"
+        elif previous is None or previous.rss is None:
+            rss_text = f"RSS {_mb(rss):.1f} MB"
+        else:
+            rss_text = f"RSS {_mb(rss):.1f} MB ({_mb(rss - previous.rss):+.1f})"
+        level = "WARNING" if rss is not None and rss > self.rss_limit else "DEBUG"
+        self.log(f"🧠 {rss_text}，Python 配置 {_mb(traced):.1f} MB（高峰 {_mb(peak):.1f}）", level)
+        for where, size, diff, count in top:
+            self.log(f"    {where}: {size / 1024:.1f} KiB ({diff / 1024:+.1f})，{count} 個物件", level)
+        return self.last
+
+    def status_text(self):
+        """統計面板顯示用"""
+        if not self.enabled:
+            return "停用"
+        if self.last is None or self.last.rss is None:
+            return "-"
+        return f"{_mb(self.last.rss):.0f} MB"
@@ -0,0 +1,60 @@
+"""
+監控狀態快照與命令佇列
+監控執行緒是視窗狀態（vscode_windows / active_windows / failed_connections / known_hwnds）的唯一擁有者：
+- 每次循環結束發布一份不可變的 MonitorSnapshot，GUI 只讀取最新的快照（單一參照讀取，不需要鎖）
+- GUI 的重置等操作以命令送入佇列，由監控執行緒在循環之間套用
+- 手動掃描的進度與結果以事件送回 GUI，由 GUI 重繪時取出
+"""
+
+import queue
+from collections import namedtuple
+
+# 視窗列表中的一列
+WindowRow = namedtuple("WindowRow", "index hwnd title display_title scan_mode last_scan status tag")
+
+# 一次循環結束時的狀態
+MonitorSnapshot = namedtuple("MonitorSnapshot", "cycle taken_at windows active_hwnds failed_count "
+                                                "scan_count click_count cpu_measured throttle_text memory_text chain_text")
+
+EMPTY_SNAPSHOT = MonitorSnapshot(
+    cycle=0, taken_at=None, windows=(), active_hwnds=frozenset(), failed_count=0,
+    scan_count=0, click_count=0, cpu_measured=0.0, throttle_text="", memory_text="", chain_text="-",
+)
+
+
+class StateStore:
+    """最新快照 + 待套用的命令"""
+
+    def __init__(self):
+        self.snapshot = EMPTY_SNAPSHOT
+        self._commands = queue.SimpleQueue()
+        self._events = queue.SimpleQueue()
+
+    def publish(self, snapshot):
+        """監控執行緒：發布新快照（參照指派為原子操作）"""
+        self.snapshot = snapshot
+
+    def submit(self, name, *args):
+        """任何執行緒：送出命令，於下一次循環之前套用"""
+        self._commands.put((name, args))
+
+    def drain(self):
+        """監控執行緒：取出所有待套用的命令"""
+        return _drain(self._commands)
+
+    def post_event(self, kind, **data):
+        """監控執行緒：送出事件（例如 scan_progress / scan_result）"""
+        self._events.put((kind, data))
+
+    def drain_events(self):
+        """GUI：取出所有事件"""
+        return _drain(self._events)
+
+
+def _drain(q):
+    items = []
+    while True:
+        try:
+            items.append(q.get_nowait())
+        except queue.Empty:
+            return items
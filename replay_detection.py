@@ -0,0 +1,310 @@
+"""
+離線回放：把掃描快照當成假的視窗樹，交給真正的 find_and_click_allow_button
+批次跑過大量快照，回報偵測結果、與標記比對的誤點 / 漏點，以及每個快照的耗時
+
+快照格式：串流檔（.jsonl[.gz|.zst]）、欄位式快照（.uiasnap）、舊版導出 JSON
+標記檔（--labels）：
+    {
+        "vscode_scan_A.jsonl": "Window/Pane/.../Button 'Allow'",     # 每個視窗都應點這個元素
+        "vscode_scan_B.jsonl": null,                                 # 不應點擊任何元素
+        "vscode_scan_C.jsonl": {"proj - Visual Studio Code": "...",  # 依視窗標題分別標記
+                                "*": null}
+    }
+元素以 scan_diff.element_path 的結構路徑表示；--write-labels 可把目前的偵測結果寫成標記範本
+
+用法：
+    python replay_detection.py scans/ --labels labels.json
+    python replay_detection.py scans/ --labels labels.json --save replay_baseline.json
+    python replay_detection.py scans/ --labels labels.json --compare replay_baseline.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+from auto_GO_gui import AutoAllowGUI
+from scan_columnar import parse_rect
+from scan_diff import element_path
+from scan_tree_view import SnapshotIndex, find_snapshots
+from synthetic_uia import ReadCounter, SyntheticBackend, SyntheticElement, SyntheticRect, SyntheticWindow
+
+# 結果分類
+TRUE_POSITIVE = "正確點擊"
+TRUE_NEGATIVE = "正確略過"
+FALSE_POSITIVE = "誤點"
+FALSE_NEGATIVE = "漏點"
+WRONG_ELEMENT = "點錯元素"
+UNLABELLED = "未標記"
+
+
+def build_tree(index, counter):
+    """把 SnapshotIndex 轉成合成視窗樹，回傳 (根視窗, {id(元素): 快照索引})
+
+    快照中未知的矩形沿用 SyntheticElement 的預設大小（偵測邏輯讀不到矩形時也會略過大小檢查）；
+    未知的啟用 / 可見狀態視為 True（偵測邏輯讀取失敗時同樣不會排除）
+    """
+    roots = index.roots()
+    positions = {}
+    if len(roots) == 1 and index.depths[roots[0]] == 0:
+        # 掃描工具會把視窗本身記為深度 0 的元素
+        window = SyntheticWindow(name=index.title or index.names[roots[0]], counter=counter)
+        positions[id(window)] = roots[0]
+        elements = {roots[0]: window}
+    else:
+        window = SyntheticWindow(name=index.title, counter=counter)
+        elements = {}
+
+    for i in range(len(index)):
+        if i in elements:
+            continue
+        rect = parse_rect(index.pos[i], index.size[i])
+        elem = SyntheticElement(
+            index.types[i],
+            name=index.names[i],
+            automation_id=index.ids[i],
+            class_name=index.classes[i],
+            enabled=index.enabled[i] is not False,
+            visible=index.visible[i] is not False,
+            rect=SyntheticRect(rect[0], rect[1], rect[0] + rect[2], rect[1] + rect[3]) if rect else None,
+        )
+        parent = index.parents[i]
+        (elements[parent] if parent >= 0 else window).append(elem)
+        elements[i] = elem
+        positions[id(elem)] = i
+    return window, positions
+
+
+def expected_for(labels, path, title):
+    """回傳 (是否有標記, 預期點擊的元素路徑或 None)"""
+    name = os.path.basename(path)
+    if name not in labels:
+        return False, None
+    label = labels[name]
+    if isinstance(label, dict):
+        if title in label:
+            return True, label[title]
+        if "*" in label:
+            return True, label["*"]
+        return False, None
+    return True, label
+
+
+def classify(labelled, expected, clicked):
+    if not labelled:
+        return UNLABELLED
+    if expected is None:
+        return TRUE_NEGATIVE if clicked is None else FALSE_POSITIVE
+    if clicked is None:
+        return FALSE_NEGATIVE
+    return TRUE_POSITIVE if clicked == expected else WRONG_ELEMENT
+
+
+class Replayer:
+    """重複使用同一個無介面 AutoAllowGUI，每個快照換上新的合成後端"""
+
+    def __init__(self, deep_scan=True, latency_us=0, verbose=False):
+        self.deep_scan = deep_scan
+        self.latency = latency_us / 1_000_000
+        self.verbose = verbose
+        self.app = AutoAllowGUI(argv=["--headless", "--no-journal", "--no-state", "--standalone", "--follow-up", "0"], backend=SyntheticBackend())
+        self.app.log = self._log
+
+    def _log(self, message, level="INFO"):
+        if self.verbose:
+            print(f"      [{level}] {message}")
+
+    def replay(self, path, labels):
+        """回放一個快照檔，回傳每個視窗的結果列表"""
+        started = time.perf_counter()
+        indexes = SnapshotIndex.load(path)
+        load_ms = (time.perf_counter() - started) * 1000
+
+        results = []
+        for hwnd, index in enumerate(indexes, 1):
+            counter = ReadCounter(latency=self.latency)
+            window, positions = build_tree(index, counter)
+            clicked = []
+            for elem, _ in window.iter_subtree():
+                elem.on_click = clicked.append
+
+            backend = SyntheticBackend()
+            backend.add_window(hwnd, window, title=index.title)
+            app = self.app
+            app.backend = backend
+            app.active_windows.clear()
+            app.failed_connections.clear()
+            app.vscode_windows = {hwnd: index.title}
+
+            started = time.perf_counter()
+            app.find_and_click_allow_button(hwnd, deep_scan=self.deep_scan)
+            detect_ms = (time.perf_counter() - started) * 1000
+
+            clicked_path = element_path(index, positions[id(clicked[0])]) if clicked else None
+            labelled, expected = expected_for(labels, path, index.title)
+            results.append({
+                "file": os.path.basename(path),
+                "title": index.title,
+                "elements": len(index),
+                "clicked": clicked_path,
+                "expected": expected,
+                "outcome": classify(labelled, expected, clicked_path),
+                "detect_ms": round(detect_ms, 3),
+                "load_ms": round(load_ms / len(indexes), 3),
+                "reads": counter.reads,
+                "visited": counter.visited,
+            })
+        return results
+
+
+def summarize(results):
+    outcomes = {}
+    for result in results:
+        outcomes[result["outcome"]] = outcomes.get(result["outcome"], 0) + 1
+    timings = sorted(result["detect_ms"] for result in results) or [0.0]
+    tp = outcomes.get(TRUE_POSITIVE, 0)
+    fp = outcomes.get(FALSE_POSITIVE, 0) + outcomes.get(WRONG_ELEMENT, 0)
+    fn = outcomes.get(FALSE_NEGATIVE, 0) + outcomes.get(WRONG_ELEMENT, 0)
+    return {
+        "windows": len(results),
+        "elements": sum(result["elements"] for result in results),
+        "clicked": sum(1 for result in results if result["clicked"]),
+        "outcomes": outcomes,
+        "precision": tp / (tp + fp) if tp + fp else None,
+        "recall": tp / (tp + fn) if tp + fn else None,
+        "detect_ms_median": statistics.median(timings),
+        "detect_ms_p95": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        "detect_ms_max": timings[-1],
+    }
+
+
+def compare(results, baseline, threshold, min_delta_ms=5.0):
+    """與基準比較：結果改變、耗時退步超過門檻都算退步
+
+    每個視窗只量測一次，耗時需同時超過比例門檻與 min_delta_ms 才算退步（與 bench_startup.compare 相同）
+    """
+    previous = {(r["file"], r["title"]): r for r in baseline}
+    regressions = []
+    for result in results:
+        key = (result["file"], result["title"])
+        old = previous.get(key)
+        if old is None:
+            continue
+        if result["clicked"] != old["clicked"]:
+            regressions.append(f"{key[0]} / {key[1]}: 點擊 {old['clicked']!r} → {result['clicked']!r}")
+        limit = max(old["detect_ms"] * (1 + threshold), old["detect_ms"] + min_delta_ms)
+        if result["detect_ms"] > limit:
+            regressions.append(f"{key[0]} / {key[1]}: 耗時 {old['detect_ms']:.2f} → {result['detect_ms']:.2f} ms")
+    return regressions
+
+
+def print_results(results, summary):
+    print(f"{'快照':40s} {'元素':>8s} {'偵測ms':>9s} {'讀取':>8s}  {'結果':8s} 點擊")
+    print("-" * 120)
+    for result in results:
+        label = f"{result['file']}"[:40]
+        print(f"{label:40s} {result['elements']:8d} {result['detect_ms']:9.2f} {result['reads']:8d}  "
+              f"{result['outcome']:8s} {result['clicked'] or '-'}")
+        if result["outcome"] in (FALSE_NEGATIVE, WRONG_ELEMENT):
+            print(f"{'':40s} {'':8s} {'':9s} {'':8s}  {'預期':8s} {result['expected']}")
+    print("=" * 120)
+    print(f"視窗 {summary['windows']} 個、元素 {summary['elements']} 個、點擊 {summary['clicked']} 次")
+    print("結果: " + "、".join(f"{name} {count}" for name, count in sorted(summary["outcomes"].items())))
+    if summary["precision"] is not None or summary["recall"] is not None:
+        fmt = lambda value: "-" if value is None else f"{value:.1%}"
+        print(f"精確率 {fmt(summary['precision'])}、召回率 {fmt(summary['recall'])}")
+    print(f"偵測耗時 中位數 {summary['detect_ms_median']:.2f} ms、p95 {summary['detect_ms_p95']:.2f} ms、"
+          f"最大 {summary['detect_ms_max']:.2f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="以掃描快照離線回放 Allow 偵測")
+    parser.add_argument("inputs", nargs="+", help="快照檔、目錄或萬用字元")
+    parser.add_argument("--labels", metavar="PATH", help="標記檔（預期點擊的元素）")
+    parser.add_argument("--write-labels", metavar="PATH", help="把目前的偵測結果寫成標記範本")
+    parser.add_argument("--shallow", action="store_true", help="使用淺層掃描深度（預設為深度掃描）")
+    parser.add_argument("--latency-us", type=int, default=0, help="每次屬性讀取注入的延遲（微秒）")
+    parser.add_argument("--verbose", action="store_true", help="顯示偵測邏輯的日誌")
+    parser.add_argument("--json", metavar="OUT", help="另存每個視窗的結果與統計")
+    parser.add_argument("--save", metavar="PATH", help="將結果寫入 JSON 基準檔")
+    parser.add_argument("--compare", metavar="PATH", help="與 JSON 基準檔比較")
+    parser.add_argument("--threshold", type=float, default=0.25, help="允許的耗時退步比例（預設 25%%）")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="耗時退步的最小絕對差（毫秒）")
+    parser.add_argument("--no-warmup", action="store_true", help="不先做不計時的暖身回放")
+    args = parser.parse_args(argv)
+
+    labels = {}
+    if args.labels:
+        with open(args.labels, encoding="utf-8") as f:
+            labels = json.load(f)
+    paths = find_snapshots(args.inputs, exclude=[args.labels, args.json, args.save, args.compare,
+                                                      args.write_labels])
+    if not paths:
+        print("⚠️ 找不到快照檔")
+        return 1
+
+    print(f"Allow 偵測回放 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}，{len(paths)} 個快照")
+    print("=" * 120)
+    replayer = Replayer(deep_scan=not args.shallow, latency_us=args.latency_us, verbose=args.verbose)
+    if not args.no_warmup:
+        # 暖身：先完整回放一次不計時，第一次呼叫的延遲載入與快取建立不會算進耗時
+        replayer.verbose = False
+        for path in paths:
+            try:
+                replayer.replay(path, labels)
+            except Exception:
+                pass  # 計時的回放會再回報錯誤
+        replayer.verbose = args.verbose
+    results = []
+    for path in paths:
+        try:
+            results.extend(replayer.replay(path, labels))
+        except Exception as e:
+            print(f"❌ 無法回放 {path}: {e}")
+    summary = summarize(results)
+    print_results(results, summary)
+
+    if args.write_labels:
+        template = {}
+        for result in results:
+            template.setdefault(result["file"], {})[result["title"]] = result["clicked"]
+        with open(args.write_labels, "w", encoding="utf-8") as f:
+            json.dump(template, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ 已寫入標記範本: {args.write_labels}（請逐一確認後再當成標記使用）")
+
+    payload = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "deep_scan": not args.shallow,
+            "latency_us": args.latency_us,
+        },
+        "summary": summary,
+        "results": results,
+    }
+    for out in (args.json, args.save):
+        if out:
+            with open(out, "w", encoding="utf-8") as f:
+                json.dump(payload, f, ensure_ascii=False, indent=2)
+            print(f"\n✅ 已寫入: {out}")
+
+    failed = summary["outcomes"].get(FALSE_POSITIVE, 0) + summary["outcomes"].get(FALSE_NEGATIVE, 0) + \
+        summary["outcomes"].get(WRONG_ELEMENT, 0)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        print("=" * 120)
+        if regressions:
+            print(f"❌ 發現 {len(regressions)} 項退步（耗時門檻 {args.threshold:.0%}）：")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("✅ 與基準相比無退步")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,481 @@
+"""
+精簡欄位式二進位快照（.uiasnap）
+- 字串表：type / class / id / name 等重複字串只存一次，元素欄位存字串編號
+- 固定寬度整數欄位：深度、父節點索引、矩形（left / top / width / height）、旗標
+- 子節點索引（CSR）一併存檔，開啟時不需重建
+以 mmap 載入，各欄位直接是檔案上的 memoryview，開檔不需解析；
+載入結果與 SnapshotIndex 介面相同，可直接交給樹狀檢視與差異比對
+
+檔案結構（little-endian，各區段對齊 8 位元組）：
+    標頭      magic(8) version(u16) reserved(u16) window_count(u32) strings_offset(u64) directory_offset(u64)
+    字串表    count(u32) pad(4) offsets(u64 × count+1) utf-8 資料
+    視窗目錄  每個視窗：hwnd(i64) title(u32) truncated(u32, JSON 字串) count(u32) child_count(u32)
+              meta(u32, JSON 字串：scanned_at、vscode_version 等) pad(4) + 各欄位的位移(u64 × len(COLUMNS))
+              （版本 1 沒有 meta 與 pad，仍可讀取）
+    欄位資料
+
+用法：
+    python scan_columnar.py to-snap scans/vscode_scan_X.jsonl scans/X.uiasnap
+    python scan_columnar.py to-json scans/X.uiasnap X.json
+    python scan_columnar.py query scans/X.uiasnap --type Button --name allow
+"""
+
+import argparse
+import json
+import mmap
+import re
+import struct
+import sys
+import time
+from array import array
+
+from scan_tree_view import SnapshotIndex, FILTER_LIMIT
+
+MAGIC = b"UIASNAP\0"
+VERSION = 2
+SUFFIX = ".uiasnap"
+
+_HEADER = struct.Struct("<8sHHIQQ")
+_STRING_COUNT = struct.Struct("<I4x")
+_WINDOW = struct.Struct("<qIIIII4x")
+_WINDOW_V1 = struct.Struct("<qIIII")
+
+# (欄位名稱, array 型別碼)；child_start 有 count+1 個、child_list 有 child_count 個，其餘為 count 個
+COLUMNS = (
+    ("type", "I"),
+    ("name", "I"),
+    ("id", "I"),
+    ("class", "I"),
+    ("depth", "h"),
+    ("parent", "i"),
+    ("left", "i"),
+    ("top", "i"),
+    ("width", "i"),
+    ("height", "i"),
+    ("flags", "B"),
+    ("child_start", "i"),
+    ("child_list", "i"),
+)
+_COLUMN_OFFSETS = struct.Struct("<" + "Q" * len(COLUMNS))
+
+# flags 位元
+ENABLED_KNOWN = 0x01
+ENABLED = 0x02
+VISIBLE_KNOWN = 0x04
+VISIBLE = 0x08
+RECT_KNOWN = 0x10
+
+_POS = re.compile(r"\((-?\d+),\s*(-?\d+)\)")
+_SIZE = re.compile(r"(-?\d+)x(-?\d+)")
+_NATIVE_LITTLE = sys.byteorder == "little"
+
+
+def parse_rect(pos, size):
+    """把 "(12,34)" 與 "80x22" 轉成 (left, top, width, height)，格式不符時回傳 None"""
+    pos = _POS.fullmatch(pos or "")
+    size = _SIZE.fullmatch(size or "")
+    if not (pos and size):
+        return None
+    return int(pos.group(1)), int(pos.group(2)), int(size.group(1)), int(size.group(2))
+
+
+def _pad(n):
+    return (-n) % 8
+
+
+class _StringTableBuilder:
+    """寫入時的字串編號表"""
+
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+
+    def intern(self, value):
+        value = value or ""
+        sid = self.ids.get(value)
+        if sid is None:
+            sid = self.ids[value] = len(self.strings)
+            self.strings.append(value)
+        return sid
+
+
+def _to_bytes(values):
+    if not _NATIVE_LITTLE:
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def write_snapshot(indexes, path):
+    """把 SnapshotIndex 列表寫成 .uiasnap，回傳寫入的元素數"""
+    strings = _StringTableBuilder()
+    strings.intern("")
+    windows = []
+    total = 0
+    for index in indexes:
+        n = len(index)
+        total += n
+        columns = {name: array(code) for name, code in COLUMNS}
+        for i in range(n):
+            columns["type"].append(strings.intern(index.types[i]))
+            columns["name"].append(strings.intern(index.names[i]))
+            columns["id"].append(strings.intern(index.ids[i]))
+            columns["class"].append(strings.intern(index.classes[i]))
+            columns["depth"].append(index.depths[i])
+            columns["parent"].append(index.parents[i])
+            flags = 0
+            if index.enabled[i] is not None:
+                flags |= ENABLED_KNOWN | (ENABLED if index.enabled[i] else 0)
+            if index.visible[i] is not None:
+                flags |= VISIBLE_KNOWN | (VISIBLE if index.visible[i] else 0)
+            rect = parse_rect(index.pos[i], index.size[i])
+            if rect:
+                flags |= RECT_KNOWN
+                left, top, width, height = rect
+            else:
+                left = top = width = height = 0
+            columns["left"].append(left)
+            columns["top"].append(top)
+            columns["width"].append(width)
+            columns["height"].append(height)
+            columns["flags"].append(flags)
+        if len(index.child_start) != n + 1:
+            index.finish()
+        columns["child_start"].extend(index.child_start)
+        columns["child_list"].extend(index.child_list)
+        windows.append((
+            index.hwnd or 0,
+            strings.intern(index.title),
+            strings.intern(json.dumps(index.truncated or {}, ensure_ascii=False)),
+            n,
+            len(index.child_list),
+            strings.intern(json.dumps(getattr(index, "meta", None) or {}, ensure_ascii=False)),
+            columns,
+        ))
+
+    with open(path, "wb") as f:
+        f.write(b"\0" * _HEADER.size)
+        f.write(b"\0" * _pad(_HEADER.size))
+
+        # 欄位資料
+        directory = []
+        for hwnd, title, truncated, n, child_count, meta, columns in windows:
+            offsets = []
+            for name, _ in COLUMNS:
+                data = _to_bytes(columns[name])
+                offsets.append(f.tell())
+                f.write(data)
+                f.write(b"\0" * _pad(len(data)))
+            directory.append(_WINDOW.pack(hwnd, title, truncated, n, child_count, meta) + _COLUMN_OFFSETS.pack(*offsets))
+
+        # 字串表
+        strings_offset = f.tell()
+        encoded = [s.encode("utf-8") for s in strings.strings]
+        offsets = array("Q", [0])
+        for blob in encoded:
+            offsets.append(offsets[-1] + len(blob))
+        f.write(_STRING_COUNT.pack(len(encoded)))
+        f.write(_to_bytes(offsets))
+        f.write(b"".join(encoded))
+        f.write(b"\0" * _pad(f.tell()))
+
+        # 視窗目錄
+        directory_offset = f.tell()
+        f.write(b"".join(directory))
+
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, VERSION, 0, len(windows), strings_offset, directory_offset))
+    return total
+
+
+class _StringTable:
+    """mmap 上的字串表，依需要解碼並快取"""
+
+    def __init__(self, view, offset):
+        (count,) = _STRING_COUNT.unpack_from(view, offset)
+        start = offset + _STRING_COUNT.size
+        self.offsets = _column(view, start, "Q", count + 1)
+        self.data_start = start + 8 * (count + 1)
+        self.view = view
+        self.cache = {}
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, sid):
+        value = self.cache.get(sid)
+        if value is None:
+            start = self.data_start + self.offsets[sid]
+            end = self.data_start + self.offsets[sid + 1]
+            value = self.cache[sid] = str(self.view[start:end], "utf-8")
+        return value
+
+    def find(self, value):
+        """回傳字串的編號，不存在時回傳 None"""
+        for sid in range(len(self)):
+            if self[sid] == value:
+                return sid
+        return None
+
+    def matching(self, predicate):
+        """所有符合條件的字串編號"""
+        return {sid for sid in range(len(self)) if predicate(self[sid])}
+
+
+def _column(view, offset, code, count):
+    size = array(code).itemsize * count
+    data = view[offset:offset + size]
+    if _NATIVE_LITTLE:
+        return data.cast(code)
+    # big-endian 平台：複製並轉換位元組順序（無法零複製）
+    values = array(code)
+    values.frombytes(data)
+    values.byteswap()
+    return values
+
+
+class _StringColumn:
+    """字串欄位：元素索引 → 字串"""
+
+    def __init__(self, sids, table):
+        self.sids = sids
+        self.table = table
+
+    def __len__(self):
+        return len(self.sids)
+
+    def __getitem__(self, i):
+        return self.table[self.sids[i]]
+
+    def __iter__(self):
+        table = self.table
+        return (table[sid] for sid in self.sids)
+
+
+class _DerivedColumn:
+    """由其他欄位即時計算的欄位（pos / size / enabled / visible）"""
+
+    def __init__(self, n, getter):
+        self.n = n
+        self.getter = getter
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.n
+        if not 0 <= i < self.n:
+            raise IndexError(i)
+        return self.getter(i)
+
+    def __iter__(self):
+        return (self.getter(i) for i in range(self.n))
+
+
+class ColumnarIndex(SnapshotIndex):
+    """mmap 上單一視窗的索引，欄位為唯讀檢視"""
+
+    def __init__(self, view, strings, entry_offset, version=VERSION):
+        if version == 1:
+            hwnd, title, truncated, n, child_count = _WINDOW_V1.unpack_from(view, entry_offset)
+            meta, entry = None, _WINDOW_V1
+        else:
+            hwnd, title, truncated, n, child_count, meta = _WINDOW.unpack_from(view, entry_offset)
+            entry = _WINDOW
+        super().__init__(hwnd, strings[title])
+        self.truncated = json.loads(strings[truncated])
+        if meta is not None:
+            self.meta = json.loads(strings[meta])
+        offsets = _COLUMN_OFFSETS.unpack_from(view, entry_offset + entry.size)
+        counts = {"child_start": n + 1, "child_list": child_count}
+        self.columns = {
+            name: _column(view, offset, code, counts.get(name, n))
+            for (name, code), offset in zip(COLUMNS, offsets)
+        }
+        self.strings = strings
+        c = self.columns
+        self.types = _StringColumn(c["type"], strings)
+        self.names = _StringColumn(c["name"], strings)
+        self.ids = _StringColumn(c["id"], strings)
+        self.classes = _StringColumn(c["class"], strings)
+        self.depths = c["depth"]
+        self.parents = c["parent"]
+        self.child_start = c["child_start"]
+        self.child_list = c["child_list"]
+        flags = c["flags"]
+        self.pos = _DerivedColumn(n, lambda i: f"({c['left'][i]},{c['top'][i]})" if flags[i] & RECT_KNOWN else "")
+        self.size = _DerivedColumn(n, lambda i: f"{c['width'][i]}x{c['height'][i]}" if flags[i] & RECT_KNOWN else "")
+        self.enabled = _DerivedColumn(n, lambda i: bool(flags[i] & ENABLED) if flags[i] & ENABLED_KNOWN else None)
+        self.visible = _DerivedColumn(n, lambda i: bool(flags[i] & VISIBLE) if flags[i] & VISIBLE_KNOWN else None)
+
+    def add(self, element):
+        raise TypeError("欄位式快照為唯讀")
+
+    def finish(self):
+        return self
+
+    def rect(self, i):
+        """(left, top, width, height)，未知時為 None"""
+        c = self.columns
+        if not c["flags"][i] & RECT_KNOWN:
+            return None
+        return c["left"][i], c["top"][i], c["width"][i], c["height"][i]
+
+    def search(self, type_filter="", name_filter="", id_filter="", limit=FILTER_LIMIT):
+        """以字串編號比對：每個不同的字串只解碼一次，元素欄位不解碼"""
+        strings = self.strings
+        type_sid = strings.find(type_filter) if type_filter else None
+        if type_filter and type_sid is None:
+            return [], 0
+        name_sids = strings.matching(lambda s: name_filter.lower() in s.lower()) if name_filter else None
+        id_sids = strings.matching(lambda s: id_filter.lower() in s.lower()) if id_filter else None
+
+        c = self.columns
+        types, names, ids = c["type"], c["name"], c["id"]
+        matches = []
+        total = 0
+        for i in range(len(types)):
+            if type_sid is not None and types[i] != type_sid:
+                continue
+            if name_sids is not None and names[i] not in name_sids:
+                continue
+            if id_sids is not None and ids[i] not in id_sids:
+                continue
+            total += 1
+            if len(matches) < limit:
+                matches.append(i)
+        return matches, total
+
+
+class ColumnarSnapshot:
+    """以 mmap 開啟 .uiasnap，windows 為每個視窗的 ColumnarIndex"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"不是有效的快照檔: {path}")
+        view = memoryview(self._mmap)
+        magic, version, _, window_count, strings_offset, directory_offset = _HEADER.unpack_from(view, 0)
+        if magic != MAGIC:
+            view.release()
+            self.close()
+            raise ValueError(f"不是有效的快照檔: {path}")
+        if version not in (1, VERSION):
+            view.release()
+            self.close()
+            raise ValueError(f"不支援的快照版本: {version}")
+        self.strings = _StringTable(view, strings_offset)
+        entry_size = (_WINDOW_V1 if version == 1 else _WINDOW).size + _COLUMN_OFFSETS.size
+        self.windows = [
+            ColumnarIndex(view, self.strings, directory_offset + w * entry_size, version)
+            for w in range(window_count)
+        ]
+        self._view = view
+
+    def close(self):
+        """釋放 mmap；之後不可再存取 windows"""
+        if self._mmap is None:
+            return
+        self.windows = []
+        self.strings = None
+        self._view = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            # 仍有外部引用欄位檢視，交給垃圾回收
+            pass
+        self._mmap = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load(path):
+    """開啟快照並回傳視窗索引列表（mmap 隨索引存活）"""
+    return ColumnarSnapshot(path).windows
+
+
+def convert_to_snapshot(src, dst):
+    """串流檔或舊版 JSON → .uiasnap"""
+    return write_snapshot(SnapshotIndex.load(src), dst)
+
+
+def convert_to_json(src, dst):
+    """.uiasnap → 舊版導出 JSON [{"hwnd", "title", "elements": [...]}, ...]"""
+    with ColumnarSnapshot(src) as snapshot, open(dst, "w", encoding="utf-8") as out:
+        out.write("[\n")
+        for w, index in enumerate(snapshot.windows):
+            if w:
+                out.write(",\n")
+            meta = "".join(f"{json.dumps(k, ensure_ascii=False)}: {json.dumps(v, ensure_ascii=False)}, "
+                           for k, v in (index.meta or {}).items())
+            out.write(f'  {{"hwnd": {json.dumps(index.hwnd)}, '
+                      f'"title": {json.dumps(index.title, ensure_ascii=False)}, {meta}"elements": [')
+            for i in range(len(index)):
+                element = {
+                    "type": index.types[i],
+                    "name": index.names[i],
+                    "id": index.ids[i],
+                    "class": index.classes[i],
+                }
+                if index.enabled[i] is not None:
+                    element["enabled"] = index.enabled[i]
+                if index.visible[i] is not None:
+                    element["visible"] = index.visible[i]
+                if index.pos[i]:
+                    element["pos"] = index.pos[i]
+                    element["size"] = index.size[i]
+                element["depth"] = index.depths[i]
+                out.write("\n    " if i == 0 else ",\n    ")
+                out.write(json.dumps(element, ensure_ascii=False))
+            out.write("\n  ]}" if len(index) else "]}")
+        out.write("\n]\n")
+        return len(snapshot.windows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='欄位式掃描快照轉換與查詢')
+    sub = parser.add_subparsers(dest='command', required=True)
+    to_snap = sub.add_parser('to-snap', help='串流檔 / JSON → .uiasnap')
+    to_snap.add_argument('src')
+    to_snap.add_argument('dst')
+    to_json = sub.add_parser('to-json', help='.uiasnap → 舊版 JSON')
+    to_json.add_argument('src')
+    to_json.add_argument('dst')
+    query = sub.add_parser('query', help='直接查詢 .uiasnap')
+    query.add_argument('src')
+    query.add_argument('--type', default='')
+    query.add_argument('--name', default='')
+    query.add_argument('--id', default='')
+    query.add_argument('--limit', type=int, default=50)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.command == 'to-snap':
+        count = convert_to_snapshot(args.src, args.dst)
+        print(f"✅ {count} 個元素 → {args.dst}（{time.perf_counter() - started:.2f} 秒）")
+    elif args.command == 'to-json':
+        windows = convert_to_json(args.src, args.dst)
+        print(f"✅ {windows} 個視窗 → {args.dst}（{time.perf_counter() - started:.2f} 秒）")
+    else:
+        with ColumnarSnapshot(args.src) as snapshot:
+            opened = time.perf_counter() - started
+            for index in snapshot.windows:
+                matches, total = index.search(args.type, args.name, args.id, args.limit)
+                print(f"🪟 {index.title}：{len(index)} 個元素，符合 {total} 個")
+                for i in matches:
+                    print(f"  [{i}] depth={index.depths[i]} " + " | ".join(str(v) for v in index.values(i)))
+            print(f"⏱️ 開啟 {opened * 1000:.1f} ms，查詢 {(time.perf_counter() - started - opened) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+掃描快照差異比對
+以「結構路徑 + 穩定識別雜湊」配對兩次掃描的元素，找出新增、移除與變更的元素，
+時間與樹的大小成線性關係
+
+識別雜湊：
+    元素本身的識別 = 類型 + AutomationId（沒有 AutomationId 時為空）
+    元素雜湊 = blake2b(父元素雜湊 + 本身識別 + 在同一父元素下相同識別的出現順序)
+名稱與類別不屬於識別：容器改名只回報該元素的名稱變更，子樹仍能配對；
+沒有 AutomationId 的元素以同類型兄弟中的順序區分，有 AutomationId 的元素不受兄弟插入或刪除影響
+
+視窗以 hwnd、標題或標題中的工作區配對，配對不到的視窗整個回報為新增或移除
+"""
+
+import hashlib
+import json
+from collections import namedtuple
+
+from scan_tree_view import SnapshotIndex
+from warm_state import workspace_key
+
+# 配對後比較的欄位（識別欄位以外）
+COMPARED_FIELDS = ("names", "classes", "enabled", "visible", "pos", "size")
+FIELD_LABELS = {"names": "名稱", "classes": "類別", "enabled": "啟用", "visible": "可見", "pos": "位置", "size": "大小"}
+
+ALLOW_HINTS = ("allow", "允許", "accept", "接受", "confirm", "確認")
+
+# status：""（兩次都有的視窗）、"opened"（新開啟）或 "closed"（已關閉）
+WindowDiff = namedtuple("WindowDiff", "old new added removed changed status", defaults=("",))
+WINDOW_STATUS_LABELS = {"opened": "（新開啟的視窗）", "closed": "（已關閉的視窗）"}
+
+
+def element_keys(index):
+    """計算每個元素的穩定識別雜湊（8 位元組），依前序一次完成"""
+    keys = [b""] * len(index)
+    occurrences = {}
+    for i in range(len(index)):
+        parent = index.parents[i]
+        parent_key = keys[parent] if parent >= 0 else b"root"
+        local = f"{index.types[i]}\x1f{index.ids[i]}"
+        slot = (parent_key, local)
+        occurrence = occurrences.get(slot, 0)
+        occurrences[slot] = occurrence + 1
+        digest = hashlib.blake2b(digest_size=8)
+        digest.update(parent_key)
+        digest.update(local.encode("utf-8"))
+        digest.update(occurrence.to_bytes(4, "little"))
+        keys[i] = digest.digest()
+    return keys
+
+
+def diff_indexes(old, new):
+    """比對同一個視窗的兩次快照；其中一邊為 None 時（視窗只出現在一次掃描）全部回報為新增或移除
+
+    Returns:
+        WindowDiff：added 為 new 的索引、removed 為 old 的索引、
+        changed 為 [(old 索引, new 索引, [變更欄位...]), ...]
+    """
+    status = ""
+    if old is None:
+        old, status = SnapshotIndex(new.hwnd, new.title).finish(), "opened"
+    elif new is None:
+        new, status = SnapshotIndex(old.hwnd, old.title).finish(), "closed"
+    old_keys = element_keys(old)
+    new_keys = element_keys(new)
+    old_by_key = {key: i for i, key in enumerate(old_keys)}
+
+    added = []
+    changed = []
+    matched = set()
+    for j, key in enumerate(new_keys):
+        i = old_by_key.get(key)
+        if i is None:
+            added.append(j)
+            continue
+        matched.add(i)
+        fields = [f for f in COMPARED_FIELDS if getattr(old, f)[i] != getattr(new, f)[j]]
+        if fields:
+            changed.append((i, j, fields))
+
+    removed = [i for i in range(len(old)) if i not in matched]
+    return WindowDiff(old, new, added, removed, changed, status)
+
+
+def subtree_roots(index, indices):
+    """只保留父元素不在集合中的元素（整棵新增/移除的子樹只回報根）"""
+    members = set(indices)
+    return [i for i in indices if index.parents[i] not in members]
+
+
+def element_path(index, i):
+    """可讀的結構路徑，例如 Window/Pane/Group/Button 'Allow'"""
+    parts = []
+    for node in index.ancestors(i) + [i]:
+        label = index.types[node] or "?"
+        if index.ids[node]:
+            label += f"#{index.ids[node]}"
+        parts.append(label)
+    name = index.names[i]
+    return "/".join(parts) + (f" '{name}'" if name else "")
+
+
+def pair_windows(old_indexes, new_indexes):
+    """配對兩次快照中的視窗：先以 hwnd，再以標題，最後以標題中的工作區
+
+    配對不到的視窗以 (old, None) / (None, new) 回傳
+    """
+    pairs = []
+    remaining = list(new_indexes)
+    for old in old_indexes:
+        match = next((n for n in remaining if n.hwnd == old.hwnd and n.hwnd is not None), None)
+        if match is None:
+            match = next((n for n in remaining if n.title == old.title), None)
+        if match is None:
+            workspace = workspace_key(old.title or "")
+            if workspace is not None:
+                match = next((n for n in remaining if workspace_key(n.title or "") == workspace), None)
+        if match is not None:
+            remaining.remove(match)
+        pairs.append((old, match))
+    pairs.extend((None, new) for new in remaining)
+    return pairs
+
+
+def diff_snapshots(old_path, new_path):
+    """比對兩個快照檔（串流檔或舊版 JSON），回傳每個視窗的 WindowDiff"""
+    old_indexes = SnapshotIndex.load(old_path)
+    new_indexes = SnapshotIndex.load(new_path)
+    return [diff_indexes(old, new) for old, new in pair_windows(old_indexes, new_indexes)]
+
+
+def is_allow_like(index, i):
+    name = index.names[i].lower()
+    return any(hint in name for hint in ALLOW_HINTS)
+
+
+def allow_prompt_roots(diff):
+    """含有 Allow 類按鈕的新增子樹的根（Allow 提示出現的位置）
+
+    名稱變成 Allow 類的既有元素直接回報元素本身
+    """
+    added = set(diff.added)
+    hits = [j for j in diff.added if is_allow_like(diff.new, j)]
+    hits += [j for _, j, _ in diff.changed if is_allow_like(diff.new, j)]
+    root_of = {}
+    for j in hits:
+        node = j
+        while diff.new.parents[node] in added:
+            node = diff.new.parents[node]
+        root_of[node] = True
+    return list(root_of)
+
+
+def format_report(diffs, limit=50):
+    """文字報表"""
+    lines = []
+    for diff in diffs:
+        added_roots = subtree_roots(diff.new, diff.added)
+        removed_roots = subtree_roots(diff.old, diff.removed)
+        lines.append("=" * 120)
+        lines.append(f"視窗: {diff.new.title}{WINDOW_STATUS_LABELS.get(diff.status, '')}")
+        lines.append(f"  新增 {len(diff.added)} 個元素（{len(added_roots)} 棵子樹）、"
+                     f"移除 {len(diff.removed)} 個（{len(removed_roots)} 棵子樹）、變更 {len(diff.changed)} 個")
+        for title, index, items in (("➕ 新增", diff.new, added_roots), ("➖ 移除", diff.old, removed_roots)):
+            if items:
+                lines.append(f"  {title}:")
+                for i in items[:limit]:
+                    lines.append(f"    {element_path(index, i)}")
+                if len(items) > limit:
+                    lines.append(f"    ... 還有 {len(items) - limit} 個")
+        if diff.changed:
+            lines.append("  ✏️ 變更:")
+            for i, j, fields in diff.changed[:limit]:
+                details = ", ".join(
+                    f"{FIELD_LABELS[f]} {getattr(diff.old, f)[i]!r} → {getattr(diff.new, f)[j]!r}" for f in fields
+                )
+                lines.append(f"    {element_path(diff.new, j)}: {details}")
+            if len(diff.changed) > limit:
+                lines.append(f"    ... 還有 {len(diff.changed) - limit} 個")
+        for j in allow_prompt_roots(diff)[:limit]:
+            lines.append(f"  🎯 Allow 提示: {element_path(diff.new, j)}")
+    return lines
+
+
+def diff_to_json(diffs):
+    """機器可讀的比對結果"""
+    result = []
+    for diff in diffs:
+        result.append({
+            "title": diff.new.title,
+            "status": diff.status or "paired",
+            "added": [element_path(diff.new, j) for j in subtree_roots(diff.new, diff.added)],
+            "removed": [element_path(diff.old, i) for i in subtree_roots(diff.old, diff.removed)],
+            "changed": [
+                {"path": element_path(diff.new, j),
+                 "fields": {FIELD_LABELS[f]: [getattr(diff.old, f)[i], getattr(diff.new, f)[j]] for f in fields}}
+                for i, j, fields in diff.changed
+            ],
+            "allow_prompt": [element_path(diff.new, j) for j in allow_prompt_roots(diff)],
+        })
+    return result
+
+
+def main(old_path, new_path, json_out=None):
+    """命令列差異模式"""
+    diffs = diff_snapshots(old_path, new_path)
+    for line in format_report(diffs):
+        print(line)
+    if json_out:
+        with open(json_out, "w", encoding="utf-8") as f:
+            json.dump(diff_to_json(diffs), f, ensure_ascii=False, indent=2)
+        print(f"\n✅ 已寫入: {json_out}")
@@ -0,0 +1,348 @@
+"""
+掃描歷史的本機 SQLite 資料庫
+把大量掃描快照（串流檔、.uiasnap、舊版 JSON）匯入同一個資料庫，
+以索引查詢類型、名稱（全文檢索）、AutomationId、類別與深度，並保留每個快照的標題、時間與 VS Code 版本
+
+用法：
+    python scan_store.py import scans/ --db scan_history.db
+    python scan_store.py import old_exports/*.json --vscode-version 1.95.3
+    python scan_store.py query --type Button --id workbench.action.chat.allow --depth 12 --builds
+    python scan_store.py query --name "allow" --version 1.96.0 --paths
+    python scan_store.py list
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+from scan_columnar import parse_rect
+from scan_tree_view import SnapshotIndex, find_snapshots
+
+DEFAULT_DB = "scan_history.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    source_size INTEGER,
+    source_mtime REAL,
+    window_index INTEGER NOT NULL,
+    hwnd INTEGER,
+    title TEXT,
+    scanned_at TEXT,
+    vscode_version TEXT,
+    element_count INTEGER,
+    imported_at TEXT,
+    UNIQUE (source, window_index)
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_version ON snapshots (vscode_version);
+
+CREATE TABLE IF NOT EXISTS elements (
+    id INTEGER PRIMARY KEY,
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots (id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    parent INTEGER NOT NULL,
+    depth INTEGER NOT NULL,
+    type TEXT,
+    name TEXT,
+    automation_id TEXT,
+    class TEXT,
+    enabled INTEGER,
+    visible INTEGER,
+    left INTEGER,
+    top INTEGER,
+    width INTEGER,
+    height INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_elements_type_depth ON elements (type, depth);
+CREATE INDEX IF NOT EXISTS idx_elements_automation_id ON elements (automation_id) WHERE automation_id != '';
+CREATE INDEX IF NOT EXISTS idx_elements_class ON elements (class);
+CREATE INDEX IF NOT EXISTS idx_elements_depth ON elements (depth);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_elements_snapshot ON elements (snapshot_id, idx);
+"""
+
+# 名稱全文檢索：trigram 支援任意子字串（含中文），需要 SQLite 3.34+；
+# 不支援時不建立全文檢索表，名稱一律以 LIKE 比對子字串（unicode61 斷詞只能比對整個詞，不符合子字串語意）
+FTS_TOKENIZERS = ("trigram",)
+
+BATCH_SIZE = 5000
+
+
+class ScanStore:
+    """掃描歷史資料庫"""
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(SCHEMA)
+        self.fts_tokenizer = self._init_fts()
+
+    def _init_fts(self):
+        """建立名稱全文檢索表，回傳使用的斷詞器（不支援 trigram 時回傳 None，改用 LIKE）
+
+        舊版建立的 unicode61 表仍會同步更新，但查詢不使用
+        """
+        row = self.conn.execute("SELECT sql FROM sqlite_master WHERE name = 'element_names'").fetchone()
+        if row:
+            return "trigram" if "trigram" in row[0] else "unicode61"
+        for tokenizer in FTS_TOKENIZERS:
+            try:
+                self.conn.execute(f"CREATE VIRTUAL TABLE element_names USING fts5(name, tokenize = '{tokenizer}')")
+                return tokenizer
+            except sqlite3.OperationalError:
+                continue
+        return None
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- 匯入 ----------
+
+    def is_imported(self, path):
+        stat = os.stat(path)
+        row = self.conn.execute(
+            "SELECT 1 FROM snapshots WHERE source = ? AND source_size = ? AND source_mtime = ? LIMIT 1",
+            (os.path.abspath(path), stat.st_size, stat.st_mtime),
+        ).fetchone()
+        return row is not None
+
+    def remove_source(self, path):
+        source = os.path.abspath(path)
+        ids = [row[0] for row in self.conn.execute("SELECT id FROM snapshots WHERE source = ?", (source,))]
+        for snapshot_id in ids:
+            if self.fts_tokenizer:
+                self.conn.execute(
+                    "DELETE FROM element_names WHERE rowid IN (SELECT id FROM elements WHERE snapshot_id = ?)",
+                    (snapshot_id,),
+                )
+            self.conn.execute("DELETE FROM elements WHERE snapshot_id = ?", (snapshot_id,))
+            self.conn.execute("DELETE FROM snapshots WHERE id = ?", (snapshot_id,))
+
+    def import_snapshot(self, path, vscode_version=None, force=False):
+        """匯入一個快照檔，回傳匯入的元素數（已匯入且檔案未變更時回傳 None）"""
+        if not force and self.is_imported(path):
+            return None
+        indexes = SnapshotIndex.load(path)
+        stat = os.stat(path)
+        fallback_time = datetime.fromtimestamp(stat.st_mtime).isoformat(timespec="seconds")
+        total = 0
+        with self.conn:
+            self.remove_source(path)
+            for window_index, index in enumerate(indexes):
+                meta = getattr(index, "meta", {}) or {}
+                cursor = self.conn.execute(
+                    "INSERT INTO snapshots (source, source_size, source_mtime, window_index, hwnd, title, "
+                    "scanned_at, vscode_version, element_count, imported_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (os.path.abspath(path), stat.st_size, stat.st_mtime, window_index, index.hwnd, index.title,
+                     meta.get("scanned_at") or fallback_time, vscode_version or meta.get("vscode_version"),
+                     len(index), datetime.now().isoformat(timespec="seconds")),
+                )
+                total += self._insert_elements(cursor.lastrowid, index)
+        return total
+
+    def _insert_elements(self, snapshot_id, index):
+        first_id = (self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM elements").fetchone()[0]) + 1
+        rows = []
+        names = []
+        for i in range(len(index)):
+            rect = parse_rect(index.pos[i], index.size[i]) or (None, None, None, None)
+            enabled, visible = index.enabled[i], index.visible[i]
+            rows.append((
+                first_id + i, snapshot_id, i, index.parents[i], index.depths[i],
+                index.types[i], index.names[i], index.ids[i], index.classes[i],
+                None if enabled is None else int(enabled), None if visible is None else int(visible),
+                *rect,
+            ))
+            if index.names[i]:
+                names.append((first_id + i, index.names[i]))
+            if len(rows) >= BATCH_SIZE:
+                self._flush(rows, names)
+                rows, names = [], []
+        self._flush(rows, names)
+        return len(index)
+
+    def _flush(self, rows, names):
+        self.conn.executemany("INSERT INTO elements VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        if self.fts_tokenizer and names:
+            self.conn.executemany("INSERT INTO element_names (rowid, name) VALUES (?, ?)", names)
+
+    # ---------- 查詢 ----------
+
+    def query(self, type_=None, name=None, automation_id=None, class_=None, depth=None, min_depth=None,
+              max_depth=None, version=None, title=None, limit=100):
+        """回傳符合條件的元素（dict 列表）"""
+        where, params = self._conditions(type_, name, automation_id, class_, depth, min_depth, max_depth,
+                                         version, title)
+        sql = ("SELECT s.vscode_version, s.title, s.scanned_at, s.source, e.snapshot_id, e.idx, e.depth, "
+               "e.type, e.name, e.automation_id, e.class, e.left, e.top, e.width, e.height "
+               "FROM elements e JOIN snapshots s ON s.id = e.snapshot_id")
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY s.vscode_version, s.scanned_at, e.idx LIMIT ?"
+        columns = ("vscode_version", "title", "scanned_at", "source", "snapshot_id", "idx", "depth",
+                   "type", "name", "automation_id", "class", "left", "top", "width", "height")
+        return [dict(zip(columns, row)) for row in self.conn.execute(sql, params + [limit])]
+
+    def builds(self, type_=None, name=None, automation_id=None, class_=None, depth=None, min_depth=None,
+               max_depth=None, version=None, title=None):
+        """依 VS Code 版本彙總：[(版本, 快照數, 元素數, 最早掃描, 最晚掃描), ...]"""
+        where, params = self._conditions(type_, name, automation_id, class_, depth, min_depth, max_depth,
+                                         version, title)
+        sql = ("SELECT s.vscode_version, COUNT(DISTINCT s.id), COUNT(*), MIN(s.scanned_at), MAX(s.scanned_at) "
+               "FROM elements e JOIN snapshots s ON s.id = e.snapshot_id")
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " GROUP BY s.vscode_version ORDER BY s.vscode_version"
+        return self.conn.execute(sql, params).fetchall()
+
+    def _conditions(self, type_, name, automation_id, class_, depth, min_depth, max_depth, version, title):
+        where, params = [], []
+        if type_:
+            where.append("e.type = ?")
+            params.append(type_)
+        if name:
+            if self.fts_tokenizer == "trigram" and len(name) >= 3:
+                where.append("e.id IN (SELECT rowid FROM element_names WHERE element_names MATCH ?)")
+                params.append('"' + name.replace('"', '""') + '"')
+            else:
+                # trigram 需要至少 3 個字元；較短的字串或沒有 trigram 時改用 LIKE
+                where.append("e.name LIKE ?")
+                params.append(f"%{name}%")
+        if automation_id:
+            where.append("e.automation_id = ?")
+            params.append(automation_id)
+        if class_:
+            where.append("e.class = ?")
+            params.append(class_)
+        if depth is not None:
+            where.append("e.depth = ?")
+            params.append(depth)
+        if min_depth is not None:
+            where.append("e.depth >= ?")
+            params.append(min_depth)
+        if max_depth is not None:
+            where.append("e.depth <= ?")
+            params.append(max_depth)
+        if version:
+            where.append("s.vscode_version = ?")
+            params.append(version)
+        if title:
+            where.append("s.title LIKE ?")
+            params.append(f"%{title}%")
+        return where, params
+
+    def element_path(self, snapshot_id, idx):
+        """與 scan_diff.element_path 相同格式的結構路徑"""
+        parts = []
+        name = None
+        while idx >= 0:
+            row = self.conn.execute(
+                "SELECT parent, type, automation_id, name FROM elements WHERE snapshot_id = ? AND idx = ?",
+                (snapshot_id, idx),
+            ).fetchone()
+            if row is None:
+                break
+            parent, type_, automation_id, element_name = row
+            if name is None:
+                name = element_name
+            parts.append((type_ or "?") + (f"#{automation_id}" if automation_id else ""))
+            idx = parent
+        parts.reverse()
+        return "/".join(parts) + (f" '{name}'" if name else "")
+
+    def snapshots(self):
+        return self.conn.execute(
+            "SELECT id, vscode_version, scanned_at, element_count, title, source FROM snapshots "
+            "ORDER BY scanned_at, id"
+        ).fetchall()
+
+
+def _query_args(args):
+    return dict(type_=args.type, name=args.name, automation_id=args.id, class_=args.cls, depth=args.depth,
+                min_depth=args.min_depth, max_depth=args.max_depth, version=args.version, title=args.title)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='掃描歷史資料庫')
+    parser.add_argument('--db', default=DEFAULT_DB, help='資料庫路徑')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    imp = sub.add_parser('import', help='匯入掃描快照')
+    imp.add_argument('inputs', nargs='+', help='快照檔、目錄或萬用字元')
+    imp.add_argument('--vscode-version', help='指定 VS Code 版本（快照中沒有記錄時使用）')
+    imp.add_argument('--force', action='store_true', help='重新匯入已匯入的檔案')
+
+    query = sub.add_parser('query', help='查詢元素')
+    query.add_argument('--type', help='控制項類型（完全相符）')
+    query.add_argument('--name', help='名稱（全文檢索，子字串）')
+    query.add_argument('--id', help='AutomationId（完全相符）')
+    query.add_argument('--class', dest='cls', help='類別（完全相符）')
+    query.add_argument('--depth', type=int, help='深度')
+    query.add_argument('--min-depth', type=int)
+    query.add_argument('--max-depth', type=int)
+    query.add_argument('--version', help='VS Code 版本')
+    query.add_argument('--title', help='視窗標題（子字串）')
+    query.add_argument('--limit', type=int, default=50)
+    query.add_argument('--builds', action='store_true', help='依 VS Code 版本彙總')
+    query.add_argument('--paths', action='store_true', help='顯示每個元素的結構路徑')
+
+    sub.add_parser('list', help='列出已匯入的快照')
+    args = parser.parse_args(argv)
+
+    with ScanStore(args.db) as store:
+        if args.command == 'import':
+            paths = find_snapshots(args.inputs, exclude=[args.db])
+            started = time.perf_counter()
+            imported = skipped = elements = 0
+            for path in paths:
+                try:
+                    count = store.import_snapshot(path, args.vscode_version, args.force)
+                except Exception as e:
+                    print(f"❌ {path}: {e}")
+                    continue
+                if count is None:
+                    skipped += 1
+                    continue
+                imported += 1
+                elements += count
+                print(f"✅ {path}: {count} 個元素")
+            print(f"匯入 {imported} 個快照（{elements} 個元素），略過 {skipped} 個未變更的快照，"
+                  f"耗時 {time.perf_counter() - started:.1f} 秒")
+
+        elif args.command == 'query':
+            started = time.perf_counter()
+            if args.builds:
+                rows = store.builds(**_query_args(args))
+                elapsed = (time.perf_counter() - started) * 1000
+                print(f"{'VS Code 版本':16s} {'快照':>6s} {'元素':>8s}  掃描時間")
+                for version, snapshots, count, first, last in rows:
+                    print(f"{version or '(未知)':16s} {snapshots:6d} {count:8d}  {first} ~ {last}")
+            else:
+                rows = store.query(**_query_args(args), limit=args.limit)
+                elapsed = (time.perf_counter() - started) * 1000
+                for row in rows:
+                    print(f"[{row['vscode_version'] or '?'}] {row['scanned_at']} depth={row['depth']} "
+                          f"{row['type']} | {row['name']} | {row['automation_id']} | {row['class']}")
+                    if args.paths:
+                        print(f"    {store.element_path(row['snapshot_id'], row['idx'])}")
+            print(f"⏱️ {len(rows)} 筆，查詢 {elapsed:.1f} ms（全文檢索: {'trigram' if store.fts_tokenizer == 'trigram' else '無，使用 LIKE'}）")
+
+        else:
+            for snapshot_id, version, scanned_at, count, title, source in store.snapshots():
+                print(f"#{snapshot_id:<5d} [{version or '?'}] {scanned_at} {count:8d} 個元素  {title}  ({source})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
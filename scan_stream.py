@@ -0,0 +1,220 @@
+"""
+掃描結果串流輸出（JSON Lines）
+每個元素掃描到就寫出一行精簡 JSON，不需要在記憶體中保留整個元素列表
+支援 gzip / zstd 壓縮（zstd 需要安裝 zstandard）
+
+檔案內容：
+    {"kind":"window","hwnd":...,"title":...,"scanned_at":...,"vscode_version":...}
+    {"kind":"element","hwnd":...,"type":...,"name":...,"depth":...}   × N
+    {"kind":"window_end","hwnd":...,"count":...,"truncated":{...}}
+"""
+
+import gzip
+import io
+import json
+import os
+import shutil
+import threading
+from datetime import datetime
+
+COMPRESSIONS = {
+    "none": "",
+    "gzip": ".gz",
+    "zstd": ".zst",
+}
+
+
+def _dumps(record):
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+
+
+def _window_record(hwnd, title, meta=None):
+    """視窗開頭記錄；meta 為額外的視窗資訊（例如 vscode_version）"""
+    record = {
+        "kind": "window",
+        "hwnd": hwnd,
+        "title": title,
+        "scanned_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    record.update(meta or {})
+    return record
+
+
+def open_text(path, mode="r"):
+    """依副檔名開啟（可能壓縮的）文字檔，mode 為 "r" 或 "w" """
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    if path.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("zstd 壓縮需要安裝 zstandard：pip install zstandard")
+        raw = open(path, mode + "b")
+        if mode == "w":
+            stream = zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=True)
+        else:
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        return io.TextIOWrapper(stream, encoding="utf-8")
+    return open(path, mode, encoding="utf-8", newline="\n")
+
+
+class ScanStreamWriter:
+    """逐筆寫出掃描結果"""
+
+    def __init__(self, out_dir, compression="none", prefix="vscode_scan"):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"不支援的壓縮格式: {compression}")
+        os.makedirs(out_dir, exist_ok=True)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.path = os.path.join(out_dir, f"{prefix}_{timestamp}.jsonl{COMPRESSIONS[compression]}")
+        self._file = open_text(self.path, "w")
+        self._lock = threading.Lock()
+        self._hwnd = None
+        self.element_count = 0
+
+    def begin_window(self, hwnd, title, meta=None):
+        self._hwnd = hwnd
+        self._file.write(_dumps(_window_record(hwnd, title, meta)) + "\n")
+
+    def write_element(self, data):
+        record = {"kind": "element", "hwnd": self._hwnd}
+        record.update(data)
+        self._file.write(_dumps(record) + "\n")
+        self.element_count += 1
+
+    def end_window(self, count, truncated=None):
+        self._file.write(_dumps({
+            "kind": "window_end",
+            "hwnd": self._hwnd,
+            "count": count,
+            "truncated": truncated or {},
+        }) + "\n")
+        self._hwnd = None
+
+    def window_part(self, hwnd, title, meta=None):
+        """多執行緒同時掃描時使用：每個視窗先寫入自己的暫存檔，完成後整段併入主檔"""
+        return _WindowPart(self, hwnd, title, meta)
+
+    def _merge_part(self, part_path, count):
+        with self._lock:
+            with open(part_path, "r", encoding="utf-8") as part:
+                shutil.copyfileobj(part, self._file)
+            self.element_count += count
+        os.remove(part_path)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _WindowPart:
+    """單一視窗的暫存輸出，格式與主檔相同"""
+
+    def __init__(self, writer, hwnd, title, meta=None):
+        self._writer = writer
+        self._hwnd = hwnd
+        self.path = f"{writer.path}.{hwnd}.part"
+        self._file = open(self.path, "w", encoding="utf-8", newline="\n")
+        self._file.write(_dumps(_window_record(hwnd, title, meta)) + "\n")
+
+    def write_element(self, data):
+        record = {"kind": "element", "hwnd": self._hwnd}
+        record.update(data)
+        self._file.write(_dumps(record) + "\n")
+
+    def end_window(self, count, truncated=None):
+        self._file.write(_dumps({
+            "kind": "window_end",
+            "hwnd": self._hwnd,
+            "count": count,
+            "truncated": truncated or {},
+        }) + "\n")
+        self._file.close()
+        self._writer._merge_part(self.path, count)
+
+    def discard(self):
+        """發生錯誤時放棄此視窗的暫存檔"""
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def iter_records(path):
+    """逐行讀取串流檔，產生每筆記錄"""
+    with open_text(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def iter_windows(path):
+    """以視窗為單位讀取：產生 (視窗資訊, 元素產生器)
+
+    元素產生器必須在取下一個視窗前讀完（串流讀取，不回頭）
+    """
+    records = iter_records(path)
+    pending = None
+
+    def _elements():
+        nonlocal pending
+        for record in records:
+            if record["kind"] == "element":
+                record.pop("kind")
+                record.pop("hwnd", None)
+                yield record
+            elif record["kind"] == "window_end":
+                info["count"] = record.get("count")
+                info["truncated"] = record.get("truncated", {})
+                return
+            elif record["kind"] == "window":
+                pending = record
+                return
+
+    while True:
+        if pending is not None:
+            info, pending = pending, None
+        else:
+            info = next((r for r in records if r["kind"] == "window"), None)
+            if info is None:
+                return
+        info.pop("kind")
+        elements = _elements()
+        yield info, elements
+        for _ in elements:
+            pass
+
+
+def convert_to_legacy_json(stream_path, json_path):
+    """轉成舊版導出格式 [{"hwnd", "title", "elements": [...]}, ...]
+
+    逐筆寫出，不需要把整個掃描結果讀進記憶體；視窗的其他資訊（scanned_at、vscode_version 等）
+    與 scan_columnar.convert_to_json 一樣寫在 "elements" 之前
+    """
+    windows = 0
+    with open(json_path, "w", encoding="utf-8") as out:
+        out.write("[\n")
+        for info, elements in iter_windows(stream_path):
+            if windows:
+                out.write(",\n")
+            windows += 1
+            meta = "".join(f"{json.dumps(k, ensure_ascii=False)}: {json.dumps(v, ensure_ascii=False)}, "
+                           for k, v in info.items() if k not in ("hwnd", "title", "count", "truncated"))
+            out.write(f'  {{"hwnd": {json.dumps(info["hwnd"])}, '
+                      f'"title": {json.dumps(info["title"], ensure_ascii=False)}, {meta}"elements": [')
+            first = True
+            for element in elements:
+                out.write("\n    " if first else ",\n    ")
+                out.write(json.dumps(element, ensure_ascii=False))
+                first = False
+            out.write("\n  ]}" if not first else "]}")
+        out.write("\n]\n")
+    return windows
@@ -0,0 +1,452 @@
+"""
+掃描結果樹狀檢視（延遲展開）
+- SnapshotIndex：把串流檔中一個視窗的元素轉成欄位陣列 + 子節點索引（CSR），不保留每筆 dict
+- LazyTreeView：ttk.Treeview 只在展開時插入子節點，子節點過多時分頁載入；
+  資料來源可以是掃描快照或即時 UIA 樹，並可依類型 / 名稱 / AutomationId 篩選
+"""
+
+import glob
+import json
+import os
+import sys
+import threading
+import tkinter as tk
+from array import array
+from tkinter import ttk
+
+from scan_stream import iter_windows
+
+PAGE_SIZE = 500  # 每次展開最多插入的子節點數
+FILTER_LIMIT = 1000  # 篩選結果最多顯示的元素數
+PLACEHOLDER = "…"
+SNAPSHOT_SUFFIXES = (".jsonl", ".jsonl.gz", ".jsonl.zst", ".uiasnap", ".json")
+
+
+class SnapshotIndex:
+    """單一視窗的元素索引（前序排列）"""
+
+    def __init__(self, hwnd, title):
+        self.hwnd = hwnd
+        self.title = title
+        self.types = []
+        self.names = []
+        self.ids = []
+        self.classes = []
+        self.pos = []
+        self.size = []
+        self.enabled = []  # True / False / None（未知）
+        self.visible = []
+        self.depths = array("i")
+        self.parents = array("i")
+        self.child_start = array("i")
+        self.child_list = array("i")
+        self.truncated = {}
+        self.meta = {}  # 其他視窗資訊，例如 scanned_at、vscode_version
+
+    def __len__(self):
+        return len(self.depths)
+
+    def add(self, element):
+        """依前序加入元素，父節點由深度推算"""
+        depth = element.get("depth", 0)
+        index = len(self.depths)
+        parent = -1
+        # 沿著前一個元素往上找，第一個深度較淺的就是父節點
+        candidate = index - 1
+        while candidate >= 0 and self.depths[candidate] >= depth:
+            candidate = self.parents[candidate]
+        if candidate >= 0:
+            parent = candidate
+
+        self.types.append(sys.intern(element.get("type") or ""))
+        self.names.append(element.get("name") or "")
+        self.ids.append(sys.intern(element.get("id") or ""))
+        self.classes.append(sys.intern(element.get("class") or ""))
+        self.pos.append(element.get("pos") or "")
+        self.size.append(element.get("size") or "")
+        self.enabled.append(element.get("enabled"))
+        self.visible.append(element.get("visible"))
+        self.depths.append(depth)
+        self.parents.append(parent)
+
+    def finish(self):
+        """建立 CSR 子節點索引：child_list[child_start[i]:child_start[i+1]] 為 i 的子節點"""
+        n = len(self.depths)
+        counts = array("i", [0]) * (n + 1)
+        for parent in self.parents:
+            if parent >= 0:
+                counts[parent + 1] += 1
+        for i in range(n):
+            counts[i + 1] += counts[i]
+        self.child_start = counts
+        fill = array("i", counts)
+        self.child_list = array("i", [0]) * max(0, counts[n])
+        for child, parent in enumerate(self.parents):
+            if parent >= 0:
+                self.child_list[fill[parent]] = child
+                fill[parent] += 1
+        return self
+
+    def roots(self):
+        return [i for i, parent in enumerate(self.parents) if parent < 0]
+
+    def children(self, i):
+        return self.child_list[self.child_start[i]:self.child_start[i + 1]]
+
+    def child_count(self, i):
+        return self.child_start[i + 1] - self.child_start[i]
+
+    def ancestors(self, i):
+        """由根到 i 的路徑（不含 i）"""
+        path = []
+        parent = self.parents[i]
+        while parent >= 0:
+            path.append(parent)
+            parent = self.parents[parent]
+        path.reverse()
+        return path
+
+    def values(self, i):
+        return (self.types[i], self.names[i], self.ids[i], self.classes[i], self.pos[i], self.size[i])
+
+    def search(self, type_filter="", name_filter="", id_filter="", limit=FILTER_LIMIT):
+        """回傳 (符合的索引列表（最多 limit 個）, 符合總數)"""
+        name_filter = name_filter.lower()
+        id_filter = id_filter.lower()
+        matches = []
+        total = 0
+        for i in range(len(self.depths)):
+            if type_filter and self.types[i] != type_filter:
+                continue
+            if name_filter and name_filter not in self.names[i].lower():
+                continue
+            if id_filter and id_filter not in self.ids[i].lower():
+                continue
+            total += 1
+            if len(matches) < limit:
+                matches.append(i)
+        return matches, total
+
+    @classmethod
+    def load_stream(cls, path):
+        """讀取串流檔，每個視窗一個 SnapshotIndex"""
+        indexes = []
+        for info, elements in iter_windows(path):
+            index = cls(info.get("hwnd"), info.get("title", ""))
+            for element in elements:
+                index.add(element)
+            index.truncated = info.get("truncated", {})
+            index.meta = {k: v for k, v in info.items() if k not in ("hwnd", "title", "count", "truncated")}
+            indexes.append(index.finish())
+        return indexes
+
+    @classmethod
+    def load_json(cls, path):
+        """讀取舊版導出格式 [{"hwnd", "title", "elements": [...]}, ...]"""
+        with open(path, encoding="utf-8") as f:
+            windows = json.load(f)
+        indexes = []
+        for window in windows:
+            index = cls(window.get("hwnd"), window.get("title", ""))
+            for element in window.get("elements", []):
+                index.add(element)
+            index.meta = {k: v for k, v in window.items() if k not in ("hwnd", "title", "elements")}
+            indexes.append(index.finish())
+        return indexes
+
+    @classmethod
+    def load(cls, path):
+        """依副檔名選擇串流檔（.jsonl[.gz|.zst]）、欄位式快照（.uiasnap）或舊版 JSON"""
+        if path.endswith(".uiasnap"):
+            import scan_columnar
+            return scan_columnar.load(path)
+        if path.endswith(".json"):
+            return cls.load_json(path)
+        return cls.load_stream(path)
+
+
+def find_snapshots(inputs, exclude=()):
+    """展開檔案、目錄與萬用字元，依名稱排序"""
+    exclude = {os.path.abspath(path) for path in exclude if path}
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            candidates = [os.path.join(item, name) for name in os.listdir(item)]
+        else:
+            candidates = glob.glob(item) or [item]
+        for path in candidates:
+            if path.endswith(SNAPSHOT_SUFFIXES) and os.path.isfile(path) and os.path.abspath(path) not in exclude:
+                paths.add(path)
+    return sorted(paths)
+
+
+class LazyTreeView(tk.Frame):
+    """延遲展開的元素樹"""
+
+    COLUMNS = ("type", "name", "id", "class", "pos", "size")
+    HEADINGS = ("類型", "名稱", "AutomationId", "類別", "位置", "大小")
+
+    def __init__(self, master, element_info=None, **kwargs):
+        super().__init__(master, **kwargs)
+        # 即時模式讀取元素資訊的函式（與掃描工具共用 get_element_info）
+        self.element_info = element_info
+        self.indexes = []
+        self.live_nodes = {}  # 即時模式：{iid: wrapper}
+        self.mode = None  # "snapshot" / "live"
+
+        # 篩選列
+        bar = tk.Frame(self)
+        bar.pack(fill=tk.X, pady=(0, 5))
+        tk.Label(bar, text="類型").pack(side=tk.LEFT)
+        self.type_var = tk.StringVar()
+        self.type_box = ttk.Combobox(bar, textvariable=self.type_var, width=16)
+        self.type_box.pack(side=tk.LEFT, padx=(2, 10))
+        tk.Label(bar, text="名稱").pack(side=tk.LEFT)
+        self.name_var = tk.StringVar()
+        tk.Entry(bar, textvariable=self.name_var, width=24).pack(side=tk.LEFT, padx=(2, 10))
+        tk.Label(bar, text="AutomationId").pack(side=tk.LEFT)
+        self.id_var = tk.StringVar()
+        tk.Entry(bar, textvariable=self.id_var, width=24).pack(side=tk.LEFT, padx=(2, 10))
+        tk.Button(bar, text="🔎 篩選", command=self.apply_filter).pack(side=tk.LEFT, padx=2)
+        tk.Button(bar, text="✖ 清除", command=self.clear_filter).pack(side=tk.LEFT, padx=2)
+        self.status = tk.Label(bar, text="尚未載入", anchor=tk.E)
+        self.status.pack(side=tk.RIGHT, fill=tk.X, expand=True)
+
+        # 樹
+        body = tk.Frame(self)
+        body.pack(fill=tk.BOTH, expand=True)
+        self.tree = ttk.Treeview(body, columns=self.COLUMNS, show="tree headings")
+        self.tree.heading("#0", text="元素")
+        self.tree.column("#0", width=260)
+        for column, heading in zip(self.COLUMNS, self.HEADINGS):
+            self.tree.heading(column, text=heading)
+            self.tree.column(column, width=140 if column != "name" else 300)
+        scroll = ttk.Scrollbar(body, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scroll.set)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scroll.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.tree.bind("<<TreeviewOpen>>", self._on_open)
+        self.tree.bind("<Double-1>", self._on_double_click)
+
+    # ---------- 載入 ----------
+
+    def _reset(self, mode):
+        self.tree.delete(*self.tree.get_children())
+        self.live_nodes = {}
+        self.mode = mode
+
+    def load_snapshot(self, path):
+        """背景讀取串流檔，完成後在主線程顯示"""
+        self.status.config(text=f"載入中: {path}")
+
+        def _worker():
+            try:
+                indexes = SnapshotIndex.load(path)
+                error = None
+            except Exception as e:
+                indexes, error = [], e
+            self.after(0, lambda: self._show_snapshot(indexes, path, error))
+
+        threading.Thread(target=_worker, daemon=True).start()
+
+    def show_indexes(self, indexes, source=""):
+        """直接顯示已建立的索引（例如差異比對結果）"""
+        self._show_snapshot(indexes, source, None)
+
+    def show_diff(self, indexes, marks, source=""):
+        """顯示快照並展開、標示差異子樹
+
+        Args:
+            marks: [(視窗索引, 元素索引, "added" / "changed"), ...]，第一個會被選取
+        """
+        self._show_snapshot(indexes, source, None)
+        self.tree.tag_configure("added", background="#d4edda")
+        self.tree.tag_configure("changed", background="#fff3cd")
+        first = None
+        for w, i, tag in marks:
+            iid = self.reveal(w, i, tag=tag)
+            first = first or iid
+        if first:
+            self.tree.selection_set(first)
+            self.tree.see(first)
+        self.status.config(text=f"差異：標示 {len(marks)} 個子樹（{source}）")
+
+    def _show_snapshot(self, indexes, path, error):
+        if error is not None:
+            self.status.config(text=f"❌ 載入失敗: {error}")
+            return
+        self._reset("snapshot")
+        self.indexes = indexes
+        types = set()
+        for w, index in enumerate(indexes):
+            types.update(index.types)
+            self.tree.insert("", tk.END, iid=f"w{w}", text=f"🪟 {index.title}",
+                             values=("Window", "", "", "", "", f"{len(index)} 個元素"))
+            self._insert_page(f"w{w}", w, index.roots(), 0)
+        self.type_box["values"] = [""] + sorted(t for t in types if t)
+        total = sum(len(index) for index in indexes)
+        self.status.config(text=f"快照 {path}：{len(indexes)} 個視窗、{total} 個元素")
+
+    def load_live(self, windows):
+        """即時模式：windows 為 [(hwnd, title, wrapper), ...]，展開時才讀取子元素"""
+        self._reset("live")
+        self.indexes = []
+        for hwnd, title, wrapper in windows:
+            iid = f"live{hwnd}"
+            self.tree.insert("", tk.END, iid=iid, text=f"🪟 {title}", values=("Window", "", "", "", "", ""))
+            self.live_nodes[iid] = wrapper
+            self.tree.insert(iid, tk.END, iid=f"{iid}/…", text=PLACEHOLDER)
+        self.status.config(text=f"即時 UIA 樹：{len(windows)} 個視窗（篩選僅適用於快照）")
+
+    # ---------- 延遲展開 ----------
+
+    def _node_iid(self, w, i):
+        return f"n{w}:{i}"
+
+    def _more_rows(self, parent_iid):
+        """父節點下的「載入更多」項目，回傳 [(iid, 起始位置)]"""
+        prefix = f"more:{parent_iid}:"
+        return [(iid, int(iid[len(prefix):])) for iid in self.tree.get_children(parent_iid)
+                if iid.startswith(prefix)]
+
+    def _insert_page(self, parent_iid, w, children, offset):
+        """插入一頁子節點；還有剩餘時加上「載入更多」項目（舊的「載入更多」項目先移除）"""
+        for iid, _ in self._more_rows(parent_iid):
+            self.tree.delete(iid)
+        index = self.indexes[w]
+        page = children[offset:offset + PAGE_SIZE]
+        for i in page:
+            iid = self._node_iid(w, i)
+            if self.tree.exists(iid):
+                continue
+            values = index.values(i)
+            self.tree.insert(parent_iid, tk.END, iid=iid, text=values[0] or "?", values=values)
+            if index.child_count(i):
+                self.tree.insert(iid, tk.END, iid=f"{iid}/…", text=PLACEHOLDER)
+        rest = len(children) - offset - len(page)
+        if rest > 0:
+            self.tree.insert(parent_iid, tk.END, iid=f"more:{parent_iid}:{offset + PAGE_SIZE}",
+                             text=f"⬇ 還有 {rest} 個（雙擊載入）")
+
+    def _on_open(self, event):
+        iid = self.tree.focus()
+        placeholder = f"{iid}/…"
+        if not self.tree.exists(placeholder):
+            return
+        self.tree.delete(placeholder)
+        if self.mode == "live":
+            self._expand_live(iid)
+        elif iid.startswith("n"):
+            w, i = (int(x) for x in iid[1:].split(":"))
+            self._insert_page(iid, w, self.indexes[w].children(i), 0)
+
+    def _on_double_click(self, event):
+        iid = self.tree.identify_row(event.y)
+        if not iid.startswith("more:"):
+            return
+        # iid 格式：more:{父節點 iid}:{起始位置}（父節點 iid 本身可能含冒號）
+        parent_iid, offset = iid[len("more:"):].rsplit(":", 1)
+        offset = int(offset)
+        self.tree.delete(iid)
+        if self.mode == "live":
+            self._expand_live(parent_iid, offset)
+        elif parent_iid.startswith("w"):
+            w = int(parent_iid[1:])
+            self._insert_page(parent_iid, w, self.indexes[w].roots(), offset)
+        else:
+            w, i = (int(x) for x in parent_iid[1:].split(":"))
+            self._insert_page(parent_iid, w, self.indexes[w].children(i), offset)
+
+    def _expand_live(self, iid, offset=0):
+        wrapper = self.live_nodes.get(iid)
+        if wrapper is None:
+            return
+        try:
+            children = wrapper.children()
+        except Exception as e:
+            self.tree.insert(iid, tk.END, text=f"❌ {e}")
+            return
+        page = children[offset:offset + PAGE_SIZE]
+        for n, child in enumerate(page, offset):
+            data = self.element_info(child) if self.element_info else None
+            if not data:
+                continue
+            child_iid = f"{iid}/{n}"
+            values = (data.get("type", ""), data.get("name", ""), data.get("id", ""),
+                      data.get("class", ""), data.get("pos", ""), data.get("size", ""))
+            self.tree.insert(iid, tk.END, iid=child_iid, text=values[0] or "?", values=values)
+            self.live_nodes[child_iid] = child
+            self.tree.insert(child_iid, tk.END, iid=f"{child_iid}/…", text=PLACEHOLDER)
+        rest = len(children) - offset - len(page)
+        if rest > 0:
+            self.tree.insert(iid, tk.END, iid=f"more:{iid}:{offset + PAGE_SIZE}",
+                             text=f"⬇ 還有 {rest} 個（雙擊載入）")
+
+    # ---------- 篩選 / 定位 ----------
+
+    def apply_filter(self):
+        if self.mode != "snapshot":
+            return
+        type_filter = self.type_var.get().strip()
+        name_filter = self.name_var.get().strip()
+        id_filter = self.id_var.get().strip()
+        if not (type_filter or name_filter or id_filter):
+            self.clear_filter()
+            return
+
+        self.tree.delete(*self.tree.get_children())
+        shown = 0
+        total = 0
+        for w, index in enumerate(self.indexes):
+            matches, count = index.search(type_filter, name_filter, id_filter, FILTER_LIMIT - shown)
+            total += count
+            for i in matches:
+                self.reveal(w, i, expand_pages=False)
+                self.tree.item(self._node_iid(w, i), tags=("match",))
+            shown += len(matches)
+        self.tree.tag_configure("match", background="#fff3cd")
+        self.status.config(text=f"篩選結果：{total} 個符合（顯示 {shown} 個）")
+
+    def clear_filter(self):
+        self.type_var.set("")
+        self.name_var.set("")
+        self.id_var.set("")
+        if self.mode == "snapshot":
+            self._show_snapshot(self.indexes, "", None)
+
+    def reveal(self, w, i, expand_pages=True, tag=None):
+        """插入由根到元素 i 的路徑並展開
+
+        expand_pages=True 時沿路載入完整的兄弟節點（一般瀏覽）；
+        False 時只插入路徑上的節點（篩選結果）
+        """
+        index = self.indexes[w]
+        window_iid = f"w{w}"
+        if not self.tree.exists(window_iid):
+            self.tree.insert("", tk.END, iid=window_iid, text=f"🪟 {index.title}",
+                             values=("Window", "", "", "", "", f"{len(index)} 個元素"))
+        parent_iid = window_iid
+        for node in index.ancestors(i) + [i]:
+            iid = self._node_iid(w, node)
+            if not self.tree.exists(iid):
+                if expand_pages:
+                    siblings = index.children(index.parents[node]) if index.parents[node] >= 0 else index.roots()
+                    placeholder = f"{parent_iid}/…"
+                    if self.tree.exists(placeholder):
+                        self.tree.delete(placeholder)
+                    # 從尚未載入的第一頁依序載入到目標所在的頁，子節點才會保持原本的順序
+                    loaded = self._more_rows(parent_iid)
+                    start = loaded[0][1] if loaded else 0
+                    target = (list(siblings).index(node) // PAGE_SIZE) * PAGE_SIZE
+                    for offset in range(start, target + 1, PAGE_SIZE):
+                        self._insert_page(parent_iid, w, siblings, offset)
+                else:
+                    self.tree.insert(parent_iid, tk.END, iid=iid, text=index.types[node] or "?",
+                                     values=index.values(node))
+            self.tree.item(parent_iid, open=True)
+            parent_iid = iid
+        if tag:
+            self.tree.item(parent_iid, tags=(tag,))
+        self.tree.see(parent_iid)
+        return parent_iid
@@ -0,0 +1,354 @@
+"""
+合成 UI Automation 樹
+提供與 pywinauto 包裝物件相同介面的假元素與後端，
+讓 find_and_click_allow_button / scan_windows 可以在沒有 VS Code 的情況下
+以可重複的方式執行（基準測試、負載測試、回放）
+"""
+
+import random
+import time
+
+
+class ReadCounter:
+    """統計屬性讀取次數，並可注入每次呼叫的延遲（模擬跨進程 COM 呼叫）"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.reads = 0
+        self.visited = 0
+        self.clicks = 0
+
+    def read(self):
+        self.reads += 1
+        if self.latency:
+            # 忙等待：time.sleep 在 Windows 上的精度只有毫秒級
+            end = time.perf_counter() + self.latency
+            while time.perf_counter() < end:
+                pass
+
+    def reset(self):
+        self.reads = 0
+        self.visited = 0
+        self.clicks = 0
+
+
+class ElementNotAvailable(RuntimeError):
+    """對應 pywinauto 的 ElementNotAvailable：元素已從樹中移除"""
+
+
+class SyntheticRect:
+    """對應 pywinauto 的 RECT"""
+    __slots__ = ("left", "top", "right", "bottom")
+
+    def __init__(self, left, top, right, bottom):
+        self.left = left
+        self.top = top
+        self.right = right
+        self.bottom = bottom
+
+    def width(self):
+        return self.right - self.left
+
+    def height(self):
+        return self.bottom - self.top
+
+
+class SyntheticElementInfo:
+    """對應 pywinauto 的 UIAElementInfo，每次讀取都計數"""
+    __slots__ = ("_elem",)
+
+    def __init__(self, elem):
+        self._elem = elem
+
+    @property
+    def name(self):
+        self._elem.counter.read()
+        return self._elem.name
+
+    @property
+    def control_type(self):
+        self._elem.counter.read()
+        return self._elem.control_type
+
+    @property
+    def automation_id(self):
+        self._elem.counter.read()
+        return self._elem.automation_id
+
+    @property
+    def class_name(self):
+        self._elem.counter.read()
+        return self._elem.class_name
+
+    def update(self):
+        self._elem.counter.read()
+
+
+class SyntheticElement:
+    """對應 pywinauto 的 UIAWrapper"""
+    __slots__ = ("control_type", "name", "automation_id", "class_name", "enabled", "visible",
+                 "rect", "_parent", "_children", "counter", "on_click", "clicks", "removed")
+
+    def __init__(self, control_type, name="", automation_id="", class_name="",
+                 enabled=True, visible=True, rect=None, counter=None):
+        self.control_type = control_type
+        self.name = name
+        self.automation_id = automation_id
+        self.class_name = class_name
+        self.enabled = enabled
+        self.visible = visible
+        self.rect = rect or SyntheticRect(0, 0, 80, 22)
+        self._parent = None
+        self._children = []
+        self.counter = counter
+        self.on_click = None
+        self.clicks = 0
+        self.removed = False  # detach() 之後讀取狀態會丟出 ElementNotAvailable
+
+    @property
+    def element_info(self):
+        return SyntheticElementInfo(self)
+
+    def parent(self):
+        self.counter.read()
+        return self._parent
+
+    def append(self, child, index=None):
+        child._parent = self
+        child.counter = self.counter
+        if index is None:
+            self._children.append(child)
+        else:
+            self._children.insert(index, child)
+        return child
+
+    def detach(self):
+        if self._parent is not None:
+            try:
+                self._parent._children.remove(self)
+            except ValueError:
+                pass
+            self._parent = None
+        self.removed = True
+
+    def children(self):
+        self.counter.read()
+        return list(self._children)
+
+    def descendants(self, control_type=None, depth=None):
+        """文件順序（前序）走訪，depth=1 表示只有直接子元素"""
+        self.counter.read()
+        results = []
+        stack = [(child, 1) for child in reversed(self._children)]
+        visited = 0
+        while stack:
+            elem, level = stack.pop()
+            visited += 1
+            if control_type is None or elem.control_type == control_type:
+                results.append(elem)
+            if depth is None or level < depth:
+                children = elem._children
+                for i in range(len(children) - 1, -1, -1):
+                    stack.append((children[i], level + 1))
+        self.counter.visited += visited
+        return results
+
+    def _check_available(self):
+        self.counter.read()
+        if self.removed:
+            raise ElementNotAvailable(self.name)
+
+    def is_enabled(self):
+        self._check_available()
+        return self.enabled
+
+    def is_visible(self):
+        self._check_available()
+        return self.visible
+
+    def rectangle(self):
+        self._check_available()
+        return self.rect
+
+    def invoke(self):
+        self.counter.read()
+        self.counter.clicks += 1
+        self.clicks += 1
+        if self.on_click is not None:
+            self.on_click(self)
+
+    click_input = invoke
+    click = invoke
+
+    def iter_subtree(self):
+        """不計數的前序走訪（產生器、測試工具內部使用）"""
+        stack = [(self, 0)]
+        while stack:
+            elem, level = stack.pop()
+            yield elem, level
+            children = elem._children
+            for i in range(len(children) - 1, -1, -1):
+                stack.append((children[i], level + 1))
+
+
+class SyntheticWindow(SyntheticElement):
+    """頂層視窗，可模擬無響應（每次 descendants 前卡住 hang 秒）"""
+    __slots__ = ("hang",)
+
+    def __init__(self, name="", counter=None, hang=0.0):
+        super().__init__("Window", name=name, class_name="Chrome_WidgetWin_1",
+                         rect=SyntheticRect(0, 0, 1600, 900), counter=counter)
+        self.hang = hang
+
+    def descendants(self, control_type=None, depth=None):
+        if self.hang:
+            time.sleep(self.hang)
+        return super().descendants(control_type=control_type, depth=depth)
+
+
+# 一般按鈕名稱（不會被判定為 Allow）
+_PLAIN_BUTTON_NAMES = [
+    "Close", "Run", "More Actions...", "Toggle Panel", "Go Back", "Go Forward",
+    "Split Editor Right", "Maximize", "Restore", "Minimize", "Search", "Settings",
+    "Source Control", "Run and Debug", "Extensions", "Accounts", "Manage",
+    "Clear", "Refresh", "Collapse All", "New File...", "Stop", "Send", "Attach Context",
+]
+
+# 測試排除規則用的誘餌按鈕
+_DECOY_BUTTON_NAMES = [
+    "Allow in Explorer Section",
+    "Disallow",
+    "Deny",
+    "Cancel",
+    "Allow chat participant to read the workspace and make changes to your files",
+    "Confirm message edit",
+]
+
+_OTHER_TYPES = ["Group", "Text", "Pane", "Custom", "ListItem", "Hyperlink", "Image", "Document"]
+
+
+def _make_button(rng, counter):
+    if rng.random() < 0.05:
+        name = rng.choice(_DECOY_BUTTON_NAMES)
+    else:
+        name = rng.choice(_PLAIN_BUTTON_NAMES)
+    left = rng.randrange(0, 1500)
+    top = rng.randrange(0, 880)
+    return SyntheticElement(
+        rng.choice(["Button", "Button", "Button", "SplitButton"]),
+        name=name,
+        class_name="monaco-button",
+        rect=SyntheticRect(left, top, left + rng.randrange(16, 140), top + rng.randrange(16, 30)),
+        counter=counter,
+    )
+
+
+def make_allow_button(counter=None, name="Allow"):
+    """建立一個會通過所有檢查的 Allow 按鈕"""
+    return SyntheticElement(
+        "Button", name=name, class_name="monaco-button monaco-text-button",
+        rect=SyntheticRect(900, 700, 980, 724), counter=counter,
+    )
+
+
+def generate_tree(size, button_density=0.1, allow_depth=None, allow_position="last",
+                  max_depth=45, seed=0, counter=None, title="synthetic - Visual Studio Code"):
+    """產生 size 個元素的合成視窗樹
+
+    Args:
+        size: 元素總數（不含根視窗）
+        button_density: Button/SplitButton 佔元素的比例
+        allow_depth: Allow 按鈕所在深度（None 表示不放 Allow 按鈕）
+        allow_position: "first" / "middle" / "last"，Allow 按鈕在同深度元素中的文件順序位置
+        max_depth: 樹的最大深度
+        seed: 亂數種子（相同參數產生相同的樹）
+    """
+    rng = random.Random(seed)
+    counter = counter or ReadCounter()
+    root = SyntheticWindow(name=title, counter=counter)
+    nodes = [(root, 0)]
+    window = 64
+    for i in range(size):
+        lo = max(0, len(nodes) - window)
+        parent, level = nodes[rng.randrange(lo, len(nodes))]
+        if level >= max_depth:
+            parent, level = nodes[rng.randrange(0, len(nodes))]
+            if level >= max_depth:
+                parent, level = root, 0
+        if rng.random() < button_density:
+            elem = _make_button(rng, counter)
+        else:
+            elem = SyntheticElement(rng.choice(_OTHER_TYPES), name="", counter=counter)
+        parent.append(elem)
+        nodes.append((elem, level + 1))
+
+    if allow_depth is not None:
+        place_allow_button(root, allow_depth, allow_position)
+    return root
+
+
+def place_allow_button(root, depth, position="last", button=None):
+    """在指定深度放入 Allow 按鈕，樹不夠深時補上一條 Group 鏈"""
+    counter = root.counter
+    button = button or make_allow_button(counter)
+    parents = [elem for elem, level in root.iter_subtree() if level == depth - 1]
+    if not parents:
+        deepest, level = max(root.iter_subtree(), key=lambda item: item[1])
+        while level < depth - 1:
+            deepest = deepest.append(SyntheticElement("Group", counter=counter))
+            level += 1
+        parents = [deepest]
+
+    if position == "first":
+        parents[0].append(button, index=0)
+    elif position == "middle":
+        parents[len(parents) // 2].append(button)
+    else:
+        parents[-1].append(button)
+    return button
+
+
+class SyntheticBackend:
+    """與 UIABackend 相同介面的合成後端"""
+
+    def __init__(self):
+        self.windows = {}  # {hwnd: {"title": str, "root": SyntheticWindow, "process": str, "connect_error": Exception|None, "screenshot": 陣列|None}}
+        self.clicks = []  # click_at 的螢幕座標 [(x, y), ...]
+
+    def add_window(self, hwnd, root, title=None, process="code", connect_error=None, screenshot=None):
+        self.windows[hwnd] = {
+            "title": title or root.name,
+            "root": root,
+            "process": process,
+            "connect_error": connect_error,
+            "screenshot": screenshot,
+        }
+
+    def remove_window(self, hwnd):
+        self.windows.pop(hwnd, None)
+
+    def enum_windows(self):
+        return [(hwnd, info["title"]) for hwnd, info in list(self.windows.items())]
+
+    def is_window(self, hwnd):
+        return hwnd in self.windows
+
+    def process_name(self, hwnd):
+        info = self.windows.get(hwnd)
+        return info["process"] if info else ""
+
+    def connect(self, hwnd):
+        info = self.windows[hwnd]
+        if info["connect_error"] is not None:
+            raise info["connect_error"]
+        return info["root"]
+
+    def capture(self, hwnd):
+        """回傳 (畫面陣列, 視窗左上角螢幕座標)，沒有設定畫面時回傳 None"""
+        info = self.windows.get(hwnd)
+        if info is None or info["screenshot"] is None:
+            return None
+        return info["screenshot"], (0, 0)
+
+    def click_at(self, x, y):
+        self.clicks.append((x, y))
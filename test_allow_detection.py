@@ -1,201 +1,470 @@
 """
-Allow 按钮检测诊断工具
-直接测试能否找到 Allow 按钮
+Allow 按鈕偵測剖析工具
+逐層走訪每個 VS Code 視窗的 UIA 樹（只讀取，不點擊），回報：
+- 每一層的元素數、取得該層元素的耗時，以及各控制項類型的元素數
+- 各按鈕類型以 descendants()（與監控循環相同的呼叫）搜尋的耗時與數量
+- 每個 Allow 候選按鈕（套用偵測規則）的深度、仍找得到它的最淺搜尋深度，
+  以及可唯一定位、範圍最小的祖先元素（從該元素往下搜尋的深度與元素數）
+
+--json 輸出機器可讀的報告；--aggregate 合併多台機器的報告，
+統計候選按鈕的深度分布、各深度的涵蓋率與走訪成本，並建議掃描深度與按鈕類型
+
+用法：
+    python test_allow_detection.py                                   # 真實 VS Code 視窗（Windows）
+    python test_allow_detection.py --json reports/%COMPUTERNAME%.json
+    python test_allow_detection.py --synthetic --elements 10000 --allow-depth 18
+    python test_allow_detection.py --aggregate reports/*.json --json fleet.json
 """
 
-import win32gui
-import win32process
-import psutil
-from pywinauto import Desktop
+import argparse
+import glob
+import json
+import os
+import platform
+import sys
+import time
+from collections import Counter
 from datetime import datetime
 
-def get_vscode_windows():
-    """找到所有 VS Code 视窗"""
+from candidate_filter import filter_candidates
+from detection_rules import RulesError, compile_rules, default_rules_path, load_rules
+
+# 原本診斷工具搜尋的四種類型（監控循環只搜尋規則檔的 button_types）
+PROFILE_TYPES = ["Button", "SplitButton", "MenuButton", "MenuItem"]
+
+REPORT_VERSION = 1
+
+
+def percentile(values, pct):
+    if not values:
+        return 0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def find_vscode_windows(backend):
+    """與監控循環相同的篩選條件"""
     windows = []
-    def cb(hwnd, _):
-        if win32gui.IsWindowVisible(hwnd):
-            title = win32gui.GetWindowText(hwnd)
-            try:
-                _, pid = win32process.GetWindowThreadProcessId(hwnd)
-                proc = psutil.Process(pid).name().lower().replace(".exe", "")
-                if proc == "code" and title.strip() and "Extension Development Host" not in title:
-                    windows.append((hwnd, title))
-            except:
-                pass
-        return True
-    win32gui.EnumWindows(cb, None)
+    for hwnd, title in backend.enum_windows():
+        if "Extension Development Host" in title:
+            continue
+        if backend.process_name(hwnd) == "code" and "Visual Studio Code" in title:
+            windows.append((hwnd, title))
     return windows
 
-def test_window_connection(hwnd, title):
-    """测试窗口连接"""
-    print(f"\n{'='*100}")
-    print(f"测试窗口: {title}")
-    print(f"HWND: {hwnd}")
-    print(f"{'='*100}")
-    
-    # 测试窗口是否存在
-    if not win32gui.IsWindow(hwnd):
-        print("❌ 窗口不存在")
-        return False
-    
-    print("✅ 窗口存在")
-    
-    # 测试 UI Automation 连接
-    try:
-        desktop = Desktop(backend="uia")
-        window = desktop.window(handle=hwnd)
-        print("✅ 成功连接到窗口")
-    except Exception as e:
-        print(f"❌ 无法连接到窗口: {e}")
-        return False
-    
-    # 搜索所有按钮类型
-    button_types = ["Button", "SplitButton", "MenuButton", "MenuItem"]
-    
-    print(f"\n开始搜索按钮...")
-    all_buttons = []
-    
-    for btn_type in button_types:
+
+class TreeWalk:
+    """逐層走訪的結果：元素以走訪順序編號，parents / levels / types 為對應的欄位"""
+
+    def __init__(self):
+        self.wrappers = []
+        self.parents = []  # 父元素編號（-1 表示視窗本身）
+        self.levels = []  # 深度（視窗的直接子元素為 1，等同 descendants 的 depth 參數）
+        self.types = []
+        self.level_stats = []  # [{"depth", "elements", "ms", "types": {類型: 數量}}, ...]
+        self._keys = None
+        self._key_counts = None
+
+    @classmethod
+    def run(cls, window, max_depth):
+        walk = cls()
+        frontier = [(-1, window)]
+        for depth in range(1, max_depth + 1):
+            started = time.perf_counter()
+            next_frontier = []
+            counts = Counter()
+            for parent_index, parent in frontier:
+                try:
+                    children = parent.children()
+                except Exception:
+                    continue
+                for child in children:
+                    try:
+                        control_type = child.element_info.control_type or ""
+                    except Exception:
+                        control_type = ""
+                    next_frontier.append((len(walk.wrappers), child))
+                    walk.wrappers.append(child)
+                    walk.parents.append(parent_index)
+                    walk.levels.append(depth)
+                    walk.types.append(control_type)
+                    counts[control_type] += 1
+            elapsed = (time.perf_counter() - started) * 1000
+            if not next_frontier:
+                break
+            walk.level_stats.append({
+                "depth": depth,
+                "elements": len(next_frontier),
+                "ms": round(elapsed, 3),
+                "types": dict(counts.most_common()),
+            })
+            frontier = next_frontier
+        return walk
+
+    @property
+    def walk_ms(self):
+        return round(sum(level["ms"] for level in self.level_stats), 3)
+
+    def elements_to_depth(self, depth):
+        """descendants(depth=depth) 從視窗往下會走訪的元素數"""
+        return sum(level["elements"] for level in self.level_stats if level["depth"] <= depth)
+
+    def key(self, index):
+        """可定位元素的識別：(類型, automation_id) 優先，其次 (類型, class_name)；都沒有時為 None"""
+        if self._keys is None:
+            self._keys = [self._read_key(i) for i in range(len(self.wrappers))]
+        return self._keys[index]
+
+    def _read_key(self, index):
+        info = self.wrappers[index].element_info
+        for attr in ("automation_id", "class_name"):
+            try:
+                value = getattr(info, attr, "") or ""
+            except Exception:
+                value = ""
+            if value:
+                return self.types[index], attr, value
+        return None
+
+    def ancestors(self, index):
+        """由近到遠的祖先編號（不含視窗）"""
+        parent = self.parents[index]
+        while parent != -1:
+            yield parent
+            parent = self.parents[parent]
+
+    def scope_elements(self, scope, depth):
+        """從 scope 往下搜尋到絕對深度 depth 會走訪的元素數"""
+        count = 0
+        for i, level in enumerate(self.levels):
+            if self.levels[scope] < level <= depth and scope in self.ancestors(i):
+                count += 1
+        return count
+
+    def best_scope(self, index):
+        """最深（範圍最小）且在視窗內唯一可定位的祖先，找不到時回傳 None（只能從視窗搜尋）"""
+        if self._key_counts is None:
+            self._key_counts = Counter(self.key(i) for i in range(len(self.wrappers)))
+        for ancestor in self.ancestors(index):
+            key = self.key(ancestor)
+            if key is not None and self._key_counts[key] == 1:
+                return ancestor
+        return None
+
+
+def time_type_searches(window, types, depth):
+    """各類型以 descendants() 搜尋的耗時與數量"""
+    results = {}
+    for control_type in types:
+        started = time.perf_counter()
         try:
-            print(f"  搜索 {btn_type}...", end="")
-            buttons = window.descendants(control_type=btn_type, depth=30)
-            count = len(buttons)
-            print(f" 找到 {count} 个")
-            all_buttons.extend([(btn, btn_type) for btn in buttons])
+            found = len(window.descendants(control_type=control_type, depth=depth))
+            error = None
         except Exception as e:
-            print(f" 失败: {e}")
-    
-    print(f"\n总共找到 {len(all_buttons)} 个按钮")
-    
-    # 查找 Allow 按钮
-    print(f"\n{'='*100}")
-    print("开始查找 Allow 相关按钮...")
-    print(f"{'='*100}\n")
-    
-    allow_keywords = ['allow', '允許', 'accept', 'confirm']
-    exclude_keywords = ['section', 'explorer', 'autoallow', 'folder', 'directory']
-    
-    found_allow = False
-    
-    for idx, (button, btn_type) in enumerate(all_buttons, 1):
+            found = 0
+            error = str(e)
+        results[control_type] = {"search_ms": round((time.perf_counter() - started) * 1000, 3), "found": found}
+        if error:
+            results[control_type]["error"] = error
+    return results
+
+
+def profile_window(window, rules, max_depth, types):
+    """剖析一個視窗，回傳報告中的 window 物件（hwnd / title 由呼叫端補上）"""
+    walk = TreeWalk.run(window, max_depth)
+    searches = time_type_searches(window, types, max_depth)
+    type_totals = Counter(walk.types)
+
+    type_report = {}
+    for control_type in sorted(set(types) | set(type_totals), key=lambda t: -type_totals[t]):
+        entry = {"elements": type_totals[control_type]}
+        entry.update(searches.get(control_type, {}))
+        type_report[control_type] = entry
+
+    # Allow 候選：所有剖析類型的元素套用與監控循環相同的規則（不點擊）
+    index_of = {id(w): i for i, w in enumerate(walk.wrappers)}
+    suspicious = []
+    candidates = []
+    by_type = [w for w, t in zip(walk.wrappers, walk.types) if t in types]
+    found = filter_candidates(by_type, rules, on_suspicious=lambda name, aid: suspicious.append(
+        {"name": name, "automation_id": aid}))
+    for candidate in found:
+        i = index_of[id(candidate.wrapper)]
+        depth = walk.levels[i]
+        control_type = walk.types[i]
+        scanned_type = control_type in rules.button_types
+        entry = {
+            "name": candidate.name,
+            "control_type": control_type,
+            "matched": candidate.matched,
+            "depth": depth,
+            "path": [walk.types[a] for a in reversed(list(walk.ancestors(i)))],
+            "scanned_type": scanned_type,
+            "found_shallow": scanned_type and depth <= rules.shallow_scan_depth,
+            "found_deep": scanned_type and depth <= rules.deep_scan_depth,
+            "elements_to_depth": walk.elements_to_depth(depth),
+            "scope": None,
+        }
+        scope = walk.best_scope(i)
+        if scope is not None:
+            scope_type, attr, value = walk.key(scope)
+            entry["scope"] = {
+                "depth": walk.levels[scope],
+                "control_type": scope_type,
+                attr: value,
+                "relative_depth": depth - walk.levels[scope],
+                "elements": walk.scope_elements(scope, depth),
+            }
+        candidates.append(entry)
+
+    return {
+        "elements": len(walk.wrappers),
+        "max_depth": walk.level_stats[-1]["depth"] if walk.level_stats else 0,
+        "walk_ms": walk.walk_ms,
+        "levels": walk.level_stats,
+        "types": type_report,
+        "candidates": candidates,
+        "suspicious": suspicious,
+    }
+
+
+def build_backend(args):
+    if not args.synthetic:
+        from uia_backend import UIABackend
+        return UIABackend()
+    from synthetic_uia import SyntheticBackend, generate_tree
+    backend = SyntheticBackend()
+    root = generate_tree(args.elements, allow_depth=args.allow_depth, seed=args.seed)
+    backend.add_window(0x1001, root)
+    return backend
+
+
+def run_profile(args, rules):
+    backend = build_backend(args)
+    try:
+        windows = find_vscode_windows(backend)
+    except ImportError as e:
+        print(f"❌ 無法載入自動化模組: {e}")
+        return None
+
+    types = list(dict.fromkeys(list(rules.button_types) + PROFILE_TYPES + args.types))
+    report = {
+        "version": REPORT_VERSION,
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "host": platform.node(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "synthetic": args.synthetic,
+            "rules": rules.source,
+            "button_types": list(rules.button_types),
+            "shallow_scan_depth": rules.shallow_scan_depth,
+            "deep_scan_depth": rules.deep_scan_depth,
+            "max_depth": args.max_depth,
+            "types": types,
+        },
+        "windows": [],
+    }
+    for hwnd, title in windows:
+        entry = {"hwnd": hwnd, "title": title}
         try:
-            element_info = button.element_info
-            name = getattr(element_info, 'name', '').lower()
-            
-            # 检查是否包含 allow 关键字
-            has_allow = any(keyword in name for keyword in allow_keywords)
-            should_exclude = any(ex in name for ex in exclude_keywords)
-            
-            if has_allow or 'allow' in name:
-                button_name = getattr(element_info, 'name', '')
-                
-                # 获取更多信息
-                try:
-                    is_enabled = button.is_enabled()
-                except:
-                    is_enabled = "Unknown"
-                
-                try:
-                    is_visible = button.is_visible()
-                except:
-                    is_visible = "Unknown"
-                
-                try:
-                    automation_id = getattr(element_info, 'automation_id', '')
-                except:
-                    automation_id = ""
-                
-                try:
-                    class_name = getattr(element_info, 'class_name', '')
-                except:
-                    class_name = ""
-                
-                print(f"{'🎯' if not should_exclude else '⚠️'} 找到按钮 #{idx}:")
-                print(f"   名称: {button_name}")
-                print(f"   类型: {btn_type}")
-                print(f"   可用: {is_enabled}")
-                print(f"   可见: {is_visible}")
-                if automation_id:
-                    print(f"   AutoID: {automation_id}")
-                if class_name:
-                    print(f"   Class: {class_name}")
-                
-                if should_exclude:
-                    print(f"   ❌ 被排除（匹配排除关键字）")
-                else:
-                    print(f"   ✅ 符合条件！")
-                    found_allow = True
-                    
-                    # 尝试点击
-                    print(f"\n   尝试点击...")
-                    click_success = False
-                    
-                    methods = [
-                        ('invoke', lambda: button.invoke()),
-                        ('click_input', lambda: button.click_input()),
-                        ('click', lambda: button.click())
-                    ]
-                    
-                    for method_name, method_func in methods:
-                        try:
-                            print(f"      尝试 {method_name}()...", end="")
-                            method_func()
-                            print(f" ✅ 成功！")
-                            click_success = True
-                            break
-                        except Exception as e:
-                            print(f" ❌ 失败: {e}")
-                    
-                    if not click_success:
-                        print(f"      ❌ 所有点击方法都失败")
-                
-                print()
-        
+            window = backend.connect(hwnd)
         except Exception as e:
+            entry["error"] = f"無法連接: {e}"
+        else:
+            entry.update(profile_window(window, rules, args.max_depth, types))
+        report["windows"].append(entry)
+    return report
+
+
+def print_window(entry):
+    print(f"\n{'=' * 100}")
+    print(f"視窗: {entry['title']}  (HWND: {entry['hwnd']})")
+    print("=" * 100)
+    if "error" in entry:
+        print(f"❌ {entry['error']}")
+        return
+
+    print(f"共 {entry['elements']} 個元素，最大深度 {entry['max_depth']}，逐層走訪 {entry['walk_ms']:.1f} ms\n")
+    print(f"{'深度':>4s} {'元素':>8s} {'累計':>8s} {'ms':>9s}  主要類型")
+    total = 0
+    for level in entry["levels"]:
+        total += level["elements"]
+        top = ", ".join(f"{t or '?'} {n}" for t, n in list(level["types"].items())[:4])
+        print(f"{level['depth']:4d} {level['elements']:8d} {total:8d} {level['ms']:9.2f}  {top}")
+
+    print(f"\n{'類型':20s} {'元素':>8s} {'搜尋 ms':>10s} {'找到':>8s}")
+    for control_type, stats in entry["types"].items():
+        if "search_ms" not in stats and stats["elements"] < 10:
             continue
-    
-    if not found_allow:
-        print("❌ 未找到符合条件的 Allow 按钮")
-        print("\n显示所有按钮名称供参考：")
-        print("-" * 100)
-        for idx, (button, btn_type) in enumerate(all_buttons[:50], 1):  # 只显示前50个
-            try:
-                element_info = button.element_info
-                name = getattr(element_info, 'name', '')
-                if name:
-                    print(f"{idx:3d}. [{btn_type:15s}] {name}")
-            except:
-                pass
-        
-        if len(all_buttons) > 50:
-            print(f"\n... 还有 {len(all_buttons) - 50} 个按钮未显示")
-    
-    return found_allow
-
-def main():
-    print("="*100)
-    print("Allow 按钮检测诊断工具")
-    print(f"时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print("="*100)
-    
-    windows = get_vscode_windows()
-    print(f"\n找到 {len(windows)} 个 VS Code 窗口\n")
-    
-    if not windows:
-        print("❌ 没有找到任何 VS Code 窗口")
+        search = f"{stats['search_ms']:10.2f} {stats['found']:8d}" if "search_ms" in stats else f"{'-':>10s} {'-':>8s}"
+        print(f"{control_type or '?':20s} {stats['elements']:8d} {search}")
+
+    print()
+    if not entry["candidates"]:
+        print("❌ 沒有符合規則的 Allow 候選按鈕")
+    for candidate in entry["candidates"]:
+        found = "深度掃描" if candidate["found_deep"] else "掃描不到"
+        if candidate["found_shallow"]:
+            found = "淺層掃描"
+        print(f"🎯 '{candidate['name']}' ({candidate['control_type']}, 匹配: {candidate['matched']})")
+        print(f"   深度 {candidate['depth']}（從視窗搜尋走訪 {candidate['elements_to_depth']} 個元素），目前規則: {found}")
+        scope = candidate["scope"]
+        if scope:
+            ident = scope.get("automation_id") or scope.get("class_name")
+            print(f"   最小範圍: 深度 {scope['depth']} 的 {scope['control_type']} [{ident}]，"
+                  f"往下 {scope['relative_depth']} 層（走訪 {scope['elements']} 個元素）")
+        else:
+            print("   最小範圍: 視窗（沒有可唯一定位的祖先）")
+    for item in entry["suspicious"]:
+        print(f"⚠️ 可疑的 AutomationId，已排除: '{item['name']}' ({item['automation_id']})")
+
+
+def load_reports(patterns):
+    paths = []
+    for pattern in patterns:
+        matches = glob.glob(pattern)
+        if os.path.isdir(pattern):
+            matches = sorted(glob.glob(os.path.join(pattern, "*.json")))
+        paths.extend(matches or [pattern])
+    reports = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            reports.append(json.load(f))
+    return reports
+
+
+def aggregate(reports, coverage=(0.9, 1.0)):
+    """合併多份報告：候選深度分布、各深度的涵蓋率與平均走訪元素比例、類型與範圍的命中次數"""
+    windows = [w for r in reports for w in r["windows"] if "error" not in w]
+    candidates = [c for w in windows for c in w["candidates"]]
+    depths = [c["depth"] for c in candidates]
+    max_depth = max([w["max_depth"] for w in windows] + depths + [0])
+
+    table = []
+    for depth in range(1, max_depth + 1):
+        covered = sum(d <= depth for d in depths)
+        # 走訪成本：搜尋到此深度的元素數 / 整個視窗的元素數（各視窗平均）
+        ratios = [sum(l["elements"] for l in w["levels"] if l["depth"] <= depth) / w["elements"]
+                  for w in windows if w["elements"]]
+        table.append({
+            "depth": depth,
+            "coverage": round(covered / len(depths), 4) if depths else 0,
+            "cost": round(sum(ratios) / len(ratios), 4) if ratios else 0,
+        })
+
+    recommended = {}
+    for target in coverage:
+        for row in table:
+            if depths and row["coverage"] >= target:
+                recommended[f"depth_for_{int(target * 100)}pct"] = row["depth"]
+                break
+
+    scopes = Counter()
+    for c in candidates:
+        scope = c["scope"]
+        if scope:
+            scopes[f"{scope['control_type']}[{scope.get('automation_id') or scope.get('class_name')}]"] += 1
+
+    return {
+        "reports": len(reports),
+        "hosts": len({r["meta"].get("host") for r in reports}),
+        "windows": len(windows),
+        "windows_with_candidates": sum(1 for w in windows if w["candidates"]),
+        "candidates": len(candidates),
+        "depth": {
+            "min": min(depths) if depths else None,
+            "p50": percentile(depths, 50) if depths else None,
+            "p90": percentile(depths, 90) if depths else None,
+            "max": max(depths) if depths else None,
+            "histogram": dict(sorted(Counter(depths).items())),
+        },
+        "found_shallow": sum(c["found_shallow"] for c in candidates),
+        "found_deep": sum(c["found_deep"] for c in candidates),
+        "control_types": dict(Counter(c["control_type"] for c in candidates).most_common()),
+        "scopes": dict(scopes.most_common(10)),
+        "by_depth": table,
+        "recommended": recommended,
+    }
+
+
+def print_aggregate(summary):
+    print(f"{summary['reports']} 份報告（{summary['hosts']} 台機器），{summary['windows']} 個視窗，"
+          f"{summary['windows_with_candidates']} 個有 Allow 候選，共 {summary['candidates']} 個候選")
+    if not summary["candidates"]:
         return
-    
-    total_found = 0
-    
-    for hwnd, title in windows:
-        if test_window_connection(hwnd, title):
-            total_found += 1
-    
-    print("\n" + "="*100)
-    print(f"诊断完成！在 {len(windows)} 个窗口中找到 {total_found} 个 Allow 按钮")
-    print("="*100)
-    
-    input("\n按 Enter 键退出...")
+    depth = summary["depth"]
+    print(f"候選深度: 最小 {depth['min']}，p50 {depth['p50']}，p90 {depth['p90']}，最大 {depth['max']}")
+    print(f"目前規則找得到: 淺層 {summary['found_shallow']}，深度 {summary['found_deep']} / {summary['candidates']}")
+    print(f"候選類型: {', '.join(f'{t} {n}' for t, n in summary['control_types'].items())}")
+    if summary["scopes"]:
+        print("常見的最小範圍:")
+        for scope, count in summary["scopes"].items():
+            print(f"  {count:5d}  {scope}")
+    print(f"\n{'深度':>4s} {'候選':>6s} {'涵蓋率':>8s} {'走訪比例':>8s}")
+    for row in summary["by_depth"]:
+        hits = summary["depth"]["histogram"].get(row["depth"], 0)
+        print(f"{row['depth']:4d} {hits:6d} {row['coverage']:8.1%} {row['cost']:8.1%}")
+    for key, value in summary["recommended"].items():
+        print(f"建議 {key}: {value}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Allow 按鈕偵測剖析工具")
+    parser.add_argument("--max-depth", type=int, default=30, help="走訪的最大深度（預設 30）")
+    parser.add_argument("--types", nargs="*", default=[], help="額外剖析的控制項類型")
+    parser.add_argument("--rules", metavar="PATH", help="偵測規則檔（預設為程式目錄的 detection_rules.json）")
+    parser.add_argument("--json", metavar="OUT", help="將報告寫入 JSON 檔")
+    parser.add_argument("--aggregate", nargs="+", metavar="REPORT", help="合併多份 JSON 報告（檔案、目錄或萬用字元）")
+    parser.add_argument("--synthetic", action="store_true", help="使用合成視窗（任何平台）")
+    parser.add_argument("--elements", type=int, default=3000, help="合成視窗的元素數")
+    parser.add_argument("--allow-depth", type=int, default=12, help="合成視窗中 Allow 按鈕的深度")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-pause", action="store_true", help="結束前不等待 Enter")
+    args = parser.parse_args(argv)
+
+    if args.aggregate:
+        summary = aggregate(load_reports(args.aggregate))
+        print_aggregate(summary)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+            print(f"\n✅ 已寫入彙總: {args.json}")
+        return 0
+
+    rules_path = args.rules or default_rules_path()
+    try:
+        rules = load_rules(rules_path) if os.path.exists(rules_path) else compile_rules()
+    except (OSError, RulesError) as e:
+        print(f"❌ 規則檔無效: {e}")
+        return 1
+
+    print("=" * 100)
+    print("Allow 按鈕偵測剖析工具")
+    print(f"時間: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}  規則: {rules.source}  最大深度: {args.max_depth}")
+    print("=" * 100)
+
+    report = run_profile(args, rules)
+    if report is None:
+        return 1
+    print(f"\n找到 {len(report['windows'])} 個 VS Code 視窗")
+    for entry in report["windows"]:
+        print_window(entry)
+
+    found = sum(1 for w in report["windows"] if w.get("candidates"))
+    print("\n" + "=" * 100)
+    print(f"剖析完成！{len(report['windows'])} 個視窗中有 {found} 個有 Allow 候選按鈕")
+    print("=" * 100)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ 已寫入報告: {args.json}")
+    elif not args.no_pause and sys.stdin.isatty():
+        input("\n按 Enter 鍵退出...")
+    return 0
+
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Windows UI Automation 後端
+將 win32gui / win32process / psutil / pywinauto 的呼叫集中在此，
+偵測邏輯只透過 backend 物件存取視窗，方便替換成合成樹（基準測試、負載測試）
+"""
+
+import ctypes
+import sys
+import threading
+
+PW_RENDERFULLCONTENT = 2
+
+
+class UIABackend:
+    """真實的 Windows UIA 後端
+
+    自動化相關模組（pywinauto 匯入需時約一秒）延後到第一次使用時才載入，
+    建立物件不會拖慢程式啟動
+    """
+
+    def __init__(self):
+        self._win32gui = None
+        self._win32process = None
+        self._psutil = None
+        self._desktop_cls = None
+        self._load_lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._win32gui is not None
+
+    def load(self):
+        """載入自動化模組（第一次掃描時自動呼叫；缺少模組時丟出 ImportError）"""
+        if self._win32gui is not None:
+            return
+        with self._load_lock:
+            if self._win32gui is not None:
+                return
+            import win32process
+            import psutil
+            from pywinauto import Desktop
+            import win32gui
+            self._win32process = win32process
+            self._psutil = psutil
+            self._desktop_cls = Desktop
+            # 最後才指派：其他執行緒看到 _win32gui 時其餘模組都已就緒
+            self._win32gui = win32gui
+
+    def enum_windows(self):
+        """列出所有可見的頂層視窗 [(hwnd, title), ...]"""
+        self.load()
+        win32gui = self._win32gui
+        windows = []
+
+        def enum_callback(hwnd, result):
+            if win32gui.IsWindowVisible(hwnd):
+                windows.append((hwnd, win32gui.GetWindowText(hwnd)))
+            return True
+
+        win32gui.EnumWindows(enum_callback, None)
+        return windows
+
+    def is_window(self, hwnd):
+        self.load()
+        return self._win32gui.IsWindow(hwnd)
+
+    def process_name(self, hwnd):
+        """獲取進程名稱（小寫、不含 .exe）"""
+        self.load()
+        psutil = self._psutil
+        try:
+            _, pid = self._win32process.GetWindowThreadProcessId(hwnd)
+            return psutil.Process(pid).name().lower().replace(".exe", "")
+        except (psutil.NoSuchProcess, psutil.AccessDenied, OSError):
+            return ""
+
+    def connect(self, hwnd):
+        """連接到視窗，回傳 pywinauto 的 WindowSpecification"""
+        self.load()
+        desktop = self._desktop_cls(backend="uia")
+        return desktop.window(handle=hwnd)
+
+    def capture(self, hwnd):
+        """擷取視窗畫面（視窗被遮住時也可以），回傳 ((高, 寬, 3) RGB 陣列, 視窗左上角螢幕座標)
+
+        需要 numpy；擷取失敗時回傳 None
+        """
+        self.load()
+        import numpy as np
+        import win32ui
+        win32gui = self._win32gui
+        left, top, right, bottom = win32gui.GetWindowRect(hwnd)
+        width, height = right - left, bottom - top
+        if width <= 0 or height <= 0:
+            return None
+
+        window_dc = win32gui.GetWindowDC(hwnd)
+        source_dc = win32ui.CreateDCFromHandle(window_dc)
+        memory_dc = source_dc.CreateCompatibleDC()
+        bitmap = win32ui.CreateBitmap()
+        try:
+            bitmap.CreateCompatibleBitmap(source_dc, width, height)
+            memory_dc.SelectObject(bitmap)
+            # PW_RENDERFULLCONTENT：Chromium 類視窗需要此旗標才不會擷取到黑畫面
+            if not ctypes.windll.user32.PrintWindow(hwnd, memory_dc.GetSafeHdc(), PW_RENDERFULLCONTENT):
+                return None
+            bgra = np.frombuffer(bitmap.GetBitmapBits(True), dtype=np.uint8).reshape(height, width, 4)
+            return bgra[:, :, 2::-1], (left, top)
+        finally:
+            win32gui.DeleteObject(bitmap.GetHandle())
+            memory_dc.DeleteDC()
+            source_dc.DeleteDC()
+            win32gui.ReleaseDC(hwnd, window_dc)
+
+    def click_at(self, x, y):
+        """在螢幕座標點一下滑鼠左鍵"""
+        self.load()
+        from pywinauto import mouse
+        mouse.click(button="left", coords=(x, y))
+
+    def release(self):
+        """記憶體超過上限時呼叫：讓 COM 卸載已無人使用的 DLL（UIA 包裝物件在 gc 回收時釋放）"""
+        if sys.platform == "win32":
+            ctypes.windll.ole32.CoFreeUnusedLibraries()
@@ -0,0 +1,293 @@
+"""
+視覺備援偵測
+UIA 樹無法使用時（renderer 停用無障礙樹、連接一直失敗），擷取視窗畫面，
+在聊天面板範圍內以 NumPy 向量化尋找主要按鈕色的實心矩形（內含淺色文字），
+再把按鈕內的文字與「Allow」標籤樣板比對，其他主要按鈕（Install、Reload、Keep 等）不會被點擊
+
+需要 numpy（pip install numpy）；擷取畫面與點擊由 backend 負責，
+比對核心只處理 (高, 寬, 3) 的 RGB uint8 陣列，可用 make_screenshot 產生的合成畫面測試
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+# VS Code 主要按鈕（button.background）的顏色：Dark Modern / Light Modern、Dark+、滑鼠移上、舊版藍色
+BUTTON_COLORS = (
+    (0x00, 0x78, 0xD4),
+    (0x02, 0x6E, 0xC1),
+    (0x0E, 0x63, 0x9C),
+    (0x11, 0x77, 0xBB),
+    (0x00, 0x5F, 0xB8),
+    (0x00, 0x7A, 0xCC),
+)
+
+# 產生標籤樣板與合成畫面用的點陣字（每字 9 列：7 列字身 + 2 列下伸部，以 / 分隔）
+GLYPHS = {
+    "A": "..#../.#.#./#...#/#...#/#####/#...#/#...#/...../.....",
+    "I": "#/#/#/#/#/#/#/./.",
+    "K": "#..#/#.#./##../#.../##../#.#./#..#/..../....",
+    "R": "###./#..#/#..#/###./#.#./#..#/#..#/..../....",
+    "a": "..../..../.##./...#/.###/#..#/.###/..../....",
+    "d": "...#/...#/.###/#..#/#..#/#..#/.###/..../....",
+    "e": "..../..../.##./#..#/####/#.../.###/..../....",
+    "l": "#/#/#/#/#/#/#/./.",
+    "n": "..../..../###./#..#/#..#/#..#/#..#/..../....",
+    "o": "..../..../.##./#..#/#..#/#..#/.##./..../....",
+    "p": "..../..../###./#..#/#..#/#..#/###./#.../#...",
+    "s": "..../..../.###/#.../.##./...#/###./..../....",
+    "t": ".../.#./###/.#./.#./.#./..#/.../...",
+    "w": "...../...../#...#/#...#/#.#.#/#.#.#/.#.#./...../.....",
+}
+
+# 比對前文字縮放到的大小（列, 欄）
+LABEL_GRID = (7, 20)
+
+VisualParams = namedtuple(
+    "VisualParams",
+    "region colors tolerance min_width max_width min_height max_height min_fill min_text max_text row_step "
+    "label min_label",
+    defaults=(
+        (0.55, 0.0, 1.0, 1.0),  # 聊天面板範圍（視窗寬高的比例：左、上、右、下）
+        BUTTON_COLORS,
+        12,  # 每個色版允許的誤差
+        40, 220,  # 按鈕寬度（像素）
+        18, 40,  # 按鈕高度（像素）
+        0.55,  # 按鈕色至少佔矩形的比例
+        0.02, 0.45,  # 淺色文字佔矩形的比例範圍（排除純色色塊）
+        3,  # 每隔幾列取一列找水平區段（按鈕至少 18 列高，每個按鈕仍取樣到多列）
+        "Allow",  # 按鈕標籤
+        0.5,  # 文字與標籤樣板的相關係數下限（合成畫面上 Allow 為 0.6~1，其他標籤低於 0.45）
+    ),
+)
+
+# label 為文字與標籤樣板的相關係數
+VisualMatch = namedtuple("VisualMatch", "left top width height fill text label")
+
+
+def render_label(text):
+    """以 GLYPHS 點陣字排出文字（字間空一欄），回傳 (9, 寬) bool 陣列"""
+    columns = []
+    for i, char in enumerate(text):
+        try:
+            rows = GLYPHS[char].split("/")
+        except KeyError:
+            raise ValueError(f"點陣字沒有 {char!r}") from None
+        if i:
+            columns.append(np.zeros((len(rows), 1), dtype=bool))
+        columns.append(np.array([[c == "#" for c in row] for row in rows], dtype=bool))
+    return np.hstack(columns)
+
+
+def resize_mask(mask, height, width):
+    """最近鄰縮放"""
+    rows = np.arange(height) * mask.shape[0] // height
+    cols = np.arange(width) * mask.shape[1] // width
+    return mask[rows[:, None], cols]
+
+
+def crop_mask(mask):
+    """裁掉四周沒有 True 的列與欄，全部為 False 時回傳 None"""
+    rows = np.nonzero(mask.any(axis=1))[0]
+    cols = np.nonzero(mask.any(axis=0))[0]
+    if not len(rows):
+        return None
+    return mask[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+
+
+def label_grid(mask, grid=LABEL_GRID, oversample=8):
+    """裁切文字後以區塊平均縮放到 grid，回傳每格的文字比例（float 陣列），沒有文字時回傳 None"""
+    mask = crop_mask(mask)
+    if mask is None:
+        return None
+    rows, cols = grid
+    fine = resize_mask(mask, rows * oversample, cols * oversample)
+    return fine.reshape(rows, oversample, cols, oversample).mean(axis=(1, 3))
+
+
+def label_score(text_mask, template):
+    """文字與樣板（label_grid 的結果）的相關係數，-1~1；文字為空或全滿時為 0"""
+    grid = label_grid(text_mask, template.shape)
+    if grid is None:
+        return 0.0
+    a = grid.ravel() - grid.mean()
+    b = template.ravel() - template.mean()
+    denominator = np.sqrt((a * a).sum() * (b * b).sum())
+    return float((a * b).sum() / denominator) if denominator else 0.0
+
+
+def channel_tables(colors, tolerance):
+    """每個色版一張 256 項的查表：第 i 個位元表示該數值在第 i 個顏色的誤差範圍內"""
+    if len(colors) > 8:
+        raise ValueError("最多 8 種按鈕色")
+    tables = np.zeros((3, 256), dtype=np.uint8)
+    values = np.arange(256)
+    for i, color in enumerate(colors):
+        for channel, value in enumerate(color):
+            tables[channel, np.abs(values - value) <= tolerance] |= 1 << i
+    return tables
+
+
+def color_mask(pixels, tables):
+    """符合任一按鈕色的像素：三次查表後做位元 AND（不必對每種顏色逐一比較）"""
+    bits = tables[0].take(pixels[..., 0])
+    bits &= tables[1].take(pixels[..., 1])
+    bits &= tables[2].take(pixels[..., 2])
+    return bits != 0
+
+
+def find_runs(mask, min_length, max_length):
+    """每列連續 True 的水平區段，回傳 (列, 起點, 終點) 三個陣列，只保留長度在範圍內的"""
+    height, width = mask.shape
+    padded = np.zeros((height, width + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    # nonzero 依列優先順序回傳，同一列的起點與終點一一對應
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    lengths = ends - starts
+    keep = (lengths >= min_length) & (lengths <= max_length)
+    return rows[keep], starts[keep], ends[keep]
+
+
+def group_runs(rows, starts, ends, max_gap, slack=2):
+    """把左右邊界相近、上下相鄰的區段合併成矩形 [[x0, x1, 第一列, 最後一列], ...]
+
+    按鈕中間的文字列會把區段切斷，因此允許 max_gap 列的空隙
+    """
+    boxes = []
+    open_boxes = []
+    for row, start, end in zip(rows.tolist(), starts.tolist(), ends.tolist()):
+        open_boxes = [box for box in open_boxes if row - box[3] <= max_gap]
+        for box in open_boxes:
+            if abs(box[0] - start) <= slack and abs(box[1] - end) <= slack:
+                box[0] = min(box[0], start)
+                box[1] = max(box[1], end)
+                box[3] = row
+                break
+        else:
+            box = [start, end, row, row]
+            boxes.append(box)
+            open_boxes.append(box)
+    return boxes
+
+
+class VisualDetector:
+    """在畫面中尋找 Allow 按鈕，回傳 VisualMatch（畫面座標）或 None"""
+
+    def __init__(self, params=None):
+        self.params = params or VisualParams()
+        self._tables = channel_tables(self.params.colors, self.params.tolerance)
+        self.template = label_grid(render_label(self.params.label))
+
+    def region_bounds(self, shape):
+        height, width = shape[:2]
+        left, top, right, bottom = self.params.region
+        return int(width * left), int(height * top), int(width * right), int(height * bottom)
+
+    def candidates(self, pixels):
+        """所有符合條件且標籤與樣板相符的按鈕，依位置由下而上排序（最新的提示通常在聊天面板最下方）"""
+        p = self.params
+        x0, y0, x1, y1 = self.region_bounds(pixels.shape)
+        region = pixels[y0:y1, x0:x1]
+
+        # 先只對取樣的列計算顏色遮罩找水平區段，候選矩形再以完整解析度確認
+        step = p.row_step
+        rows, starts, ends = find_runs(color_mask(region[::step], self._tables), p.min_width, p.max_width)
+        if not len(rows):
+            return []
+
+        matches = []
+        for left, right, first, last in group_runs(rows, starts, ends, max_gap=p.max_height // step):
+            # 上下各多看一個取樣間隔，補齊取樣略過的列
+            top = max(first * step - step, 0)
+            bottom = min(last * step + 2 * step, region.shape[0])
+            box = region[top:bottom, left:right]
+            filled = np.nonzero(color_mask(box, self._tables).mean(axis=1) >= p.min_fill)[0]
+            if not len(filled):
+                continue
+            top, bottom = top + int(filled[0]), top + int(filled[-1]) + 1
+            width, height = right - left, bottom - top
+            if not (p.min_height <= height <= p.max_height):
+                continue
+            box = region[top:bottom, left:right]
+            fill = float(color_mask(box, self._tables).mean())
+            if fill < p.min_fill:
+                continue
+            text_mask = box.min(axis=2) >= 200
+            text = float(text_mask.mean())
+            if not (p.min_text <= text <= p.max_text):
+                continue
+            label = label_score(text_mask, self.template)
+            if label < p.min_label:
+                continue
+            matches.append(VisualMatch(x0 + left, y0 + top, width, height, round(fill, 3), round(text, 3), round(label, 3)))
+        matches.sort(key=lambda m: m.top, reverse=True)
+        return matches
+
+    def detect(self, pixels):
+        matches = self.candidates(pixels)
+        return matches[0] if matches else None
+
+
+def draw_button(image, box, color, label):
+    """畫出主要按鈕：按鈕色矩形，中間以白色點陣字寫上標籤（字高約為按鈕高度的一半）"""
+    left, top, w, h = box
+    image[top:top + h, left:left + w] = color
+    glyphs = crop_mask(render_label(label))
+    text_h = max(7, h // 2)
+    text_w = min(w - 8, glyphs.shape[1] * text_h // glyphs.shape[0])
+    text = resize_mask(glyphs, text_h, text_w)
+    ty, tx = top + (h - text_h) // 2, left + (w - text_w) // 2
+    image[ty:ty + text_h, tx:tx + text_w][text] = 0xFF
+
+
+def make_screenshot(width=1920, height=1080, button=None, seed=0, color=BUTTON_COLORS[0], distractors=True,
+                    label="Allow"):
+    """產生類似 VS Code 的合成畫面
+
+    Args:
+        button: (left, top, width, height)，None 表示沒有 Allow 按鈕
+        distractors: 加入狀態列、外框、徽章、連結文字、其他標籤的主要按鈕等不該被點擊的藍色元素
+        label: button 的標籤
+    Returns:
+        (高, 寬, 3) uint8 RGB 陣列
+    """
+    rng = np.random.default_rng(seed)
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[:] = (0x1F, 0x1F, 0x1F)  # 編輯器
+    image[:, :48] = (0x18, 0x18, 0x18)  # 活動列
+    image[:, 48:300] = (0x18, 0x18, 0x18)  # 側邊欄
+    chat_left = int(width * 0.62)
+    image[:, chat_left:] = (0x18, 0x18, 0x18)  # 聊天面板
+
+    # 文字雜訊：短的淺色筆畫
+    for _ in range(height // 3):
+        x = int(rng.integers(60, width - 40))
+        y = int(rng.integers(0, height - 30))
+        length = int(rng.integers(8, 40))
+        shade = int(rng.integers(150, 230))
+        image[y:y + 2, x:x + length] = shade
+
+    if distractors:
+        image[height - 22:, :] = (0x00, 0x7A, 0xCC)  # 狀態列（太寬）
+        # 輸入框的藍色外框（中空）
+        fx, fy = chat_left + 20, height - 120
+        image[fy, fx:fx + 160] = color
+        image[fy + 60, fx:fx + 160] = color
+        image[fy:fy + 61, fx] = color
+        image[fy:fy + 61, fx + 159] = color
+        image[300:316, chat_left + 200:chat_left + 216] = color  # 徽章（太小）
+        image[200:212, chat_left + 40:chat_left + 110] = color  # 純色色塊（沒有文字）
+        for i in range(5):  # 藍色連結文字（太細）
+            image[400 + i * 20:402 + i * 20, chat_left + 30:chat_left + 90] = color
+        # 其他標籤的主要按鈕（通知的 Install、聊天編輯的 Keep），位置在 Allow 按鈕可能出現的範圍左側
+        draw_button(image, (int(width * 0.56), height - 200, 72, 24), color, "Install")
+        draw_button(image, (int(width * 0.56), 500, 56, 24), color, "Keep")
+
+    if button is not None:
+        left, top, w, h = button
+        draw_button(image, button, color, label)
+        # 旁邊的次要按鈕（灰色）
+        image[top:top + h, left + w + 8:left + 2 * w + 8] = (0x31, 0x31, 0x31)
+    return image
@@ -7,15 +7,72 @@ import win32gui
 import win32process
 import psutil
 from pywinauto import Desktop
-import tkinter as tk
-from tkinter import scrolledtext
+import glob
 import json
+import os
+import queue
+import threading
+import tkinter as tk
+from tkinter import ttk, scrolledtext, filedialog
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from collections import defaultdict
+from scan_stream import ScanStreamWriter, convert_to_legacy_json
+from scan_tree_view import LazyTreeView, SnapshotIndex
+import scan_diff
 
 
-class VSCodeScannerActive:
+class ScanTruncation:
+    """記錄走訪被截斷的情況"""
     def __init__(self):
+        self.depth_limited = 0  # 到達深度上限、未展開子元素的節點數
+        self.node_limit_hit = False  # 是否因節點數上限提前結束
+        self.errors = 0  # 讀取子元素失敗的次數
+        self.cancelled = False  # 使用者取消
+    
+    def describe(self):
+        parts = []
+        if self.cancelled:
+            parts.append("使用者取消")
+        if self.node_limit_hit:
+            parts.append("已達節點數上限")
+        if self.depth_limited:
+            parts.append(f"{self.depth_limited} 個節點到達深度上限未展開")
+        if self.errors:
+            parts.append(f"{self.errors} 次讀取子元素失敗")
+        return "、".join(parts)
+
+
+class VSCodeScannerActive:
+    # 文字區塊節流：每個區塊的行數、每次刷新的間隔與最多插入的字元數
+    CHUNK_LINES = 400
+    PUMP_INTERVAL_MS = 50
+    PUMP_BUDGET_CHARS = 60000
+    # 差異模式最多在樹狀檢視中展開標示的子樹數
+    DIFF_MARK_LIMIT = 200
+    
+    def __init__(self, max_depth=15, max_nodes=200000, out_dir="scans", compression="none", workers=4):
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self.out_dir = out_dir
+        self.compression = compression
+        self.workers = workers
+        self.last_scan_path = None  # 最近一次掃描的串流檔
+        self.baseline_path = None  # 差異比對的基準快照
+        self._after_scan = None  # 掃描完成後在主線程執行的動作
+        
+        # 背景掃描狀態：工作執行緒只寫入佇列與計數器，不碰 Tk 物件
+        self.scanning = False
+        self.cancel_event = threading.Event()
+        self._chunks = queue.Queue(maxsize=200)  # 掃描執行緒送出的文字區塊（有上限，避免記憶體暴增）
+        self._messages = deque()  # 主線程 log 訊息
+        self._progress_lock = threading.Lock()
+        self._progress = {"windows_done": 0, "windows_total": 0, "elements": 0}
+        self._last_chunk_source = None
+        self._render_text = True
+        
         self.root = tk.Tk()
         self.root.title("VS Code 主動掃描工具")
         self.root.geometry("1600x900")
@@ -37,16 +94,30 @@ class VSCodeScannerActive:
         control = tk.Frame(self.root, bg="#2a2a3e")
         control.pack(fill=tk.X, padx=10, pady=10)
         
-        tk.Button(
+        self.scan_btn = tk.Button(
             control,
             text="🚀 掃描所有視窗",
-            command=self.scan_all,
+            command=self.start_scan,
             font=("Arial", 11, "bold"),
             bg="#ff6600",
             fg="white",
             padx=20,
             pady=10
-        ).pack(side=tk.LEFT, padx=5)
+        )
+        self.scan_btn.pack(side=tk.LEFT, padx=5)
+        
+        self.cancel_btn = tk.Button(
+            control,
+            text="⛔ 取消",
+            command=self.cancel_scan,
+            font=("Arial", 11, "bold"),
+            bg="#7f8c8d",
+            fg="white",
+            padx=20,
+            pady=10,
+            state=tk.DISABLED
+        )
+        self.cancel_btn.pack(side=tk.LEFT, padx=5)
         
         tk.Button(
             control,
@@ -70,30 +141,153 @@ class VSCodeScannerActive:
             pady=10
         ).pack(side=tk.LEFT, padx=5)
         
-        # 結果顯示
+        tk.Button(
+            control,
+            text="📂 開啟快照",
+            command=self.open_snapshot,
+            font=("Arial", 11, "bold"),
+            bg="#2980b9",
+            fg="white",
+            padx=20,
+            pady=10
+        ).pack(side=tk.LEFT, padx=5)
+        
+        tk.Button(
+            control,
+            text="🔴 即時樹",
+            command=self.show_live_tree,
+            font=("Arial", 11, "bold"),
+            bg="#16a085",
+            fg="white",
+            padx=20,
+            pady=10
+        ).pack(side=tk.LEFT, padx=5)
+        
+        tk.Button(
+            control,
+            text="📸 基準快照 (F8)",
+            command=self.take_baseline,
+            font=("Arial", 11, "bold"),
+            bg="#34495e",
+            fg="white",
+            padx=20,
+            pady=10
+        ).pack(side=tk.LEFT, padx=5)
+        
+        tk.Button(
+            control,
+            text="🎯 比對 Allow (F9)",
+            command=self.diff_against_baseline,
+            font=("Arial", 11, "bold"),
+            bg="#c0392b",
+            fg="white",
+            padx=20,
+            pady=10
+        ).pack(side=tk.LEFT, padx=5)
+        
+        self.root.bind("<F8>", lambda _: self.take_baseline())
+        self.root.bind("<F9>", lambda _: self.diff_against_baseline())
+        
+        # 大型視窗可關閉文字明細，只輸出串流檔並以樹狀檢視瀏覽
+        self.text_details = tk.BooleanVar(value=True)
+        tk.Checkbutton(
+            control,
+            text="顯示文字明細",
+            variable=self.text_details,
+            font=("Arial", 10),
+            fg="#00ff00",
+            bg="#2a2a3e",
+            selectcolor="#1a1a2e",
+            activebackground="#2a2a3e"
+        ).pack(side=tk.LEFT, padx=10)
+        
+        # 進度
+        self.progress_label = tk.Label(
+            control,
+            text="待命中",
+            font=("Consolas", 10),
+            fg="#00ff00",
+            bg="#2a2a3e"
+        )
+        self.progress_label.pack(side=tk.RIGHT, padx=10)
+        
+        self.progress_bar = ttk.Progressbar(control, length=240, mode="determinate")
+        self.progress_bar.pack(side=tk.RIGHT, padx=5)
+        
+        # 結果顯示：文字 / 樹狀 兩種模式
+        self.notebook = ttk.Notebook(self.root)
+        self.notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        
         self.text = scrolledtext.ScrolledText(
-            self.root,
+            self.notebook,
             font=("Consolas", 10),
             wrap=tk.WORD,
             bg="#1a1a2e",
             fg="#00ff00"
         )
-        self.text.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        self.notebook.add(self.text, text="📝 文字")
         
-        self.all_data = []
+        self.tree_view = LazyTreeView(self.notebook, element_info=self.get_element_info)
+        self.notebook.add(self.tree_view, text="🌳 樹狀")
         
         self.log("✅ 掃描工具已啟動")
+        self.log(f"📁 掃描結果輸出目錄: {self.out_dir}（壓縮: {self.compression}）")
         self.log("📌 點擊「掃描所有視窗」開始")
         self.log("")
+        
+        self.root.after(self.PUMP_INTERVAL_MS, self._pump)
     
     def log(self, msg):
-        self.text.insert(tk.END, f"{msg}\n")
-        self.text.see(tk.END)
-        self.root.update()
+        """加入一行訊息（任何執行緒皆可呼叫，由 _pump 批次顯示）"""
+        self._messages.append(f"{msg}\n")
+    
+    def emit(self, text, source=None):
+        """掃描執行緒送出一段已排版的文字；佇列滿時等待，取消時丟棄"""
+        while not self.cancel_event.is_set():
+            try:
+                self._chunks.put((source, text), timeout=0.1)
+                return
+            except queue.Full:
+                continue
+    
+    def _pump(self):
+        """Tk 主線程：定時把累積的文字一次插入，並更新進度"""
+        parts = []
+        size = 0
+        while self._messages:
+            line = self._messages.popleft()
+            parts.append(line)
+            size += len(line)
+        while size < self.PUMP_BUDGET_CHARS:
+            try:
+                source, text = self._chunks.get_nowait()
+            except queue.Empty:
+                break
+            # 多個視窗同時掃描時，切換來源才補上視窗標頭
+            if source is not None and source != self._last_chunk_source:
+                parts.append(f"\n── {source} ──\n")
+            self._last_chunk_source = source
+            parts.append(text)
+            size += len(text)
+        
+        if parts:
+            self.text.insert(tk.END, "".join(parts))
+            self.text.see(tk.END)
+        
+        if self.scanning:
+            with self._progress_lock:
+                progress = dict(self._progress)
+            total = max(1, progress["windows_total"])
+            self.progress_bar["value"] = progress["windows_done"] * 100 / total
+            self.progress_label.config(
+                text=f"視窗 {progress['windows_done']}/{progress['windows_total']}，元素 {progress['elements']}"
+            )
+        
+        self.root.after(self.PUMP_INTERVAL_MS, self._pump)
     
     def clear(self):
         self.text.delete(1.0, tk.END)
-        self.all_data = []
+        self._last_chunk_source = None
     
     def get_vscode_windows(self):
         """找到所有 VS Code 視窗"""
@@ -112,6 +306,24 @@ class VSCodeScannerActive:
         win32gui.EnumWindows(cb, None)
         return windows
     
+    def get_vscode_version(self, hwnd):
+        """從 VS Code 安裝目錄的 resources/app/package.json 讀取版本，讀不到時回傳 None"""
+        try:
+            _, pid = win32process.GetWindowThreadProcessId(hwnd)
+            install_dir = os.path.dirname(psutil.Process(pid).exe())
+        except Exception:
+            return None
+        # 舊版在安裝目錄下，新版在以提交編號命名的子目錄下
+        candidates = [os.path.join(install_dir, "resources", "app", "package.json")]
+        candidates += glob.glob(os.path.join(install_dir, "*", "resources", "app", "package.json"))
+        for path in candidates:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    return json.load(f).get("version")
+            except (OSError, ValueError):
+                continue
+        return None
+    
     def get_element_info(self, elem):
         """獲取元素資訊"""
         try:
@@ -144,123 +356,321 @@ class VSCodeScannerActive:
         except:
             return None
     
-    def scan_recursive(self, elem, depth=0, max_depth=15):
-        """遞迴掃描"""
-        if depth > max_depth:
-            return []
+    def iter_elements(self, root, truncation=None):
+        """以明確堆疊做前序走訪，逐一產生元素資訊
         
-        results = []
-        try:
+        不保留整棵樹：堆疊只含祖先的尚未走訪兄弟節點，記憶體與樹大小無關
+        """
+        truncation = truncation if truncation is not None else ScanTruncation()
+        stack = [(root, 0)]
+        count = 0
+        
+        while stack:
+            elem, depth = stack.pop()
+            if self.cancel_event.is_set():
+                truncation.cancelled = True
+                return
+            if count >= self.max_nodes:
+                truncation.node_limit_hit = True
+                return
+            
             data = self.get_element_info(elem)
             if data:
                 data["depth"] = depth
-                results.append(data)
+                count += 1
+                yield data
+            
+            if depth >= self.max_depth:
+                truncation.depth_limited += 1
+                continue
             
             try:
-                for child in elem.children():
-                    results.extend(self.scan_recursive(child, depth + 1, max_depth))
+                children = elem.children()
             except:
-                pass
-        except:
-            pass
+                truncation.errors += 1
+                continue
+            
+            # 反向推入堆疊，讓第一個子元素先被取出（維持文件順序）
+            for child in reversed(children):
+                stack.append((child, depth + 1))
+    
+    @staticmethod
+    def format_element(idx, e):
+        """把單一元素排版成數行文字"""
+        indent = "  " * e['depth']
+        enabled = "✓啟用" if e.get('enabled') else "✗停用" if e.get('enabled') is False else "?未知"
+        visible = "👁可見" if e.get('visible') else "🔒隱藏" if e.get('visible') is False else "?未知"
+        
+        lines = [
+            f"{idx:3d}. {indent}【深度 {e['depth']}】",
+            f"     {indent}類型: {e.get('type', 'Unknown')}",
+        ]
+        
+        if e.get('name'):
+            lines.append(f"     {indent}名稱: {e['name']}")
+        
+        if e.get('id'):
+            lines.append(f"     {indent}AutoID: {e['id']}")
+        
+        if e.get('class'):
+            lines.append(f"     {indent}類別: {e['class']}")
+        
+        lines.append(f"     {indent}狀態: {enabled}, {visible}")
+        
+        if e.get('pos'):
+            lines.append(f"     {indent}位置: {e['pos']}")
         
-        return results
+        if e.get('size'):
+            lines.append(f"     {indent}大小: {e['size']}")
+        
+        lines.append("")
+        return lines
     
-    def scan_all(self):
-        """掃描所有視窗"""
+    def start_scan(self):
+        """開始背景掃描（按鈕）"""
+        if self.scanning:
+            return
         self.clear()
-        self.log("="*150)
-        self.log(f"🚀 開始掃描 - {datetime.now().strftime('%H:%M:%S')}")
-        self.log("="*150)
-        self.log("")
+        self.cancel_event.clear()
+        with self._progress_lock:
+            self._progress = {"windows_done": 0, "windows_total": 0, "elements": 0}
+        self.scanning = True
+        self._render_text = self.text_details.get()
+        self.scan_btn.config(state=tk.DISABLED)
+        self.cancel_btn.config(state=tk.NORMAL)
+        self.progress_bar["value"] = 0
+        threading.Thread(target=self.scan_all, daemon=True).start()
+    
+    def cancel_scan(self):
+        """取消進行中的掃描（按鈕）"""
+        if self.scanning:
+            self.cancel_event.set()
+            self.log("⛔ 正在取消掃描...")
+    
+    def _scan_finished(self):
+        """Tk 主線程：掃描結束後恢復按鈕狀態"""
+        self.scanning = False
+        self.scan_btn.config(state=tk.NORMAL)
+        self.cancel_btn.config(state=tk.DISABLED)
+        with self._progress_lock:
+            progress = dict(self._progress)
+        self.progress_label.config(
+            text=f"完成：視窗 {progress['windows_done']}/{progress['windows_total']}，元素 {progress['elements']}"
+        )
+        if not self.cancel_event.is_set():
+            self.progress_bar["value"] = 100
+        after_scan, self._after_scan = self._after_scan, None
+        if after_scan is not None and self.last_scan_path and not self.cancel_event.is_set():
+            after_scan(self.last_scan_path)
+        elif self.last_scan_path:
+            self.tree_view.load_snapshot(self.last_scan_path)
+    
+    def take_baseline(self):
+        """掃描一次並記為基準（Allow 提示出現前按下）"""
+        if self.scanning:
+            return
         
-        windows = self.get_vscode_windows()
-        self.log(f"找到 {len(windows)} 個 VS Code 視窗\n")
+        def _done(path):
+            self.baseline_path = path
+            self.log(f"📸 基準快照: {path}")
+            self.log("📌 等 Allow 提示出現後按 F9 比對")
+            self.tree_view.load_snapshot(path)
         
-        total_elements = 0
+        self._after_scan = _done
+        self.start_scan()
+    
+    def diff_against_baseline(self):
+        """再掃描一次，與基準比對，並在樹狀檢視標示變更的子樹（Allow 類子樹優先）"""
+        if self.scanning:
+            return
+        if not self.baseline_path:
+            self.log("⚠️ 先按 F8 建立基準快照")
+            return
         
-        for idx, (hwnd, title) in enumerate(windows, 1):
-            self.log(f"\n【視窗 {idx}】{title}")
-            self.log(f"HWND: {hwnd}")
-            self.log("-" * 150)
-            
+        def _done(path):
+            self.log("🔍 比對中...")
+            threading.Thread(target=self._diff_worker, args=(self.baseline_path, path), daemon=True).start()
+        
+        self._after_scan = _done
+        self.start_scan()
+    
+    def _diff_worker(self, old_path, new_path):
+        """背景執行緒：計算差異，完成後交給主線程顯示"""
+        try:
+            old_indexes = SnapshotIndex.load(old_path)
+            new_indexes = SnapshotIndex.load(new_path)
+            pairs = scan_diff.pair_windows(old_indexes, new_indexes)
+            diffs = [scan_diff.diff_indexes(old, new) for old, new in pairs]
+        except Exception as e:
+            self.log(f"❌ 比對失敗: {e}")
+            return
+        
+        for line in scan_diff.format_report(diffs):
+            self.log(line)
+        
+        marks = []
+        position = {id(index): w for w, index in enumerate(new_indexes)}
+        for diff in diffs:
+            w = position.get(id(diff.new))
+            if w is None:
+                continue  # 已關閉的視窗不在新快照中
+            prompt = scan_diff.allow_prompt_roots(diff)
+            if prompt:
+                marks.extend((w, j, "added") for j in prompt)
+                continue
+            marks.extend((w, j, "added") for j in scan_diff.subtree_roots(diff.new, diff.added))
+            changed = [j for _, j, _ in diff.changed]
+            marks.extend((w, j, "changed") for j in scan_diff.subtree_roots(diff.new, changed))
+        if not marks:
+            self.log("✅ 兩次掃描沒有差異")
+        
+        def _show():
+            self.tree_view.show_diff(new_indexes, marks[:self.DIFF_MARK_LIMIT], os.path.basename(new_path))
+            self.notebook.select(self.tree_view)
+        
+        self.root.after(0, _show)
+    
+    def open_snapshot(self):
+        """在樹狀檢視中開啟掃描快照"""
+        path = filedialog.askopenfilename(
+            initialdir=self.out_dir if os.path.isdir(self.out_dir) else ".",
+            filetypes=[("掃描快照", "*.jsonl *.jsonl.gz *.jsonl.zst *.uiasnap *.json"), ("所有檔案", "*.*")]
+        )
+        if path:
+            self.tree_view.load_snapshot(path)
+            self.notebook.select(self.tree_view)
+    
+    def show_live_tree(self):
+        """在樹狀檢視中瀏覽即時 UIA 樹（展開時才讀取子元素）"""
+        windows = []
+        for hwnd, title in self.get_vscode_windows():
             try:
-                window = Desktop(backend="uia").window(handle=hwnd)
-                
-                # 掃描所有元素
-                elements = self.scan_recursive(window, 0)
-                self.log(f"✅ 找到 {len(elements)} 個元素\n")
-                
-                total_elements += len(elements)
-                
-                # 按類型統計
-                types = defaultdict(int)
-                for e in elements:
-                    types[e.get('type', 'Unknown')] += 1
-                
-                self.log("【類型統計】")
-                for t, count in sorted(types.items(), key=lambda x: x[1], reverse=True)[:20]:
-                    bar = "█" * min(count // 5, 40)
-                    self.log(f"  {t:30s}: {count:5d} {bar}")
-                
-                # 顯示【所有元素】的詳細資訊
-                self.log(f"\n【所有元素詳細列表】 ({len(elements)} 個)")
-                self.log("")
-                
-                for idx, e in enumerate(elements, 1):
-                    indent = "  " * e['depth']
-                    enabled = "✓啟用" if e.get('enabled') else "✗停用" if e.get('enabled') is False else "?未知"
-                    visible = "👁可見" if e.get('visible') else "🔒隱藏" if e.get('visible') is False else "?未知"
-                    
-                    self.log(f"{idx:3d}. {indent}【深度 {e['depth']}】")
-                    self.log(f"     {indent}類型: {e.get('type', 'Unknown')}")
-                    
-                    if e.get('name'):
-                        self.log(f"     {indent}名稱: {e['name']}")
-                    
-                    if e.get('id'):
-                        self.log(f"     {indent}AutoID: {e['id']}")
-                    
-                    if e.get('class'):
-                        self.log(f"     {indent}類別: {e['class']}")
-                    
-                    self.log(f"     {indent}狀態: {enabled}, {visible}")
-                    
-                    if e.get('pos'):
-                        self.log(f"     {indent}位置: {e['pos']}")
-                    
-                    if e.get('size'):
-                        self.log(f"     {indent}大小: {e['size']}")
-                    
-                    self.log("")
-                
-                # 儲存資料
-                self.all_data.append({
-                    "hwnd": hwnd,
-                    "title": title,
-                    "elements": elements
-                })
-                
+                windows.append((hwnd, title, Desktop(backend="uia").window(handle=hwnd).wrapper_object()))
             except Exception as e:
-                self.log(f"❌ 錯誤: {e}")
+                self.log(f"❌ 無法連接到視窗 {hwnd}: {e}")
+        self.tree_view.load_live(windows)
+        self.notebook.select(self.tree_view)
+    
+    def scan_window(self, idx, hwnd, title, writer):
+        """掃描執行緒：掃描單一視窗，寫入串流檔並送出排版後的文字區塊"""
+        source = f"【視窗 {idx}】{title}"
+        self.emit("\n".join([
+            "",
+            source,
+            f"HWND: {hwnd}",
+            "-" * 150,
+            f"【所有元素詳細列表】（最大深度 {self.max_depth}，最多 {self.max_nodes} 個）",
+            "",
+        ]) + "\n", source)
         
-        self.log("")
-        self.log("="*150)
-        self.log(f"✅ 掃描完成！共 {total_elements} 個元素")
-        self.log("="*150)
+        part = None
+        try:
+            window = Desktop(backend="uia").window(handle=hwnd)
+            
+            types = defaultdict(int)
+            truncation = ScanTruncation()
+            version = self.get_vscode_version(hwnd)
+            part = writer.window_part(hwnd, title, {"vscode_version": version} if version else None)
+            
+            lines = []
+            pending = 0
+            for n, e in enumerate(self.iter_elements(window, truncation), 1):
+                types[e.get('type', 'Unknown')] += 1
+                part.write_element(e)
+                if self._render_text:
+                    lines.extend(self.format_element(n, e))
+                pending += 1
+                if len(lines) >= self.CHUNK_LINES or pending >= self.CHUNK_LINES:
+                    if lines:
+                        self.emit("\n".join(lines) + "\n", source)
+                        lines = []
+                    with self._progress_lock:
+                        self._progress["elements"] += pending
+                    pending = 0
+            
+            count = sum(types.values())
+            summary = lines + [f"✅ 找到 {count} 個元素"]
+            if truncation.describe():
+                summary.append(f"⚠️ 掃描被截斷：{truncation.describe()}")
+            summary += ["", "【類型統計】"]
+            for t, c in sorted(types.items(), key=lambda x: x[1], reverse=True)[:20]:
+                bar = "█" * min(c // 5, 40)
+                summary.append(f"  {t:30s}: {c:5d} {bar}")
+            self.emit("\n".join(summary) + "\n", source)
+            
+            part.end_window(count, {
+                "depth_limited": truncation.depth_limited,
+                "node_limit_hit": truncation.node_limit_hit,
+                "errors": truncation.errors,
+                "cancelled": truncation.cancelled,
+            })
+            return count
+        
+        except Exception as e:
+            if part is not None:
+                part.discard()
+            self.emit(f"❌ 錯誤: {e}\n", source)
+            return 0
+        
+        finally:
+            with self._progress_lock:
+                self._progress["windows_done"] += 1
+    
+    def scan_all(self):
+        """掃描所有視窗（背景執行緒；多個視窗同時掃描）"""
+        started = datetime.now()
+        self.emit("\n".join([
+            "=" * 150,
+            f"🚀 開始掃描 - {started.strftime('%H:%M:%S')}",
+            "=" * 150,
+            "",
+        ]) + "\n")
+        
+        try:
+            windows = self.get_vscode_windows()
+            self.emit(f"找到 {len(windows)} 個 VS Code 視窗（同時掃描 {self.workers} 個）\n\n")
+            with self._progress_lock:
+                self._progress["windows_total"] = len(windows)
+            
+            try:
+                writer = ScanStreamWriter(self.out_dir, self.compression)
+            except Exception as e:
+                self.emit(f"❌ 無法建立輸出檔: {e}\n")
+                return
+            
+            with writer, ThreadPoolExecutor(max_workers=max(1, self.workers)) as pool:
+                futures = [
+                    pool.submit(self.scan_window, idx, hwnd, title, writer)
+                    for idx, (hwnd, title) in enumerate(windows, 1)
+                ]
+                total_elements = sum(f.result() for f in futures)
+            
+            with self._progress_lock:
+                self._progress["elements"] = total_elements
+            self.last_scan_path = writer.path
+            
+            elapsed = (datetime.now() - started).total_seconds()
+            status = "⛔ 掃描已取消" if self.cancel_event.is_set() else "✅ 掃描完成！"
+            # 結尾訊息不受取消影響，直接放入主線程訊息佇列
+            self.log("")
+            self.log("=" * 150)
+            self.log(f"{status} 共 {total_elements} 個元素，耗時 {elapsed:.1f} 秒")
+            self.log(f"📁 已寫入: {writer.path}")
+            self.log("=" * 150)
+        finally:
+            self.root.after(0, self._scan_finished)
     
     def export(self):
-        """導出 JSON"""
-        if not self.all_data:
+        """導出 JSON（舊版格式，從最近一次掃描的串流檔逐筆轉換）"""
+        if not self.last_scan_path:
             self.log("⚠️ 先執行掃描")
             return
         
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"c:\\Aking\\AutoAllow\\python\\vscode_scan_{timestamp}.json"
+        filename = os.path.join(self.out_dir, f"vscode_scan_{timestamp}.json")
         
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(self.all_data, f, ensure_ascii=False, indent=2)
+            convert_to_legacy_json(self.last_scan_path, filename)
             self.log(f"\n✅ 已導出到: {filename}")
         except Exception as e:
             self.log(f"❌ 導出失敗: {e}")
@@ -269,6 +679,25 @@ class VSCodeScannerActive:
         self.root.mainloop()
 
 
-if __name__ == "__main__":
-    app = VSCodeScannerActive()
+def main():
+    parser = argparse.ArgumentParser(description='VS Code UI 物件主動掃描工具')
+    parser.add_argument('--max-depth', type=int, default=15, help='最大走訪深度')
+    parser.add_argument('--max-nodes', type=int, default=200000, help='每個視窗最多記錄的元素數')
+    parser.add_argument('--out-dir', default='scans', help='掃描結果輸出目錄')
+    parser.add_argument('--compress', choices=['none', 'gzip', 'zstd'], default='none', help='串流檔壓縮格式')
+    parser.add_argument('--workers', type=int, default=4, help='同時掃描的視窗數')
+    parser.add_argument('--diff', nargs=2, metavar=('OLD', 'NEW'), help='比對兩個快照檔後結束（不開啟視窗）')
+    parser.add_argument('--json', metavar='OUT', help='搭配 --diff：另存機器可讀的比對結果')
+    args = parser.parse_args()
+    
+    if args.diff:
+        scan_diff.main(args.diff[0], args.diff[1], args.json)
+        return
+    
+    app = VSCodeScannerActive(max_depth=args.max_depth, max_nodes=args.max_nodes,
+                              out_dir=args.out_dir, compression=args.compress, workers=args.workers)
     app.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+視窗狀態暖啟動
+重新啟動後 hwnd 都會改變，因此以視窗標題中的工作區名稱為鍵，把監控循環學到的狀態寫入小型 JSON 檔：
+- 曾找到 Allow 按鈕的工作區：啟動後視窗一出現就列為活躍視窗（深度掃描、快速輪詢）
+- 連接健康狀態：連續連接失敗的次數
+
+超過 max_age 沒有再出現的工作區，以及超過 max_age 沒有點擊的活躍標記，在載入與儲存時丟棄
+只由監控執行緒讀寫；寫入先寫暫存檔再取代，程式中斷時不會留下半個檔案
+"""
+
+import json
+import os
+import sys
+import time
+
+STATE_FILENAME = "window_state.json"
+STATE_VERSION = 1
+
+# 最後一次出現只需要粗略的時間：超過這個秒數才為了更新 last_seen 重寫檔案
+SEEN_RESOLUTION = 3600
+
+_APP_SUFFIX = " - Visual Studio Code"
+
+
+def default_state_path():
+    """打包成 exe 時為 exe 所在目錄，否則為程式所在目錄"""
+    if getattr(sys, "frozen", False):
+        base = os.path.dirname(sys.executable)
+    else:
+        base = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base, STATE_FILENAME)
+
+
+def workspace_key(title):
+    """從視窗標題取出工作區名稱
+
+    VS Code 預設標題為「● 檔案 - 工作區 - Visual Studio Code」，工作區是應用程式名稱前的最後一段；
+    沒有開啟工作區時只有「檔案 - Visual Studio Code」，此時以該段為鍵。取不出時回傳 None
+    """
+    if not title.endswith(_APP_SUFFIX):
+        return None
+    parts = [p.strip(" ●") for p in title[:-len(_APP_SUFFIX)].split(" - ")]
+    parts = [p for p in parts if p]
+    return parts[-1] if parts else None
+
+
+class WarmState:
+    """以工作區為鍵的暖啟動狀態
+
+    Args:
+        path: 狀態檔路徑
+        max_age: 工作區多久沒出現（或活躍標記多久沒有點擊）就丟棄（秒）
+        clock: 目前時間（epoch 秒），測試時可替換
+    """
+
+    def __init__(self, path, max_age=7 * 86400, clock=time.time, log=None):
+        self.path = path
+        self.max_age = max_age
+        self.clock = clock
+        self.log = log or (lambda msg, level="INFO": None)
+        self.entries = {}  # {工作區: {"last_seen", "last_click", "clicks", "fail_count"}}
+        self.enabled = False
+        self.dirty = False
+
+    def load(self):
+        """讀取狀態檔並丟棄過期項目，回傳保留的工作區數；檔案無效時從空白開始"""
+        self.enabled = True
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                payload = json.load(f)
+            if payload.get("version") != STATE_VERSION:
+                raise ValueError(f"不支援的版本 {payload.get('version')}")
+            self.entries = {str(k): dict(v) for k, v in payload["workspaces"].items()}
+        except FileNotFoundError:
+            self.entries = {}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            self.log(f"⚠️ 暖啟動狀態檔無效，從空白開始: {e}", "WARNING")
+            self.entries = {}
+        self.expire()
+        return len(self.entries)
+
+    def expire(self):
+        """丟棄過期的工作區與活躍標記"""
+        cutoff = self.clock() - self.max_age
+        for key in [k for k, e in self.entries.items() if e.get("last_seen", 0) < cutoff]:
+            del self.entries[key]
+            self.dirty = True
+        for entry in self.entries.values():
+            if entry.get("last_click") is not None and entry["last_click"] < cutoff:
+                entry["last_click"] = None
+                self.dirty = True
+
+    def restore(self, workspace):
+        """新視窗出現時呼叫，回傳 (是否為活躍工作區, 連續連接失敗次數)；沒有記錄時回傳 (False, 0)"""
+        entry = self.entries.get(workspace) if self.enabled and workspace else None
+        if entry is None:
+            return False, 0
+        return entry.get("last_click") is not None, entry.get("fail_count", 0)
+
+    def update(self, workspace, clicked=False, fail_count=0):
+        """每次掃描完一個視窗時呼叫；只有狀態改變（或 last_seen 超過 SEEN_RESOLUTION）才需要重寫檔案"""
+        if not self.enabled or not workspace:
+            return
+        now = self.clock()
+        entry = self.entries.get(workspace)
+        if entry is None:
+            entry = self.entries[workspace] = {"last_seen": now, "last_click": None, "clicks": 0, "fail_count": 0}
+            self.dirty = True
+        elif now - entry["last_seen"] >= SEEN_RESOLUTION:
+            entry["last_seen"] = now
+            self.dirty = True
+        if clicked:
+            entry["last_seen"] = entry["last_click"] = now
+            entry["clicks"] += 1
+            self.dirty = True
+        if entry["fail_count"] != fail_count:
+            entry["fail_count"] = fail_count
+            self.dirty = True
+
+    def clear(self):
+        if self.entries:
+            self.entries.clear()
+            self.dirty = True
+
+    def save(self):
+        """有變更時寫入狀態檔（暫存檔 + 取代），回傳是否寫入"""
+        if not self.enabled or not self.dirty:
+            return False
+        self.expire()
+        payload = {"version": STATE_VERSION, "saved": self.clock(), "workspaces": self.entries}
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(payload, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            self.log(f"⚠️ 無法寫入暖啟動狀態: {e}", "WARNING")
+            return False
+        self.dirty = False
+        return True